@@ -1,88 +1,73 @@
-from beta9 import (
-    Bot,
-    BotContext,
-    BotEventType,
-    BotLocation,
-    Sandbox,
-    SandboxConnectionError,
-    SandboxFileInfo,
-    SandboxFilePosition,
-    SandboxFileSearchMatch,
-    SandboxFileSearchRange,
-    SandboxFileSystem,
-    SandboxFileSystemError,
-    SandboxInstance,
-    SandboxProcess,
-    SandboxProcessError,
-    SandboxProcessManager,
-    SandboxProcessResponse,
-    SandboxProcessStream,
-    env,
-    schema,
-)
-from beta9.abstractions import experimental
-from beta9.abstractions.base.container import Container
-from beta9.abstractions.endpoint import ASGI as asgi
-from beta9.abstractions.endpoint import Endpoint as endpoint
-from beta9.abstractions.endpoint import RealtimeASGI as realtime
-from beta9.abstractions.function import Function as function
-from beta9.abstractions.function import Schedule as schedule
-from beta9.abstractions.image import Image
-from beta9.abstractions.map import Map
-from beta9.abstractions.output import Output
-from beta9.abstractions.pod import Pod, PodInstance
-from beta9.abstractions.queue import SimpleQueue as Queue
-from beta9.abstractions.taskqueue import TaskQueue as task_queue
-from beta9.abstractions.volume import CloudBucket, CloudBucketConfig, Volume
-from beta9.client.deployment import Deployment
-from beta9.client.task import Task
-from beta9.type import GpuType, PythonVersion, QueueDepthAutoscaler
+from importlib import import_module
 
-from .client.client import Client
+# Public names are resolved on first access so `import beam` stays cheap for
+# processes that only need a couple of them (e.g. `beam.Client`).
+_EXPORTS = {
+    "Map": ("beta9.abstractions.map", "Map"),
+    "Image": ("beta9.abstractions.image", "Image"),
+    "Queue": ("beta9.abstractions.queue", "SimpleQueue"),
+    "Volume": ("beta9.abstractions.volume", "Volume"),
+    "CloudBucket": ("beta9.abstractions.volume", "CloudBucket"),
+    "CloudBucketConfig": ("beta9.abstractions.volume", "CloudBucketConfig"),
+    "task_queue": ("beta9.abstractions.taskqueue", "TaskQueue"),
+    "function": ("beta9.abstractions.function", "Function"),
+    "endpoint": ("beta9.abstractions.endpoint", "Endpoint"),
+    "asgi": ("beta9.abstractions.endpoint", "ASGI"),
+    "realtime": ("beta9.abstractions.endpoint", "RealtimeASGI"),
+    "Container": ("beta9.abstractions.base.container", "Container"),
+    "env": ("beta9.env", None),
+    "PythonVersion": ("beta9.type", "PythonVersion"),
+    "GpuType": ("beta9.type", "GpuType"),
+    "Output": ("beta9.abstractions.output", "Output"),
+    "QueueDepthAutoscaler": ("beta9.type", "QueueDepthAutoscaler"),
+    "experimental": ("beta9.abstractions.experimental", None),
+    "schedule": ("beta9.abstractions.function", "Schedule"),
+    "integrations": (".integrations", None),
+    "Bot": ("beta9.abstractions.experimental.bot.bot", "Bot"),
+    "BotContext": ("beta9.abstractions.experimental.bot.types", "BotContext"),
+    "BotEventType": ("beta9.abstractions.experimental.bot.bot", "BotEventType"),
+    "BotLocation": ("beta9.abstractions.experimental.bot.bot", "BotLocation"),
+    "Pod": ("beta9.abstractions.pod", "Pod"),
+    "PodInstance": ("beta9.abstractions.pod", "PodInstance"),
+    "Client": (".client.client", "Client"),
+    "AsyncClient": (".client.aio", "AsyncClient"),
+    "Task": ("beta9.client.task", "Task"),
+    "Deployment": ("beta9.client.deployment", "Deployment"),
+    "schema": ("beta9.schema", None),
+    "Sandbox": ("beta9.abstractions.sandbox", "Sandbox"),
+    "SandboxInstance": ("beta9.abstractions.sandbox", "SandboxInstance"),
+    "SandboxProcess": ("beta9.abstractions.sandbox", "SandboxProcess"),
+    "SandboxProcessManager": ("beta9.abstractions.sandbox", "SandboxProcessManager"),
+    "SandboxProcessResponse": ("beta9.abstractions.sandbox", "SandboxProcessResponse"),
+    "SandboxProcessStream": ("beta9.abstractions.sandbox", "SandboxProcessStream"),
+    "SandboxProcessError": ("beta9.abstractions.sandbox", "SandboxProcessError"),
+    "SandboxConnectionError": ("beta9.abstractions.sandbox", "SandboxConnectionError"),
+    "SandboxFileInfo": ("beta9.abstractions.sandbox", "SandboxFileInfo"),
+    "SandboxFileSystem": ("beta9.abstractions.sandbox", "SandboxFileSystem"),
+    "SandboxFileSystemError": ("beta9.abstractions.sandbox", "SandboxFileSystemError"),
+    "SandboxFilePosition": ("beta9.abstractions.sandbox", "SandboxFilePosition"),
+    "SandboxFileSearchMatch": ("beta9.abstractions.sandbox", "SandboxFileSearchMatch"),
+    "SandboxFileSearchRange": ("beta9.abstractions.sandbox", "SandboxFileSearchRange"),
+}
 
-__all__ = [
-    "Map",
-    "Image",
-    "Queue",
-    "Volume",
-    "CloudBucket",
-    "CloudBucketConfig",
-    "task_queue",
-    "function",
-    "endpoint",
-    "asgi",
-    "realtime",
-    "Container",
-    "env",
-    "PythonVersion",
-    "GpuType",
-    "Output",
-    "QueueDepthAutoscaler",
-    "experimental",
-    "schedule",
-    "integrations",
-    "Bot",
-    "BotContext",
-    "BotEventType",
-    "BotLocation",
-    "Pod",
-    "PodInstance",
-    "Client",
-    "Task",
-    "Deployment",
-    "schema",
-    "Sandbox",
-    "SandboxInstance",
-    "SandboxProcess",
-    "SandboxProcessManager",
-    "SandboxProcessResponse",
-    "SandboxProcessStream",
-    "SandboxProcessError",
-    "SandboxConnectionError",
-    "SandboxFileInfo",
-    "SandboxFileSystem",
-    "SandboxFileSystemError",
-    "SandboxFilePosition",
-    "SandboxFileSearchMatch",
-    "SandboxFileSearchRange",
-]
+# Exports that need an optional extra. They still resolve as attributes, but
+# are left out of `__all__` so `from beam import *` works without the extra.
+_OPTIONAL_EXPORTS = {"AsyncClient"}
+
+__all__ = [name for name in _EXPORTS if name not in _OPTIONAL_EXPORTS]
+
+
+def __getattr__(name):
+    try:
+        module_name, attribute = _EXPORTS[name]
+    except KeyError as error:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from error
+
+    module = import_module(module_name, __name__)
+    value = module if attribute is None else getattr(module, attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_EXPORTS})
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Started before the rest of the CLI is imported, so its imports are profiled too.
+# BEAM_PROFILE=1 prints a report when the CLI exits, any other value is a path to
+# write a speedscope profile to.
+if "--profile-startup" in sys.argv[1:] or os.getenv("BEAM_PROFILE"):
+    from . import profile
+
+    output = os.getenv("BEAM_PROFILE", "")
+    profile.start(None if output.lower() in ("", "1", "true") else output)
@@ -1,10 +1,16 @@
-import io
+import hashlib
+import json
 import os
+import shutil
+import tempfile
+import threading
+import time
 import zipfile
 from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import DefaultDict, List, Optional
+from typing import DefaultDict, Dict, Iterable, List, Optional, Tuple
 
 import click
 import requests
@@ -17,6 +23,20 @@ repo_zip = os.getenv("GIT_REPO_ZIP_FILE") or "main.zip"
 repo_uri = os.getenv("GIT_REPO_URL") or "https://github.com/beam-cloud/examples"
 repo_archive_uri = f"{repo_uri}/archive/refs/heads/{repo_zip}"
 
+CHUNK_SIZE = 1024 * 1024
+
+# Archives are cached per archive URL, and revalidated once they're older than the TTL
+CACHE_DIR = Path("~/.beam/cache/examples").expanduser()
+CACHE_TTL = int(os.getenv("BEAM_EXAMPLES_CACHE_TTL", 3600))
+DOWNLOAD_TIMEOUT = 30
+
+# Threads writing extracted files, and the most uncompressed bytes they write at once
+EXTRACT_WORKERS = min(8, (os.cpu_count() or 1) + 4)
+EXTRACT_MAX_IN_FLIGHT = 64 * 1024 * 1024
+
+# Bumped whenever the format of saved app indexes changes
+INDEX_VERSION = 1
+
 
 @click.group(cls=ClickCommonGroup)
 def common(**_):
@@ -59,39 +79,69 @@ def create_app(ctx: click.Context, name: str):
 )
 def download_example(name: str):
     terminal.header("Downloading contents")
-    dirs = download_repo()
-    if not dirs:
-        return terminal.error(f"No files found in the repository {repo_uri}.")
+    with download_repo(repo_archive_uri) as archive:
+        if not archive.apps.files:
+            return terminal.error(f"No files found in the repository {repo_uri}.")
+
+        if name != "all":
+            terminal.header(f"Getting {name} example")
+            app_dir = archive.apps.get(name)
+            if not app_dir:
+                return terminal.error(f"App example '{name}' not found in repository {repo_uri}.")
+
+            terminal.header(f"Writing {app_dir.path} example")
+            archive.extract_files([(file, file.path) for file in app_dir.files])
+            return terminal.success("=> Completed! 🎉")
 
-    if name == "all":
         terminal.header("Getting all examples")
-        app_dirs = find_app_dirs(dirs)
+        app_dirs = archive.apps.all()
         if not app_dirs:
             return terminal.error(f"No example apps found in repository {repo_uri}.")
-    else:
-        terminal.header(f"Getting {name} example")
-        app_dir = find_app_dirs_by_name(name, dirs)
-        if not app_dir:
-            return terminal.error(f"App example '{name}' not found in repository {repo_uri}.")
-        app_dirs = [app_dir]
 
-    for app in app_dirs:
-        terminal.header(f"Writing {app.path} example")
-        for file in app.files:
-            path = "examples" / file.path if name == "all" else file.path
-            path.parent.mkdir(parents=True, exist_ok=True)
-            path.write_bytes(file.content)
+        # Written to a staging directory first, so an interrupted download
+        # never leaves a partial tree behind. The staging directory becomes
+        # ./examples, or is merged into it when it already exists, replacing
+        # the files the examples have and keeping any others.
+        terminal.header(f"Writing {len(app_dirs)} examples")
+        target = Path("examples")
+        files = [file for app in app_dirs for file in app.files]
+        staging = Path(tempfile.mkdtemp(prefix=".examples-", dir="."))
+        try:
+            archive.extract_files([(file, staging / file.path) for file in files])
+            if target.exists():
+                merge_files(staging, target, [file.path for file in files])
+            else:
+                # mkdtemp makes the directory private, unlike the mkdir it replaces
+                staging.chmod(0o777 & ~current_umask())
+                os.rename(staging, target)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
 
     terminal.success("=> Completed! 🎉")
 
 
+def current_umask() -> int:
+    # The umask can only be read by setting it
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def merge_files(source: Path, target: Path, paths: List[Path]) -> None:
+    """Moves the files at `paths` under `source` to the same paths under `target`."""
+    for directory in sorted({path.parent for path in paths}):
+        (target / directory).mkdir(parents=True, exist_ok=True)
+    for path in paths:
+        os.replace(source / path, target / path)
+
+
 @management.command(
     name="list",
     help="List all available example apps.",
 )
 def list_examples():
-    dirs = download_repo()
-    app_dirs = find_app_dirs(dirs)
+    with download_repo(repo_archive_uri) as archive:
+        app_dirs = archive.apps.all()
 
     table = Table(
         Column("Name"),
@@ -102,13 +152,13 @@ def list_examples():
     if app_dirs:
         table.add_row(
             "all",
-            terminal.humanize_memory(sum(len(f.content) for app in app_dirs for f in app.files)),
+            terminal.humanize_memory(sum(f.size for app in app_dirs for f in app.files)),
         )
 
     for app in app_dirs:
         table.add_row(
             app.path.as_posix(),
-            terminal.humanize_memory(sum(len(f.content) for f in app.files)),
+            terminal.humanize_memory(sum(f.size for f in app.files)),
         )
 
     table.add_section()
@@ -119,7 +169,9 @@ def list_examples():
 @dataclass
 class RepoFile:
     path: Path
-    content: bytes
+    # The file's name in the archive and its uncompressed size
+    member: str = ""
+    size: int = 0
 
 
 @dataclass
@@ -128,52 +180,304 @@ class RepoDir:
     files: List[RepoFile] = field(default_factory=list)
 
 
-def download_repo(url: str = repo_archive_uri) -> List[RepoDir]:
+class AppIndex:
     """
-    Downloads the repository into memory and returns a list of RepoDirs.
+    The example apps of an archive, by name.
+
+    An app is a directory holding a README.md, made of the files directly in
+    it, and is named after its path in the repository. The index is built
+    from the zip central directory alone, so no file is decompressed.
     """
-    response = requests.get(url)
-    response.raise_for_status()
 
-    files: List[RepoFile] = []
-    with zipfile.ZipFile(io.BytesIO(response.content)) as zip:
-        for file_info in zip.infolist():
-            if file_info.is_dir():
+    def __init__(self, apps: Dict[str, List[Tuple[str, int]]], files: int = 0) -> None:
+        # The archive member name and uncompressed size of each file of an app,
+        # sorted by file name, by app name in order
+        self.apps = apps
+        # Files in the whole archive
+        self.files = files
+
+    @classmethod
+    def from_members(cls, members: Iterable[zipfile.ZipInfo]) -> "AppIndex":
+        dirs: DefaultDict[str, List[Tuple[str, int]]] = defaultdict(list)
+        readmes = set()
+        files = 0
+
+        for info in members:
+            name = info.filename
+            if name.endswith("/") or name.startswith("/"):
                 continue
-            with zip.open(file_info) as file:
-                path = Path(*file_info.filename.split("/")[1:])
-                files.append(RepoFile(path=path, content=file.read()))
-
-    files.sort(key=lambda f: f.path.name)
 
-    dirs: DefaultDict[Path, RepoDir] = defaultdict(RepoDir)
-    for file in files:
-        repo_dir = dirs[file.path.parent]
-        repo_dir.path = file.path.parent
-        repo_dir.files.append(file)
+            # Paths are relative to the archive's top-level directory. Skip the
+            # ones that would be written outside the current directory.
+            path = name.partition("/")[2]
+            if not path or ".." in path.split("/"):
+                continue
 
-    return list(dirs.values())
+            parent, _, file_name = path.rpartition("/")
+            parent = parent or "."
+            dirs[parent].append((name, info.file_size))
+            files += 1
+            if file_name.upper().endswith("README.MD"):
+                readmes.add(parent)
+
+        apps = {
+            app: sorted(dirs[app], key=lambda file: file[0].rpartition("/")[2])
+            for app in sorted(readmes)
+        }
+        return cls(apps, files)
+
+    def __len__(self) -> int:
+        return len(self.apps)
+
+    def get(self, name: str) -> Optional[RepoDir]:
+        files = self.apps.get(name)
+        return None if files is None else self._repo_dir(name, files)
+
+    def all(self) -> List[RepoDir]:
+        return [self._repo_dir(name, files) for name, files in self.apps.items()]
+
+    @staticmethod
+    def _repo_dir(name: str, files: List[Tuple[str, int]]) -> RepoDir:
+        path = Path(name)
+        return RepoDir(
+            path=path,
+            files=[
+                RepoFile(path=path / member.rpartition("/")[2], member=member, size=size)
+                for member, size in files
+            ],
+        )
 
 
-def find_app_dirs(dirs: List[RepoDir]) -> List[RepoDir]:
+def load_index(path: Path, stat: os.stat_result) -> AppIndex:
     """
-    Finds example app dirs.
-
-    An example app dir is a directory containing a README.md file.
+    Returns the app index of the archive at `path`, from the index saved
+    next to it when that was built from the same archive, or else from the
+    archive's central directory, saving it for next time.
     """
-    return sorted(
-        [RepoDir(path=d.path, files=d.files) for d in dirs if has_readme(d.files)],
-        key=lambda d: d.path.as_posix(),
-    )
+    index_path = path.with_name(f"{path.stem}.index.json")
+    stamp = [stat.st_size, stat.st_mtime_ns]
+
+    data = read_json(index_path)
+    if data and data.get("version") == INDEX_VERSION and data.get("archive") == stamp:
+        return AppIndex(data["apps"], data["files"])
+
+    with zipfile.ZipFile(path) as zip:
+        index = AppIndex.from_members(zip.infolist())
+
+    data = {"version": INDEX_VERSION, "archive": stamp, "files": index.files, "apps": index.apps}
+    try:
+        write_json(data, index_path)
+    except OSError:
+        pass
+    return index
+
+
+class ByteBudget:
+    """Limits the bytes that threads hold at once."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = max(limit, 1)
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, size: int) -> int:
+        """
+        Waits until `size` bytes fit in the budget, or the budget is unused
+        when `size` is larger than the limit, and returns the bytes taken.
+        """
+        size = min(size, self.limit)
+        with self._cond:
+            self._cond.wait_for(lambda: self.used + size <= self.limit)
+            self.used += size
+        return size
+
+    def release(self, size: int) -> None:
+        with self._cond:
+            self.used -= size
+            self._cond.notify_all()
+
+
+class RepoArchive:
+    """
+    A repository archive on disk and its app index.
 
+    The zip itself is only read to extract files, which are decompressed one
+    at a time.
+    """
 
-def find_app_dirs_by_name(name: str, dirs: List[RepoDir]) -> Optional[RepoDir]:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        # Opened first so the index and extracted files come from the same
+        # archive, even if the cached copy is replaced meanwhile
+        self.file = open(path, "rb")
+        try:
+            self.apps = load_index(path, os.fstat(self.file.fileno()))
+        except BaseException:
+            self.file.close()
+            raise
+        self._zip: Optional[zipfile.ZipFile] = None
+
+    @property
+    def zip(self) -> zipfile.ZipFile:
+        if self._zip is None:
+            self._zip = zipfile.ZipFile(self.file)
+        return self._zip
+
+    def extract(self, file: RepoFile, path: Path) -> None:
+        """Decompresses a file of the archive straight to `path`."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self.zip.open(file.member) as src, open(path, "wb") as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+    def extract_files(
+        self,
+        files: List[Tuple[RepoFile, Path]],
+        workers: int = EXTRACT_WORKERS,
+        max_in_flight: int = EXTRACT_MAX_IN_FLIGHT,
+    ) -> None:
+        """
+        Decompresses files of the archive to their paths from a pool of
+        `workers` threads.
+
+        Directories are all created first, in one pass. Files are then
+        submitted while the ones being written add up to at most
+        `max_in_flight` uncompressed bytes. A file larger than that is written
+        on its own. The first error stops the extraction and is raised.
+        """
+        for directory in sorted({path.parent for _, path in files}):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        zip = self.zip
+        budget = ByteBudget(max_in_flight)
+        failed = threading.Event()
+
+        def write(member: str, path: Path, size: int) -> None:
+            try:
+                with zip.open(member) as src, open(path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            except BaseException:
+                failed.set()
+                raise
+            finally:
+                budget.release(size)
+
+        futures: List[Future] = []
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="beam-extract") as pool:
+            try:
+                for file, path in files:
+                    if failed.is_set():
+                        break
+                    size = budget.acquire(file.size)
+                    futures.append(pool.submit(write, file.member, path, size))
+
+                for future in futures:
+                    future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def find(self, path: Path) -> Optional[RepoFile]:
+        """Finds any file of the archive by its path in the repository."""
+        names = self.zip.namelist()
+        if not names:
+            return None
+
+        member = f"{names[0].partition('/')[0]}/{path.as_posix()}"
+        try:
+            info = self.zip.getinfo(member)
+        except KeyError:
+            return None
+        return RepoFile(path=path, member=member, size=info.file_size)
+
+    def close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+        self.file.close()
+
+    def __enter__(self) -> "RepoArchive":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+def download_repo(url: str = repo_archive_uri) -> RepoArchive:
     """
-    Finds an example app dir by name.
+    Opens the repository archive, downloading it into the cache first when
+    the cached copy is missing or stale.
     """
-    apps = find_app_dirs(dirs)
-    return next((app for app in apps if app.path.as_posix() == name), None)
+    return RepoArchive(fetch_archive(url))
 
 
-def has_readme(files: List[RepoFile]) -> bool:
-    return any(f.path.name.upper().endswith("README.MD") for f in files)
+def fetch_archive(url: str, cache_dir: Optional[Path] = None, ttl: Optional[int] = None) -> Path:
+    """
+    Returns the path of a cached copy of the archive at `url`.
+
+    A copy younger than `ttl` seconds is used as is. An older one is
+    revalidated with its ETag and Last-Modified, so an unchanged archive costs
+    an empty 304 response. The archive is streamed to disk, never held in
+    memory. When the download fails and a copy is cached, that copy is used.
+    """
+    cache_dir = (cache_dir or CACHE_DIR) / hashlib.sha256(url.encode()).hexdigest()[:16]
+    ttl = CACHE_TTL if ttl is None else ttl
+    path = cache_dir / "archive.zip"
+    meta = read_json(cache_dir / "archive.json") if path.exists() else None
+
+    if meta is not None and time.time() - meta.get("checked_at", 0) < ttl:
+        return path
+
+    headers = {}
+    if meta is not None and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta is not None and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        with requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            if response.status_code == 304 and meta is not None:
+                meta["checked_at"] = time.time()
+                write_json(meta, cache_dir / "archive.json")
+                return path
+
+            response.raise_for_status()
+            cache_dir.mkdir(parents=True, exist_ok=True)
+
+            # Write then rename so concurrent invocations never read a partial archive
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+            meta = {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "checked_at": time.time(),
+            }
+            write_json(meta, cache_dir / "archive.json")
+            return path
+    except requests.RequestException as e:
+        if meta is None:
+            raise
+        terminal.warn(f"Could not download {url} ({e.__class__.__name__}), using the cached copy.")
+        return path
+
+
+def read_json(path: Path) -> Optional[dict]:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(data: dict, path: Path) -> None:
+    # Write then rename so concurrent invocations never read a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
@@ -0,0 +1,102 @@
+from gettext import gettext
+from importlib import import_module
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import click
+from click.utils import make_default_short_help
+
+from . import profile
+
+# {"command name": ("module path", "short help")}
+CommandManifest = Dict[str, Tuple[str, str]]
+
+
+class LazyCommandGroup(click.Group):
+    """
+    A top-level group that only imports a command's module when it is used.
+
+    Command names and their short help come from static manifests so listing
+    commands (e.g. `beam --help` or shell completion) never imports them.
+    Modules are expected to expose their commands the same way `CLI.register`
+    in beta9 expects them: on a "common" group, or as a "management" group.
+
+    Commands missing from the manifests, like ones added in a newer beta9, are
+    looked up in the group returned by `fallback`, which is loaded once.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        common: Optional[CommandManifest] = None,
+        management: Optional[CommandManifest] = None,
+        fallback: Optional[Callable[[], click.MultiCommand]] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.common_commands = common or {}
+        self.management_commands = management or {}
+        self.fallback = fallback
+        self._fallback_group: Optional[click.MultiCommand] = None
+
+    @property
+    def manifest(self) -> CommandManifest:
+        return {**self.common_commands, **self.management_commands}
+
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        return [*self.common_commands, *sorted(self.management_commands)]
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name in self.commands:
+            return self.commands[cmd_name]
+
+        with profile.phase(f"load {cmd_name}"):
+            if cmd_name in self.manifest:
+                command = load_command(self.manifest[cmd_name][0], cmd_name)
+            else:
+                command = self._fallback_command(ctx, cmd_name)
+        if command is not None:
+            self.add_command(command, cmd_name)
+        return command
+
+    def _fallback_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if self.fallback is None:
+            return None
+
+        if self._fallback_group is None:
+            self._fallback_group = self.fallback()
+        return self._fallback_group.get_command(ctx, cmd_name)
+
+    def format_commands(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        sections = {
+            "Common Commands": self.common_commands,
+            "Management Commands": dict(sorted(self.management_commands.items())),
+        }
+
+        for title, commands in sections.items():
+            if not commands:
+                continue
+
+            limit = formatter.width - 6 - max(len(name) for name in commands)
+            rows = [
+                (name, make_default_short_help(help, limit)) for name, (_, help) in commands.items()
+            ]
+
+            with formatter.section(gettext(title)):
+                formatter.write_dl(rows)
+
+
+def load_command(module_name: str, cmd_name: str) -> Optional[click.Command]:
+    """
+    Imports a command module and returns the command named `cmd_name`.
+    """
+    module = import_module(module_name)
+
+    if (common := getattr(module, "common", None)) is not None:
+        if command := common.commands.get(cmd_name):
+            return command
+
+    management = getattr(module, "management", None)
+    if management is not None and management.name == cmd_name:
+        return management
+
+    return None
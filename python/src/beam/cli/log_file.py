@@ -0,0 +1,159 @@
+import datetime
+import gzip
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable, List, Optional, Tuple, Union
+
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+
+EXTENSIONS = {COMPRESSION_GZIP: ".gz", COMPRESSION_ZSTD: ".zst"}
+
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+# Batches of lines waiting to be written before writers have to wait
+QUEUE_SIZE = 64
+
+
+class RotatingLogFile:
+    """
+    Writes lines to compressed files from a background thread.
+
+    Data handed to `write` is queued and compressed on the thread, so a slow
+    disk or compressor holds up the caller only once `QUEUE_SIZE` batches are
+    waiting. A new file is started once the current one holds `max_bytes`
+    of compressed data, or when data queued `max_age` seconds or more after
+    the current file was started is written. Files are named after
+    `path` with the time they were opened, e.g. `logs-20240131T120000.jsonl.gz`.
+
+    `close` writes everything queued and ends the current file properly, so
+    it should be called however the caller stops, including on Ctrl-C.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        compression: str = COMPRESSION_GZIP,
+        max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+        max_age: Optional[float] = None,
+        on_open: Optional[Callable[[Path], None]] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if compression not in EXTENSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == COMPRESSION_ZSTD:
+            import_zstandard()
+
+        self.path = Path(path).expanduser()
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.on_open = on_open
+        self.clock = clock
+        self.files: List[Path] = []
+        # Data with the time it was queued, and None to stop
+        self._queue: "queue.Queue[Optional[Tuple[float, bytes]]]" = queue.Queue(QUEUE_SIZE)
+        self._raw: Optional[BinaryIO] = None
+        self._writer: Optional[BinaryIO] = None
+        self._opened_at = 0.0
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="beam-log-file", daemon=True)
+        self._thread.start()
+
+    def write(self, data: bytes) -> None:
+        """
+        Queues data to be written. Raises the error that stopped the writer
+        thread, if any.
+        """
+        if self._error is not None:
+            raise self._error
+        if self._closed:
+            raise ValueError("write to a closed log file")
+        if data:
+            self._queue.put((self.clock(), data))
+
+    def close(self) -> None:
+        """Writes everything queued, closes the current file and stops the thread."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+    def _run(self) -> None:
+        try:
+            while (item := self._queue.get()) is not None:
+                self._write(*item)
+        except BaseException as e:
+            self._error = e
+            # Keep draining so writers waiting on a full queue aren't stuck
+            while self._queue.get() is not None:
+                pass
+        finally:
+            self._close_file()
+
+    def _write(self, queued_at: float, data: bytes) -> None:
+        if self._writer is not None and self.max_age is not None:
+            if queued_at - self._opened_at >= self.max_age:
+                self._close_file()
+
+        if self._writer is None:
+            self._open_file(queued_at)
+
+        self._writer.write(data)
+
+        if self.max_bytes is not None and self._raw.tell() >= self.max_bytes:
+            self._close_file()
+
+    def _open_file(self, opened_at: float) -> None:
+        self._opened_at = opened_at
+        path = self._next_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._raw = open(path, "xb")
+        if self.compression == COMPRESSION_ZSTD:
+            zstandard = import_zstandard()
+            self._writer = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        else:
+            self._writer = gzip.GzipFile(filename="", mode="wb", fileobj=self._raw)
+
+        self.files.append(path)
+        if self.on_open is not None:
+            self.on_open(path)
+
+    def _close_file(self) -> None:
+        try:
+            if self._writer is not None:
+                self._writer.close()
+        finally:
+            if self._raw is not None:
+                self._raw.close()
+            self._writer = None
+            self._raw = None
+
+    def _next_path(self) -> Path:
+        opened_at = datetime.datetime.fromtimestamp(self._opened_at, datetime.timezone.utc)
+        stem = f"{self.path.stem}-{opened_at:%Y%m%dT%H%M%S}"
+        suffix = f"{self.path.suffix or '.jsonl'}{EXTENSIONS[self.compression]}"
+
+        path = self.path.with_name(f"{stem}{suffix}")
+        number = 1
+        while path.exists():
+            path = self.path.with_name(f"{stem}-{number}{suffix}")
+            number += 1
+        return path
+
+
+def import_zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError(
+            "zstd compression requires zstandard. Install it with `pip install zstandard`."
+        ) from e
+    return zstandard
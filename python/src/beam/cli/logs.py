@@ -1,26 +1,176 @@
+import contextlib
 import datetime
-import json
+import heapq
+import itertools
+import queue
+import random
+import re
+import sys
+import tempfile
+import threading
 import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
 from threading import Thread
-from typing import Any, Optional, Union
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    ContextManager,
+    Deque,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 import click
 from beta9 import terminal
 from beta9.config import DEFAULT_CONTEXT_NAME, get_settings, load_config
+from rich.markup import escape
+from websockets.exceptions import ConnectionClosed
 from websockets.sync.client import ClientConnection, connect
 
-keep_alive_enabled = True
+from ..client import logs as client_logs
+from ..client.logs import (
+    HEADERS,
+    LogSource,
+    LogStreamError,
+    dumps,
+    keep_alive,
+    loads,
+    query_message,
+    stream_message,
+)
+from .log_file import COMPRESSION_GZIP, COMPRESSION_ZSTD, RotatingLogFile
+
+OUTPUT_TEXT = "text"
+OUTPUT_RAW = "raw"
+OUTPUT_JSONL = "jsonl"
+
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP = "drop"
+
+# Decoded frames waiting to be printed
+DEFAULT_BUFFER_SIZE = 1024
+
+# Most queued messages taken by the renderer at once
+RENDER_BATCH_SIZE = 256
+
+# Seconds lines from several streams are held so they print in timestamp order
+DEFAULT_REORDER_WINDOW = 0.5
+
+# Most lines held for reordering before the oldest are printed anyway
+REORDER_MAX_LINES = 10_000
+
+# Reconnect delays grow from the min to the max, with random jitter
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+RECONNECT_MAX_ATTEMPTS = 10
 
+# Most lines asked for per history query. Longer histories are fetched in
+# pages walking back in time, so no single frame has to hold all of them.
+HISTORY_PAGE_SIZE = 1000
 
-def exit_keep_alive_thread():
-    global keep_alive_enabled
-    keep_alive_enabled = False
+# Most lines asked for when filling the gap left by a dropped connection
+GAP_QUERY_SIZE = 10_000
+
+# IDs of recent lines kept to drop the ones sent again after reconnecting
+SEEN_IDS_SIZE = 10_000
+
+# Realtime object type and the log field holding its ID, by command option
+OBJECT_TYPES = {f"{name}_id": value for name, value in client_logs.OBJECT_TYPES.items()}
+
+# Log levels from least to most severe, and the names they also go by
+LOG_LEVELS = ["debug", "info", "warning", "error", "critical"]
+LOG_LEVEL_ALIASES = {"warn": "warning", "fatal": "critical"}
+
+# Finds the level of a line that has no level field, e.g. "ERROR: ..." or "- INFO -"
+LEVEL_PATTERN = re.compile(r"\b(DEBUG|INFO|WARN(?:ING)?|ERROR|CRITICAL|FATAL)\b")
+
+# Relative times accepted by --since and --until, e.g. "30s", "15m", "2h" or "1d"
+DURATION_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)([smhd])$")
+DURATION_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days"}
+
+# Sizes accepted by --rotate-size, e.g. "500KB", "100MB" or "1GB"
+SIZE_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)\s*([KMG]?)B?$", re.IGNORECASE)
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+# Lines per write to the terminal. Rich slows down on very large writes, so
+# batches are written in chunks of this size.
+RENDER_CHUNK_LINES = 100
 
 
 def get_setting_callback(ctx: click.Context, param: click.Parameter, value: Any):
     return getattr(get_settings(), param.name) if not value else value
 
 
+def pattern_callback(
+    ctx: click.Context, param: click.Parameter, value: Tuple[str, ...]
+) -> Optional[Pattern]:
+    if not value:
+        return None
+    try:
+        return re.compile("|".join(f"(?:{pattern})" for pattern in value))
+    except re.error as e:
+        raise click.BadParameter(f"Invalid regular expression: {e}")
+
+
+def time_callback(
+    ctx: click.Context, param: click.Parameter, value: Optional[str]
+) -> Optional[datetime.datetime]:
+    if not value:
+        return None
+
+    if match := DURATION_PATTERN.match(value):
+        amount, unit = match.groups()
+        delta = datetime.timedelta(**{DURATION_UNITS[unit]: float(amount)})
+        return datetime.datetime.now(datetime.timezone.utc) - delta
+
+    try:
+        return parse_timestamp(value)
+    except ValueError:
+        raise click.BadParameter(
+            "Expected a timestamp like 2024-01-31T12:00:00 or a duration like 30s, 15m, 2h or 1d."
+        )
+
+
+def duration_callback(
+    ctx: click.Context, param: click.Parameter, value: Optional[str]
+) -> Optional[float]:
+    if not value:
+        return None
+
+    match = DURATION_PATTERN.match(value)
+    if match is None:
+        raise click.BadParameter("Expected a duration like 30s, 15m, 2h or 1d.")
+
+    amount, unit = match.groups()
+    return datetime.timedelta(**{DURATION_UNITS[unit]: float(amount)}).total_seconds()
+
+
+def size_callback(
+    ctx: click.Context, param: click.Parameter, value: Optional[str]
+) -> Optional[int]:
+    if not value:
+        return None
+
+    match = SIZE_PATTERN.match(value.strip())
+    if match is None:
+        raise click.BadParameter("Expected a size like 500KB, 100MB or 1GB.")
+
+    amount, unit = match.groups()
+    return int(float(amount) * SIZE_UNITS[unit.upper()])
+
+
 @click.group()
 def common(**_):
     pass
@@ -34,25 +184,29 @@ def common(**_):
     "--stub-id",
     type=click.STRING,
     required=False,
-    help="",
+    multiple=True,
+    help="Repeat to follow several objects over one connection.",
 )
 @click.option(
     "--deployment-id",
     type=click.STRING,
     required=False,
-    help="",
+    multiple=True,
+    help="Repeat to follow several objects over one connection.",
 )
 @click.option(
     "--task-id",
     type=click.STRING,
     required=False,
-    help="",
+    multiple=True,
+    help="Repeat to follow several objects over one connection.",
 )
 @click.option(
     "--container-id",
     type=click.STRING,
     required=False,
-    help="",
+    multiple=True,
+    help="Repeat to follow several objects over one connection.",
 )
 @click.option(
     "--lines",
@@ -69,6 +223,112 @@ def common(**_):
     required=False,
     help="Include the log's timestamp.",
 )
+@click.option(
+    "--grep",
+    type=click.STRING,
+    multiple=True,
+    callback=pattern_callback,
+    help="Only show lines matching this regular expression. Repeat to match any of several.",
+)
+@click.option(
+    "--exclude",
+    type=click.STRING,
+    multiple=True,
+    callback=pattern_callback,
+    help="Hide lines matching this regular expression. Repeat to hide several.",
+)
+@click.option(
+    "--level",
+    type=click.Choice(LOG_LEVELS, case_sensitive=False),
+    required=False,
+    help="Only show lines of this level or more severe. Lines with no level are hidden.",
+)
+@click.option(
+    "--since",
+    type=click.STRING,
+    callback=time_callback,
+    help="Only show lines from this time on, a timestamp or a duration like 15m, 2h or 1d.",
+)
+@click.option(
+    "--until",
+    type=click.STRING,
+    callback=time_callback,
+    help="Only show lines before this time. When it's in the past, stops after the history.",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Choice([OUTPUT_TEXT, OUTPUT_RAW, OUTPUT_JSONL]),
+    default=OUTPUT_TEXT,
+    show_default=True,
+    help=(
+        "How to print logs. 'raw' writes plain lines and 'jsonl' one JSON object per line, "
+        "both without terminal formatting, for piping into other tools."
+    ),
+)
+@click.option(
+    "--to-file",
+    type=click.Path(dir_okay=False),
+    required=False,
+    help=(
+        "Write lines to compressed JSONL files named after this path instead of the terminal, "
+        "one record per line with its timestamp, message and object ID."
+    ),
+)
+@click.option(
+    "--rotate-size",
+    type=click.STRING,
+    default="100MB",
+    show_default=True,
+    callback=size_callback,
+    help="Start a new file once the current one reaches this compressed size.",
+)
+@click.option(
+    "--rotate-interval",
+    type=click.STRING,
+    required=False,
+    callback=duration_callback,
+    help="Start a new file after this long, e.g. 1h.",
+)
+@click.option(
+    "--compression",
+    type=click.Choice([COMPRESSION_GZIP, COMPRESSION_ZSTD]),
+    default=COMPRESSION_GZIP,
+    show_default=True,
+    help="Compression of --to-file files. zstd requires the zstandard package.",
+)
+@click.option(
+    "--reorder-window",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_REORDER_WINDOW,
+    show_default=True,
+    help="Seconds to hold lines from several objects so they print in timestamp order.",
+)
+@click.option(
+    "--reconnect/--no-reconnect",
+    default=True,
+    show_default=True,
+    help="Reconnect when the connection drops, printing any lines missed in between.",
+)
+@click.option(
+    "--overflow",
+    type=click.Choice([OVERFLOW_BLOCK, OVERFLOW_DROP]),
+    default=OVERFLOW_BLOCK,
+    show_default=True,
+    help=(
+        "What to do when logs arrive faster than they can be printed. "
+        "'block' stops reading until the terminal catches up, "
+        "'drop' skips lines and reports how many were skipped."
+    ),
+)
+@click.option(
+    "--buffer-size",
+    type=click.IntRange(min=1),
+    default=DEFAULT_BUFFER_SIZE,
+    show_default=True,
+    hidden=True,
+    help="Messages held between receiving and printing logs.",
+)
 @click.option(
     "--host",
     "realtime_host",
@@ -85,18 +345,45 @@ def common(**_):
     hidden=True,
 )
 def logs(
-    stub_id: Optional[str],
-    task_id: Optional[str],
-    deployment_id: Optional[str],
-    container_id: Optional[str],
+    stub_id: Tuple[str, ...],
+    task_id: Tuple[str, ...],
+    deployment_id: Tuple[str, ...],
+    container_id: Tuple[str, ...],
     lines: int,
     show_timestamp: bool,
+    grep: Optional[Pattern],
+    exclude: Optional[Pattern],
+    level: Optional[str],
+    since: Optional[datetime.datetime],
+    until: Optional[datetime.datetime],
+    output: str,
+    to_file: Optional[str],
+    rotate_size: Optional[int],
+    rotate_interval: Optional[float],
+    compression: str,
+    reorder_window: float,
+    reconnect: bool,
+    overflow: str,
+    buffer_size: int,
     realtime_host: str,
     config_path: str,
 ):
-    if bool(deployment_id) == bool(stub_id) == bool(task_id) == bool(container_id):
+    ids = {
+        "stub_id": stub_id,
+        "deployment_id": deployment_id,
+        "task_id": task_id,
+        "container_id": container_id,
+    }
+    sources = list(
+        dict.fromkeys(
+            LogSource(*OBJECT_TYPES[option], object_id)
+            for option, object_ids in ids.items()
+            for object_id in object_ids
+        )
+    )
+    if not sources:
         raise click.BadArgumentUsage(
-            "Must supply either --stub-id, --deployment-id, --task-id, or --container-id, but not all four."
+            "Must supply at least one --stub-id, --deployment-id, --task-id, or --container-id."
         )
 
     contexts = load_config(config_path)
@@ -104,100 +391,870 @@ def logs(
 
     websocket_params = {
         "uri": realtime_host,
-        "additional_headers": {"X-BEAM-CLIENT": "CLI"},
+        "additional_headers": HEADERS,
     }
 
-    object_id = stub_id or deployment_id or task_id or container_id
-    object_type = {
-        deployment_id: "BETA9_DEPLOYMENT",
-        stub_id: "BETA9_STUB",
-        task_id: "BETA9_TASK",
-        container_id: "BETA9_CONTAINER",
-    }.get(object_id, "")
     now = datetime.datetime.now(datetime.timezone.utc)
 
-    logs_before = json.dumps(
-        {
-            "token": context.token,
-            "streamType": "LOGS_STREAM",
-            "action": "LOGS_QUERY",
-            "stream": False,
-            "objectType": object_type,
-            "objectId": object_id,
-            "size": lines,
-            "endingTimestamp": now.isoformat(),
-        }
-    )
+    log_filter = LogFilter(grep=grep, exclude=exclude, level=level, since=since, until=until)
+    if not log_filter:
+        log_filter = None
 
-    logs_current = json.dumps(
-        {
-            "token": context.token,
-            "streamType": "LOGS_STREAM",
-            "action": "LOGS_ADD_STREAM",
-            "stream": True,
-            "objectType": object_type,
-            "objectId": object_id,
-            "startingTimestamp": now.isoformat(),
-        }
-    )
+    # The time range is also sent with the queries, so the gateway doesn't
+    # return lines that would only be filtered out here
+    history_end = min(now, until) if until else now
+    history_start = since.isoformat() if since else None
+    stream_start = max(now, since) if since else now
+
+    # Lines are only prefixed with their source when following several objects
+    multiple = len(sources) > 1
+    if to_file:
+
+        def open_log_file(path: Path) -> RotatingLogFile:
+            return RotatingLogFile(
+                path,
+                compression=compression,
+                max_bytes=rotate_size,
+                max_age=rotate_interval,
+                on_open=lambda path: click.echo(f"Writing logs to {path}", err=True),
+            )
+
+        path = Path(to_file)
+        try:
+            log_file = open_log_file(path)
+        except ImportError as e:
+            raise click.UsageError(str(e))
+        # Lines from unrecognised sources go to e.g. logs-unknown-<opened at>.jsonl.gz
+        unknown_path = path.with_name(f"{path.stem}-unknown{path.suffix}")
+        writer: LogWriter = FileLogWriter(
+            log_file, sources, open_unknown=lambda: open_log_file(unknown_path)
+        )
+    else:
+        writer = create_writer(output, show_timestamp)
+
+    # The spinner would be mixed into output meant for other programs
+    if output == OUTPUT_TEXT:
+        progress = terminal.progress("Streaming...")
+    else:
+        progress = contextlib.nullcontext()
 
-    with connect(**websocket_params) as w, terminal.progress("Streaming...") as p:
-        keep_alive = Thread(target=websocket_keep_alive, args=(w,))
-        keep_alive.start()
+    # Closing the writer flushes lines still held for files, however this ends
+    with contextlib.closing(writer), contextlib.ExitStack() as connections, progress as p:
+        stop_progress = p.stop if p is not None else lambda: None
+        w = connections.enter_context(connect(**websocket_params))
+        connections.enter_context(keep_alive.connection(w))
 
         try:
-            w.send(logs_before)
-            print_message(w.recv(), show_timestamp)
+            walks = [
+                HistoryWalk(
+                    context.token,
+                    source,
+                    lines,
+                    history_end,
+                    since=history_start,
+                    page_size=HISTORY_PAGE_SIZE,
+                    log_filter=log_filter,
+                    prefix=multiple,
+                )
+                for source in sources
+            ]
+            print_history(w, walks, writer)
         except Exception as e:
-            p.stop()
-            exit_keep_alive_thread()
+            stop_progress()
             terminal.error(str(e))
 
+        if until is not None and until <= now:
+            stop_progress()
+            return
+
+        # Entered and closed by the receiver thread, which owns reconnected connections
+        @contextlib.contextmanager
+        def resume(last_seen: Dict[LogSource, str]) -> Iterator[ClientConnection]:
+            with connect(**websocket_params) as conn, keep_alive.connection(conn):
+                resumed_at = datetime.datetime.now(datetime.timezone.utc)
+                for source in sources:
+                    since = last_seen.get(source, now.isoformat())
+                    conn.send(
+                        query_message(
+                            context.token, source, GAP_QUERY_SIZE, resumed_at, since=since
+                        )
+                    )
+                for source in sources:
+                    conn.send(stream_message(context.token, source, resumed_at))
+                yield conn
+
         try:
-            w.send(logs_current)
-            while True:
-                print_message(w.recv(), show_timestamp)
+            for source in sources:
+                w.send(stream_message(context.token, source, stream_start))
+
+            receiver = LogReceiver(
+                w,
+                queue.Queue(maxsize=buffer_size),
+                overflow=overflow,
+                sources=sources,
+                reconnect=resume if reconnect else None,
+                log_filter=log_filter,
+            )
+            receiver.start()
+            if multiple:
+                render_logs(
+                    receiver,
+                    writer,
+                    sources=sources,
+                    merger=LogMerger(window=reorder_window),
+                )
+            else:
+                render_logs(receiver, writer)
         except KeyboardInterrupt:
-            p.stop()
-            exit_keep_alive_thread()
-            terminal.print("Goodbye! 👋")
+            stop_progress()
+            writer.notice("Goodbye! 👋")
         except Exception as e:
-            p.stop()
-            exit_keep_alive_thread()
+            stop_progress()
             terminal.error(str(e))
 
 
+# A log line and the source it came from, if there are several
+LogLine = Tuple[Optional[LogSource], dict]
+
+
+def find_source(hit: dict, data: dict, sources: Sequence[LogSource]) -> Optional[LogSource]:
+    """
+    Returns the source a log line belongs to, going by the object IDs in the
+    line itself, then by the object ID of the message it came in.
+    """
+    for source in sources:
+        if source.matches(hit):
+            return source
+
+    object_id = data.get("objectId")
+    for source in sources:
+        if source.object_id == object_id:
+            return source
+    return None
+
+
+class HistoryWalk:
+    """
+    Fetches the last `lines` lines of one source in pages of at most
+    `page_size`, walking back in time from `ending_timestamp`.
+
+    Each query ends at the oldest timestamp of the page before it and asks
+    for as many more lines as were already received at that timestamp,
+    since those are sent again and skipped. The walk stops at a short page
+    or one with nothing new. Pages that hold more
+    than one are kept in a temporary file instead of in memory, and read
+    back oldest first by `lines_oldest_first`.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        source: LogSource,
+        lines: int,
+        ending_timestamp: datetime.datetime,
+        since: Optional[str] = None,
+        page_size: int = HISTORY_PAGE_SIZE,
+        log_filter: Optional["LogFilter"] = None,
+        prefix: bool = False,
+    ) -> None:
+        self.token = token
+        self.source = source
+        self.remaining = lines
+        self.ending_timestamp = ending_timestamp.isoformat()
+        self.since = since
+        self.page_size = page_size
+        self.log_filter = log_filter
+        self.prefix = prefix
+        self.done = lines <= 0
+        # Pages newest first, the first in memory and the rest spilled to disk
+        self._first_page: Optional[List[dict]] = None
+        self._spool: Optional[BinaryIO] = None
+        self._spooled_pages: List[Tuple[int, int]] = []
+        self._size = 0
+        # Lines received at the timestamp the next query ends at
+        self._boundary: Set[Hashable] = set()
+
+    def request(self) -> Optional[str]:
+        """Returns the query for the next page, or None when the walk is over."""
+        if self.done:
+            return None
+
+        self._size = min(self.page_size, self.remaining) + len(self._boundary)
+        return query_message(
+            self.token, self.source, self._size, self.ending_timestamp, since=self.since
+        )
+
+    def receive(self, data: dict) -> None:
+        """Records the response to the last query."""
+        hits = parse_hits(data)
+        new_hits = [hit for hit in hits if line_key(hit) not in self._boundary]
+        new_hits = new_hits[-self.remaining :]
+        if not new_hits:
+            self.done = True
+            return
+
+        self.remaining -= len(new_hits)
+        self.done = self.remaining <= 0 or len(hits) < self._size
+        self.ending_timestamp = new_hits[0]["_source"]["@timestamp"]
+        self._boundary = {
+            line_key(hit) for hit in hits if hit["_source"]["@timestamp"] == self.ending_timestamp
+        }
+
+        if self.log_filter is not None:
+            new_hits = [hit for hit in new_hits if self.log_filter.matches(hit)]
+        self._store(new_hits)
+
+    def _store(self, hits: List[dict]) -> None:
+        if self._first_page is None:
+            self._first_page = hits
+            return
+
+        if self._spool is None:
+            self._spool = tempfile.TemporaryFile()
+        offset = self._spool.seek(0, 2)
+        self._spool.write(b"".join(dumps(hit) + b"\n" for hit in hits))
+        self._spooled_pages.append((offset, self._spool.tell() - offset))
+
+    def lines_oldest_first(self) -> Iterator[LogLine]:
+        """Yields the lines fetched, oldest first, reading one page at a time."""
+        source = self.source if self.prefix else None
+        for offset, length in reversed(self._spooled_pages):
+            self._spool.seek(offset)
+            for line in self._spool.read(length).splitlines():
+                yield source, loads(line)
+
+        for hit in self._first_page or []:
+            yield source, hit
+
+    def close(self) -> None:
+        if self._spool is not None:
+            self._spool.close()
+
+
+def print_history(
+    conn: ClientConnection, walks: Sequence[HistoryWalk], writer: "LogWriter"
+) -> None:
+    """
+    Fetches the history of every source over `conn` and prints it as one list
+    in timestamp order.
+
+    The first page of every source is asked for at once. Further pages are
+    fetched one source at a time, since responses come back in the order
+    they were asked for.
+    """
+    try:
+        for walk in walks:
+            conn.send(walk.request())
+        for walk in walks:
+            walk.receive(loads(conn.recv()))
+
+        for walk in walks:
+            while (message := walk.request()) is not None:
+                conn.send(message)
+                walk.receive(loads(conn.recv()))
+
+        lines = heapq.merge(
+            *(walk.lines_oldest_first() for walk in walks),
+            key=lambda line: line[1]["_source"]["@timestamp"],
+        )
+        while batch := list(itertools.islice(lines, HISTORY_PAGE_SIZE)):
+            writer.write(batch)
+    finally:
+        for walk in walks:
+            walk.close()
+
+
 def print_message(msg: Union[str, bytes], show_timestamp: bool = False) -> None:
-    data = json.loads(msg)
-    if "logs" in data:
-        hits = data["logs"]["hits"]["hits"]
-    elif "error" in data:
-        exit_keep_alive_thread()
-        terminal.error(str(data["error"]).capitalize())
-    else:
+    LogWriter(show_timestamp).write([(None, hit) for hit in parse_hits(loads(msg))])
+
+
+def parse_hits(data: dict) -> List[dict]:
+    """
+    Returns the log hits of a decoded realtime message, sorted by timestamp.
+    """
+    if "logs" not in data and "error" not in data:
         terminal.warn(f"Unable to parse data: {data}")
-        return
+        return []
+
+    try:
+        return client_logs.parse_hits(data)
+    except LogStreamError as e:
+        terminal.error(str(e))
+
+
+def format_hits(hits: Iterable[dict], show_timestamp: bool = False) -> List[str]:
+    return [format_hit(hit, show_timestamp) for hit in hits]
 
-    hits = sorted(hits, key=lambda k: k["_source"]["@timestamp"])
-    for hit in hits:
-        log = hit["_source"]["msg"]
-        if show_timestamp:
-            log = f"[{hit['_source']['@timestamp']}] {log}"
-        terminal.print(log, highlight=True, end="")
 
+def format_hit(
+    hit: dict,
+    show_timestamp: bool = False,
+    source: Optional[LogSource] = None,
+    markup: bool = True,
+) -> str:
+    log = hit["_source"]["msg"]
+    if show_timestamp:
+        log = f"[{hit['_source']['@timestamp']}] {log}"
+    if source is not None:
+        prefix = f"[{source.object_id}]"
+        log = f"{escape(prefix) if markup else prefix} {log}"
+    return log
 
-def websocket_keep_alive(conn: ClientConnection, interval: int = 60):
+
+class LogWriter:
+    """
+    Prints log lines to the terminal with highlighting.
+    """
+
+    def __init__(self, show_timestamp: bool = False) -> None:
+        self.show_timestamp = show_timestamp
+
+    def write(self, lines: Sequence[LogLine]) -> None:
+        text = [format_hit(hit, self.show_timestamp, source) for source, hit in lines]
+        for i in range(0, len(text), RENDER_CHUNK_LINES):
+            terminal.print("".join(text[i : i + RENDER_CHUNK_LINES]), highlight=True, end="")
+
+    def notice(self, text: str) -> None:
+        terminal.warn(text)
+
+    def close(self) -> None:
+        pass
+
+
+class RawLogWriter(LogWriter):
+    """
+    Writes log lines as plain text to a binary stream, one write per batch.
+    Notices go to stderr so they don't mix with the lines.
+    """
+
+    def __init__(self, show_timestamp: bool = False, stream: Optional[BinaryIO] = None) -> None:
+        super().__init__(show_timestamp)
+        self.stream = stream or sys.stdout.buffer
+
+    def write(self, lines: Sequence[LogLine]) -> None:
+        if not lines:
+            return
+
+        text = "".join(
+            format_hit(hit, self.show_timestamp, source, markup=False) for source, hit in lines
+        )
+        self.stream.write(text.encode())
+        self.stream.flush()
+
+    def notice(self, text: str) -> None:
+        click.echo(text, err=True)
+
+
+class JsonlLogWriter(RawLogWriter):
+    """
+    Writes the `_source` of each log line as a JSON object per line, with the
+    ID of the object it came from in "source" when following several.
+    """
+
+    def write(self, lines: Sequence[LogLine]) -> None:
+        if not lines:
+            return
+
+        records = (
+            {**hit["_source"], "source": source.object_id} if source else hit["_source"]
+            for source, hit in lines
+        )
+        self.stream.write(b"".join(dumps(record) + b"\n" for record in records))
+        self.stream.flush()
+
+
+class FileLogWriter(LogWriter):
+    """
+    Writes a JSON record per log line, with its timestamp, message and the
+    object it came from, to a RotatingLogFile. When one of `sources` is
+    followed, lines without a source came from it. When several are, lines
+    whose source wasn't recognised go to a separate file, opened by
+    `open_unknown` the first time there is one, rather than being put down to
+    the wrong object.
+    """
+
+    def __init__(
+        self,
+        log_file: RotatingLogFile,
+        sources: Sequence[LogSource],
+        open_unknown: Optional[Callable[[], RotatingLogFile]] = None,
+    ) -> None:
+        super().__init__()
+        self.log_file = log_file
+        self.default_source = sources[0] if len(sources) == 1 else None
+        self.open_unknown = open_unknown
+        self.unknown_file: Optional[RotatingLogFile] = None
+
+    def write(self, lines: Sequence[LogLine]) -> None:
+        if not lines:
+            return
+
+        records = []
+        unknown = []
+        for source, hit in lines:
+            source = source or self.default_source
+            record = {
+                "timestamp": hit["_source"]["@timestamp"],
+                "message": hit["_source"].get("msg", ""),
+                "object_type": source.object_type if source else None,
+                "object_id": source.object_id if source else None,
+            }
+            (records if source else unknown).append(dumps(record))
+
+        if records:
+            records.append(b"")
+            self.log_file.write(b"\n".join(records))
+        if unknown:
+            if self.unknown_file is None:
+                if self.open_unknown is None:
+                    raise ValueError("Received log lines from an unknown source")
+                self.unknown_file = self.open_unknown()
+            unknown.append(b"")
+            self.unknown_file.write(b"\n".join(unknown))
+
+    def notice(self, text: str) -> None:
+        click.echo(text, err=True)
+
+    def close(self) -> None:
+        try:
+            self.log_file.close()
+        finally:
+            if self.unknown_file is not None:
+                self.unknown_file.close()
+
+
+def create_writer(output: str, show_timestamp: bool = False) -> LogWriter:
+    if output == OUTPUT_RAW:
+        return RawLogWriter(show_timestamp)
+    if output == OUTPUT_JSONL:
+        return JsonlLogWriter(show_timestamp)
+    return LogWriter(show_timestamp)
+
+
+def parse_timestamp(value: str) -> datetime.datetime:
+    """
+    Parses an ISO 8601 timestamp as sent by the gateway, which may end in "Z"
+    and have nanoseconds. Timestamps without a timezone are taken as UTC.
+    """
+    value = value.strip()
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    # Before Python 3.11, fromisoformat only takes fractions of exactly 3 or 6 digits
+    value = re.sub(r"\.(\d+)", lambda m: "." + m.group(1)[:6].ljust(6, "0"), value)
+
+    timestamp = datetime.datetime.fromisoformat(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+    return timestamp
+
+
+def get_level(log: dict) -> Optional[str]:
+    """
+    Returns the level of a line's `_source`, from its level field or the first
+    level name in its message, or None if it has neither.
+    """
+    level = log.get("level")
+    if not level:
+        match = LEVEL_PATTERN.search(log.get("msg", ""))
+        if match is None:
+            return None
+        level = match.group(1)
+
+    level = str(level).lower()
+    return LOG_LEVEL_ALIASES.get(level, level)
+
+
+class LogFilter:
+    """
+    Decides which log lines are shown, going by their `_source` fields.
+
+    Lines are kept if their message matches `grep` and doesn't match
+    `exclude`, their level is at least `level`, and their timestamp is
+    within [`since`, `until`). Checks are ordered cheapest first and nothing
+    is formatted for lines that are dropped. A filter with no conditions is
+    falsy.
+    """
+
+    def __init__(
+        self,
+        grep: Optional[Pattern] = None,
+        exclude: Optional[Pattern] = None,
+        level: Optional[str] = None,
+        since: Optional[datetime.datetime] = None,
+        until: Optional[datetime.datetime] = None,
+    ) -> None:
+        self.grep = grep
+        self.exclude = exclude
+        self.min_level = LOG_LEVELS.index(level.lower()) if level else None
+        self.since = since
+        self.until = until
+
+    def __bool__(self) -> bool:
+        return any(
+            condition is not None
+            for condition in (self.grep, self.exclude, self.min_level, self.since, self.until)
+        )
+
+    def matches(self, hit: dict) -> bool:
+        log = hit["_source"]
+        if self.since is not None or self.until is not None:
+            try:
+                timestamp = parse_timestamp(log["@timestamp"])
+            except (KeyError, ValueError):
+                return False
+            if self.since is not None and timestamp < self.since:
+                return False
+            if self.until is not None and timestamp >= self.until:
+                return False
+
+        msg = log.get("msg", "")
+        if self.grep is not None and not self.grep.search(msg):
+            return False
+        if self.exclude is not None and self.exclude.search(msg):
+            return False
+
+        if self.min_level is not None:
+            level = get_level(log)
+            if level not in LOG_LEVELS or LOG_LEVELS.index(level) < self.min_level:
+                return False
+
+        return True
+
+    def apply(self, data: dict) -> dict:
+        """Drops the lines of a decoded realtime message that don't match."""
+        hits = data.get("logs", {}).get("hits", {}).get("hits")
+        if hits:
+            data["logs"]["hits"]["hits"] = [hit for hit in hits if self.matches(hit)]
+        return data
+
+
+class LogMerger:
+    """
+    Merges log lines from several streams into timestamp order.
+
+    Lines are held for `window` seconds after they arrive, so a line that is
+    a little late on one stream still prints before newer lines from the
+    others. Each stream is kept as its own heap and the next line is picked
+    from the stream heads with a k-way merge. If more than `max_lines` are
+    held, the oldest are released without waiting.
+    """
+
+    def __init__(
+        self,
+        window: float = DEFAULT_REORDER_WINDOW,
+        max_lines: int = REORDER_MAX_LINES,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.window = window
+        self.max_lines = max_lines
+        self.clock = clock
+        # source -> heap of (timestamp, sequence, arrival, hit)
+        self._streams: Dict[Any, list] = {}
+        # (timestamp, sequence, source) of the oldest line of each stream
+        self._heads: list = []
+        self._counter = itertools.count()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def push(self, source: Any, hit: dict) -> None:
+        stream = self._streams.setdefault(source, [])
+        entry = (hit["_source"]["@timestamp"], next(self._counter), self.clock(), hit)
+        heapq.heappush(stream, entry)
+        self._size += 1
+
+        # A new oldest line needs its own head; the old head is skipped when popped
+        if stream[0] is entry:
+            heapq.heappush(self._heads, (entry[0], entry[1], source))
+
+    def wait_time(self) -> Optional[float]:
+        """
+        Returns the seconds until `pop` can release the next line, or None if
+        no lines are held.
+        """
+        self._drop_stale_heads()
+        if not self._heads:
+            return None
+
+        _, _, source = self._heads[0]
+        arrival = self._streams[source][0][2]
+        return max(0.0, arrival + self.window - self.clock())
+
+    def _drop_stale_heads(self) -> None:
+        while self._heads:
+            _, sequence, source = self._heads[0]
+            stream = self._streams[source]
+            if stream and stream[0][1] == sequence:
+                return
+            heapq.heappop(self._heads)
+
+    def pop(self, flush: bool = False) -> List[Tuple[Any, dict]]:
+        """
+        Returns the lines that are ready to print, oldest first. With `flush`,
+        every held line is returned.
+        """
+        ready = []
+        now = self.clock()
+        while True:
+            self._drop_stale_heads()
+            if not self._heads:
+                break
+
+            _, _, source = self._heads[0]
+            stream = self._streams[source]
+            _, _, arrival, hit = stream[0]
+            if not flush and self._size <= self.max_lines and arrival + self.window > now:
+                break
+
+            heapq.heappop(self._heads)
+            heapq.heappop(stream)
+            self._size -= 1
+            ready.append((source, hit))
+            if stream:
+                heapq.heappush(self._heads, (stream[0][0], stream[0][1], source))
+
+        return ready
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Returns a random delay between zero and `RECONNECT_MIN_DELAY` doubled for
+    each attempt, capped at `RECONNECT_MAX_DELAY` ("full jitter").
+    """
+    return random.uniform(0, min(RECONNECT_MAX_DELAY, RECONNECT_MIN_DELAY * 2**attempt))
+
+
+@dataclass
+class LogNotice:
+    """A message from the receiver for the renderer to print."""
+
+    text: str
+
+
+def line_key(hit: dict) -> Hashable:
+    """Identifies a log line by its ID, or its timestamp and message if it has none."""
+    return hit.get("_id") or (hit["_source"]["@timestamp"], hit["_source"].get("msg"))
+
+
+class SeenLines:
+    """
+    Remembers the IDs of the last `size` log lines, so lines sent again
+    after a reconnect can be skipped. Lines without an ID are identified by
+    their timestamp and message.
+    """
+
+    def __init__(self, size: int = SEEN_IDS_SIZE) -> None:
+        self.size = size
+        self._order: Deque[Hashable] = deque()
+        self._ids: Set[Hashable] = set()
+
+    def add(self, hit: dict) -> bool:
+        """Returns False if the line was already seen."""
+        key = line_key(hit)
+        if key in self._ids:
+            return False
+
+        self._ids.add(key)
+        self._order.append(key)
+        if len(self._order) > self.size:
+            self._ids.discard(self._order.popleft())
+        return True
+
+
+class LogReceiver(Thread):
+    """
+    Reads messages from a websocket and queues them for `render_logs`, so
+    slow terminal output never holds up reading from the connection.
+
+    With the "block" overflow policy, a full queue stops the receiver until
+    the renderer catches up. With "drop", messages that don't fit are
+    discarded and their lines counted in `skipped`. When the connection ends,
+    the exception that ended it is queued last.
+
+    If `reconnect` is set, a dropped connection is replaced by calling it
+    with the timestamp of the last line seen from each of `sources`, after
+    a jittered exponential backoff. It should return a context manager for a
+    connection that replays the lines since then and follows the live
+    streams again. The receiver enters it on its own thread and exits it
+    once the connection is replaced or the receiver stops. Lines seen before
+    are skipped. After `max_attempts` reconnects in a row without
+    a new line, the last connection error is queued instead.
+
+    Lines that don't match `log_filter` are dropped before they are queued.
+    """
+
+    def __init__(
+        self,
+        conn: ClientConnection,
+        log_queue: "queue.Queue[Union[dict, LogNotice, BaseException]]",
+        overflow: str = OVERFLOW_BLOCK,
+        sources: Sequence[LogSource] = (),
+        reconnect: Optional[
+            Callable[[Dict[LogSource, str]], ContextManager[ClientConnection]]
+        ] = None,
+        max_attempts: int = RECONNECT_MAX_ATTEMPTS,
+        log_filter: Optional[LogFilter] = None,
+    ) -> None:
+        super().__init__(daemon=True)
+        self.conn = conn
+        self.queue = log_queue
+        self.overflow = overflow
+        self.sources = sources
+        self.reconnect = reconnect
+        self.max_attempts = max_attempts
+        self.log_filter = log_filter
+        self.last_seen: Dict[LogSource, str] = {}
+        self.seen = SeenLines()
+        self._skipped = 0
+        self._lock = threading.Lock()
+
+    def run(self) -> None:
+        # Closes the reconnected connection, if any, however the receiver stops
+        with contextlib.ExitStack() as resumed:
+            self._receive(resumed)
+
+    def _receive(self, resumed: contextlib.ExitStack) -> None:
+        # Reconnects in a row that haven't received any new lines yet
+        attempts = 0
+        while True:
+            try:
+                while True:
+                    data = self.track(loads(self.conn.recv()))
+                    if attempts and data.get("logs", {}).get("hits", {}).get("hits"):
+                        attempts = 0
+                    if self.log_filter is not None:
+                        data = self.log_filter.apply(data)
+                    self.put(data)
+            except (ConnectionClosed, OSError) as e:
+                error = e
+            except BaseException as e:
+                self.queue.put(e)
+                return
+
+            while True:
+                if self.reconnect is None or attempts >= self.max_attempts:
+                    self.queue.put(error)
+                    return
+
+                self.queue.put(LogNotice(f"Connection lost ({error}), reconnecting..."))
+                time.sleep(backoff_delay(attempts))
+                attempts += 1
+                try:
+                    # Closes the connection that was dropped before opening the next
+                    resumed.close()
+                    self.conn = resumed.enter_context(self.reconnect(dict(self.last_seen)))
+                    break
+                except (ConnectionClosed, OSError) as e:
+                    error = e
+                except BaseException as e:
+                    self.queue.put(e)
+                    return
+
+    def track(self, data: dict) -> dict:
+        """
+        Drops lines that were already received and records the newest
+        timestamp seen from each source.
+        """
+        hits = data.get("logs", {}).get("hits", {}).get("hits")
+        if not hits:
+            return data
+
+        new_hits = []
+        for hit in hits:
+            if not self.seen.add(hit):
+                continue
+
+            new_hits.append(hit)
+            source = find_source(hit, data, self.sources)
+            if source is None and len(self.sources) == 1:
+                source = self.sources[0]
+            if source is not None:
+                timestamp = hit["_source"]["@timestamp"]
+                if timestamp > self.last_seen.get(source, ""):
+                    self.last_seen[source] = timestamp
+
+        data["logs"]["hits"]["hits"] = new_hits
+        return data
+
+    def put(self, data: dict) -> None:
+        if self.overflow == OVERFLOW_BLOCK:
+            self.queue.put(data)
+            return
+
+        try:
+            self.queue.put_nowait(data)
+        except queue.Full:
+            with self._lock:
+                self._skipped += len(data.get("logs", {}).get("hits", {}).get("hits", []))
+
+    def take_skipped(self) -> int:
+        """Returns the number of lines dropped since the last call."""
+        with self._lock:
+            skipped, self._skipped = self._skipped, 0
+        return skipped
+
+
+def render_logs(
+    receiver: LogReceiver,
+    writer: Optional[LogWriter] = None,
+    batch_size: int = RENDER_BATCH_SIZE,
+    sources: Sequence[LogSource] = (),
+    merger: Optional[LogMerger] = None,
+) -> None:
     """
-    Keeps the websocket connection alive until `keep_alive_enabled`
-    is set to `False`.
+    Prints the messages queued by `receiver` until the connection ends, then
+    raises the exception that ended it.
 
-    Args:
-        conn: A websocket client connection.
-        interval: Number of seconds between sending pings.
+    Every message waiting in the queue, up to `batch_size`, is formatted and
+    handed to `writer` at once rather than one line at a time. With a
+    `merger`, lines are prefixed with their source and printed in timestamp
+    order across `sources`.
     """
-    while keep_alive_enabled:
-        conn.ping()
-        for _ in range(interval):
-            if not keep_alive_enabled:
+    writer = writer or LogWriter()
+    while True:
+        batch = []
+        try:
+            timeout = merger.wait_time() if merger is not None else None
+            batch.append(receiver.queue.get(timeout=timeout))
+        except queue.Empty:
+            pass
+
+        while batch and len(batch) < batch_size:
+            try:
+                batch.append(receiver.queue.get_nowait())
+            except queue.Empty:
+                break
+
+        if skipped := receiver.take_skipped():
+            writer.notice(f"{skipped} lines skipped")
+
+        lines: List[LogLine] = []
+        notices = []
+        error = None
+        for data in batch:
+            if isinstance(data, BaseException):
+                error = data
                 break
-            time.sleep(0.5)
+
+            if isinstance(data, LogNotice):
+                notices.append(data.text)
+                continue
+
+            if merger is None:
+                lines.extend((None, hit) for hit in parse_hits(data))
+                continue
+
+            for hit in parse_hits(data):
+                merger.push(find_source(hit, data, sources), hit)
+
+        if merger is not None:
+            lines.extend(merger.pop(flush=error is not None))
+
+        writer.write(lines)
+
+        for text in notices:
+            writer.notice(text)
+
+        if error is not None:
+            raise error
@@ -1,4 +1,5 @@
 import os
+import shutil
 import sys
 from dataclasses import dataclass
 from gettext import gettext as _
@@ -6,9 +7,9 @@ from pathlib import Path
 
 import click
 from beta9 import config
-from beta9.cli.main import load_cli
 
-from . import configure, example, login, logs, quickstart, utils
+from . import profile
+from .lazy import LazyCommandGroup
 
 
 @dataclass
@@ -16,11 +17,6 @@ class SDKSettings(config.SDKSettings):
     realtime_host: str = os.getenv("REALTIME_HOST", "wss://rt.beam.cloud")
 
 
-# Check if the command is "configure" - skip config check for configure command
-check_config = os.getenv("BEAM_TOKEN") is None and not (
-    len(sys.argv) > 1 and sys.argv[1] == "configure"
-)
-
 settings = SDKSettings(
     name="Beam",
     api_host=os.getenv("API_HOST", "app.beam.cloud"),
@@ -32,24 +28,118 @@ settings = SDKSettings(
     use_defaults_in_prompt=True,
 )
 
+config.set_settings(settings)
+click.formatting.FORCED_WIDTH = shutil.get_terminal_size().columns
 
-cli = load_cli(settings=settings, check_config=check_config)
-cli.register(configure)
-cli.register(quickstart)
-cli.register(login)
-cli.register(logs)
-cli.register(example)
-cli.load_version("beam-client")
+# Commands are imported only when they run. Listing them (`beam --help`, shell
+# completion) is served from these manifests, which tests/cli/test_main.py keeps
+# in sync with the command modules. Commands that a newer beta9 adds still run,
+# from beta9's full CLI, until they're added here.
+COMMON_COMMANDS = {
+    "deploy": ("beta9.cli.deployment", "Deploy a function, web service, or container."),
+    "db": ("beta9.cli.database", "Create and manage database services."),
+    "serve": ("beta9.cli.serve", "Serve a function."),
+    "ls": ("beta9.cli.volume", "List contents in a volume."),
+    "cp": ("beta9.cli.volume", "Upload or download contents to or from a volume."),
+    "rm": ("beta9.cli.volume", "Remove content from a volume."),
+    "mv": (
+        "beta9.cli.volume",
+        "Move a file or directory to a new location within the same volume.",
+    ),
+    "shell": ("beta9.cli.shell", "Connect to a container with the same config as your handler."),
+    "run": ("beta9.cli.run", "Run a container."),
+    "dev": ("beta9.cli.dev", "Spins up a remote environment to develop in."),
+    "configure": ("beam.cli.configure", "Configure a beam context"),
+    "quickstart": ("beam.cli.quickstart", "Get started fast with the quickstart example."),
+    "login": ("beam.cli.login", "Login from dashboard"),
+    "logs": ("beam.cli.logs", "Follow logs of a stub, deployment, task, or container."),
+    "create-app": ("beam.cli.example", "Downloads an example app."),
+}
 
+MANAGEMENT_COMMANDS = {
+    "task": ("beta9.cli.task", "Manage tasks."),
+    "deployment": ("beta9.cli.deployment", "Manage deployments."),
+    "volume": ("beta9.cli.volume", "Manage volumes."),
+    "disk": (
+        "beta9.cli.disk",
+        "Manage disks (durable, fixed-size block storage on local SSD/NVMe).",
+    ),
+    "config": ("beta9.cli.config", "Manage configuration contexts."),
+    "pool": (
+        "beta9.cli.pool",
+        "Manage compute pools (named groups of machines): create pools, join your own "
+        "hardware, and scale or extend reserved capacity.",
+    ),
+    "container": ("beta9.cli.container", "Manage containers."),
+    "machine": (
+        "beta9.cli.machine",
+        "Browse GPU inventory, reserve and release on-demand hardware, and operate machines.",
+    ),
+    "secret": ("beta9.cli.secret", "Manage secrets"),
+    "token": ("beta9.cli.token", "Manage tokens."),
+    "worker": ("beta9.cli.worker", "Inspect and maintain workers visible to the current profile."),
+    "example": ("beam.cli.example", "Manage example apps."),
+}
 
-_cli = cli
 
+def load_beta9_cli() -> click.MultiCommand:
+    from beta9.cli.main import load_cli
 
-def cli():
-    utils.check_version()
+    return load_cli(check_config=False, settings=settings).common_group
+
+
+@click.group(
+    cls=LazyCommandGroup,
+    common=COMMON_COMMANDS,
+    management=MANAGEMENT_COMMANDS,
+    fallback=load_beta9_cli,
+    context_settings=dict(help_option_names=["-h", "--help"], show_default=True),
+)
+@click.option(
+    "-c",
+    "--context",
+    default=config.DEFAULT_CONTEXT_NAME,
+    required=False,
+    help="The config context to use.",
+)
+@click.option(
+    "--profile-startup",
+    is_flag=True,
+    hidden=True,
+    help="Print how long each phase of startup and each import took.",
+)
+@click.version_option(package_name="beam-client")
+@click.pass_context
+def _cli(ctx: click.Context, **_):
+    # Only runs when a subcommand is about to run, so `--help` and `--version`
+    # skip the version check and the first-run config prompt.
+    with profile.phase("check version"):
+        from . import utils
 
+        utils.check_version()
+
+    # Skip the config check for the configure command
+    if os.getenv("BEAM_TOKEN") is None and ctx.invoked_subcommand != "configure":
+        with profile.phase("check config"):
+            check_config()
+
+
+def check_config() -> None:
+    if os.getenv("CI"):
+        return
+
+    if config.is_config_empty(settings.config_path):
+        from beta9.channel import prompt_first_auth
+
+        prompt_first_auth(settings)
+
+
+def cli():
+    profile.mark("import beam.cli.main")
     try:
-        if exit_code := _cli(standalone_mode=False):
+        with profile.phase("run"):
+            exit_code = _cli(prog_name=settings.name.lower(), standalone_mode=False)
+        if exit_code:
             sys.exit(exit_code)
     except (EOFError, KeyboardInterrupt) as e:
         click.echo(file=sys.stderr)
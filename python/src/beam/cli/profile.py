@@ -0,0 +1,278 @@
+import atexit
+import contextlib
+import json
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional
+
+# Imports faster than this are left out of the report, but not of dumped profiles
+MIN_REPORT_MS = 1.0
+
+# Slowest imports by self time listed in the report
+TOP_IMPORTS = 15
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# The running profiler, if startup is being profiled
+profiler: Optional["StartupProfiler"] = None
+
+
+@dataclass
+class Span:
+    name: str
+    start: float
+    end: float = 0.0
+    children: List["Span"] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @property
+    def self_time(self) -> float:
+        return self.duration - sum(child.duration for child in self.children)
+
+
+class ImportTimer:
+    """
+    A meta path finder that times imports. It finds modules with the finders
+    after it and wraps their loaders, so a module's time covers finding it and
+    running it, including the modules it imports.
+    """
+
+    def __init__(self, profiler: "StartupProfiler") -> None:
+        self.profiler = profiler
+        self._found: Dict[str, float] = {}
+
+    def find_spec(self, fullname: str, path: Any, target: Any = None) -> Any:
+        start = self.profiler.clock()
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, "find_spec", None)
+            if finder is self or find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        if hasattr(spec.loader, "exec_module") and not isinstance(spec.loader, type):
+            self._found[fullname] = start
+            spec.loader = TimedLoader(spec.loader, self)
+        return spec
+
+    def run(self, name: str, exec_module: Callable[[], None]) -> None:
+        with self.profiler.span(
+            self.profiler.imports_of_thread(), name, self._found.pop(name, None)
+        ):
+            exec_module()
+
+
+class TimedLoader:
+    def __init__(self, loader: Any, timer: ImportTimer) -> None:
+        self.loader = loader
+        self.timer = timer
+
+    def create_module(self, spec: Any) -> Any:
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module: Any) -> None:
+        # Modules only ever see their real loader
+        module.__loader__ = self.loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self.loader
+        self.timer.run(module.__name__, lambda: self.loader.exec_module(module))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.loader, name)
+
+
+class StartupProfiler:
+    """
+    Records how long the CLI spends in each phase of a run, and in importing
+    each module, as trees of Spans.
+
+    Phases are recorded with `phase` and `mark`, on the main thread. Imports
+    are recorded on every thread while the profiler is started.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.clock = clock
+        self.started_at = clock()
+        self.stopped_at = 0.0
+        self.phases: List[Span] = []
+        self.imports: Dict[str, List[Span]] = {}
+        self._last_mark = self.started_at
+        self._stacks = threading.local()
+        self._timer = ImportTimer(self)
+
+    def start(self) -> None:
+        sys.meta_path.insert(0, self._timer)
+
+    def stop(self) -> None:
+        if self._timer in sys.meta_path:
+            sys.meta_path.remove(self._timer)
+        self.stopped_at = self.clock()
+
+    @property
+    def duration(self) -> float:
+        return (self.stopped_at or self.clock()) - self.started_at
+
+    def phase(self, name: str) -> ContextManager[Span]:
+        return self.span(self.phases, name)
+
+    def mark(self, name: str) -> None:
+        """Records the time since the previous mark, or the start, as a phase."""
+        now = self.clock()
+        self.phases.append(Span(name, self._last_mark, now))
+        self._last_mark = now
+
+    def imports_of_thread(self) -> List[Span]:
+        name = threading.current_thread().name
+        return self.imports.setdefault(name, [])
+
+    @contextlib.contextmanager
+    def span(self, roots: List[Span], name: str, start: Optional[float] = None) -> Iterator[Span]:
+        # One stack per thread and tree
+        stacks = self._stacks.__dict__.setdefault("stacks", {})
+        stack = stacks.setdefault(id(roots), [])
+
+        span = Span(name, self.clock() if start is None else start)
+        (stack[-1].children if stack else roots).append(span)
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            stack.pop()
+            span.end = self.clock()
+
+    def report(self) -> str:
+        """Returns the phases and imports as text, slowest first."""
+        lines = [f"beam startup profile: {self.duration * 1000:.1f} ms", "", "Phases (ms)"]
+        lines += format_spans(self.phases, min_ms=0)
+
+        for thread, roots in self.imports.items():
+            total = sum(span.duration for span in roots)
+            lines += [
+                "",
+                f"Imports on {thread}: {total * 1000:.1f} ms (cumulative, self ms; "
+                f"under {MIN_REPORT_MS:g} ms left out)",
+            ]
+            lines += format_spans(roots, min_ms=MIN_REPORT_MS, self_time=True)
+
+        flat = [span for roots in self.imports.values() for span in walk(roots)]
+        if flat:
+            lines += ["", "Slowest imports by self time (ms)"]
+            for span in sorted(flat, key=lambda s: s.self_time, reverse=True)[:TOP_IMPORTS]:
+                lines.append(f"{span.self_time * 1000:9.1f}  {span.name}")
+        return "\n".join(lines)
+
+    def speedscope(self) -> dict:
+        """Returns the phases and the imports of each thread as a speedscope profile."""
+        frames: List[Dict[str, str]] = []
+        frame_ids: Dict[str, int] = {}
+
+        def frame(name: str) -> int:
+            if name not in frame_ids:
+                frame_ids[name] = len(frames)
+                frames.append({"name": name})
+            return frame_ids[name]
+
+        def profile(name: str, roots: List[Span]) -> dict:
+            events: List[dict] = []
+
+            def add(span: Span) -> None:
+                events.append({"type": "O", "frame": frame(span.name), "at": self._ms(span.start)})
+                for child in span.children:
+                    add(child)
+                events.append({"type": "C", "frame": frame(span.name), "at": self._ms(span.end)})
+
+            for span in roots:
+                add(span)
+            return {
+                "type": "evented",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": self._ms(self.started_at + self.duration),
+                "events": events,
+            }
+
+        profiles = [profile("Phases", self.phases)]
+        profiles += [
+            profile(f"Imports ({thread})", roots) for thread, roots in self.imports.items()
+        ]
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": "beam startup",
+            "exporter": "beam-client",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+    def _ms(self, at: float) -> float:
+        return round((at - self.started_at) * 1000, 3)
+
+
+def walk(spans: List[Span]) -> Iterator[Span]:
+    for span in spans:
+        yield span
+        yield from walk(span.children)
+
+
+def format_spans(
+    spans: List[Span], min_ms: float, self_time: bool = False, depth: int = 0
+) -> List[str]:
+    """Formats a tree of spans, each level sorted by duration, slowest first."""
+    lines = []
+    for span in sorted(spans, key=lambda s: s.duration, reverse=True):
+        if span.duration * 1000 < min_ms:
+            continue
+
+        times = f"{span.duration * 1000:9.1f}"
+        if self_time:
+            times += f" {span.self_time * 1000:7.1f}"
+        lines.append(f"{times}  {'  ' * depth}{span.name}")
+        lines += format_spans(span.children, min_ms, self_time, depth + 1)
+    return lines
+
+
+def start(output: Optional[str] = None) -> StartupProfiler:
+    """
+    Starts profiling until the process exits. The report is then printed to
+    stderr, or a speedscope profile written to `output` when it's a path.
+    """
+    global profiler
+    profiler = StartupProfiler()
+    profiler.start()
+    atexit.register(finish, profiler, output)
+    return profiler
+
+
+def finish(profiler: StartupProfiler, output: Optional[str] = None) -> None:
+    profiler.stop()
+    if output:
+        Path(output).write_text(json.dumps(profiler.speedscope()))
+        print(
+            f"Wrote startup profile to {output}, open it at https://www.speedscope.app",
+            file=sys.stderr,
+        )
+    else:
+        print(profiler.report(), file=sys.stderr)
+
+
+def phase(name: str) -> ContextManager[Any]:
+    """Records a phase of the run, when startup is being profiled."""
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.phase(name)
+
+
+def mark(name: str) -> None:
+    """Records the time since the previous mark as a phase, when startup is being profiled."""
+    if profiler is not None:
+        profiler.mark(name)
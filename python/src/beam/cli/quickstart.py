@@ -1,7 +1,10 @@
+from pathlib import Path
+
 import click
-import requests
 from beta9 import terminal
 
+QUICKSTART_PATH = Path("01_getting_started/quickstart.py")
+
 
 @click.group()
 def common(**_):
@@ -10,13 +13,14 @@ def common(**_):
 
 @common.command(name="quickstart", help="Get started fast with the quickstart example.")
 def quickstart():
-    quickstart_raw_url = "https://raw.githubusercontent.com/beam-cloud/examples/main/01_getting_started/quickstart.py"
+    from . import example
 
     terminal.header("Downloading quickstart example...")
 
-    response = requests.get(quickstart_raw_url)
-
-    with open("quickstart.py", "w+") as f:
-        f.write(response.text)
+    with example.download_repo(example.repo_archive_uri) as archive:
+        file = archive.find(QUICKSTART_PATH)
+        if file is None:
+            return terminal.error(f"Quickstart example not found in repository {example.repo_uri}.")
+        archive.extract(file, Path("quickstart.py"))
 
     terminal.success("Quickstart example downloaded to quickstart.py.")
@@ -1,26 +1,115 @@
+import atexit
+import json
 import os
 import sys
+import tempfile
+import time
 from importlib import metadata
+from pathlib import Path
+from threading import Thread
+from typing import Optional
 
 import click
-import requests
 from packaging import version
 
 BASE_API_URL = os.getenv("BASE_API_URL", "https://api.beam.cloud")
 
+VERSION_CHECK_CACHE_PATH = Path("~/.beam/cache/minimum-cli-version.json").expanduser()
+VERSION_CHECK_TTL = int(os.getenv("BEAM_VERSION_CHECK_TTL", 3600))
+VERSION_CHECK_TIMEOUT = 5
+# How long exiting waits for a refresh still in flight, so short commands
+# still update the cache
+VERSION_CHECK_EXIT_WAIT = 0.5
 
-def check_version():
+
+def check_version() -> Optional[Thread]:
+    """
+    Exits if this CLI is older than the minimum supported version.
+
+    The minimum version is read from a local cache. When the cache is missing or
+    older than VERSION_CHECK_TTL, it is refreshed in a background thread so the
+    command never waits on the network; the new value applies on the next run.
+    At exit, the refresh is given up to VERSION_CHECK_EXIT_WAIT seconds to finish.
+
+    Returns:
+        The refresh thread, if one was started.
+    """
+    cache = read_version_cache()
+
+    refresh = None
+    if cache is None or time.time() - cache.get("checked_at", 0) > VERSION_CHECK_TTL:
+        refresh = Thread(
+            target=refresh_version_cache,
+            args=(cache, VERSION_CHECK_CACHE_PATH),
+            daemon=True,
+        )
+        refresh.start()
+        atexit.register(refresh.join, VERSION_CHECK_EXIT_WAIT)
+
+    if cache and cache.get("version"):
+        enforce_minimum_version(cache["version"])
+
+    return refresh
+
+
+def read_version_cache(path: Optional[Path] = None) -> Optional[dict]:
     try:
-        response = requests.get(f"{BASE_API_URL}/v2/api/minimum-cli-version/", timeout=1)
-        response.raise_for_status()
+        return json.loads((path or VERSION_CHECK_CACHE_PATH).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def write_version_cache(data: dict, path: Optional[Path] = None) -> None:
+    path = path or VERSION_CHECK_CACHE_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Write then rename so concurrent invocations never read a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
 
-        data = response.json()
-        if "version" not in data:
-            return
+
+def refresh_version_cache(cache: Optional[dict] = None, path: Optional[Path] = None) -> None:
+    """
+    Fetches the minimum CLI version and stores it in the cache.
+
+    A cached ETag is sent as If-None-Match so an unchanged version costs an
+    empty 304 response. Network errors leave the cache untouched.
+    """
+    import requests
+
+    headers = {}
+    if cache and cache.get("etag"):
+        headers["If-None-Match"] = cache["etag"]
+
+    try:
+        response = requests.get(
+            f"{BASE_API_URL}/v2/api/minimum-cli-version/",
+            headers=headers,
+            timeout=VERSION_CHECK_TIMEOUT,
+        )
+        if response.status_code == 304 and cache:
+            data = dict(cache)
+        else:
+            response.raise_for_status()
+            body = response.json()
+            if "version" not in body:
+                return
+            data = {"version": body["version"], "etag": response.headers.get("ETag")}
+
+        data["checked_at"] = time.time()
+        write_version_cache(data, path)
     except Exception:
         return
 
-    minimum_version = version.parse(data["version"])
+
+def enforce_minimum_version(minimum: str) -> None:
+    try:
+        minimum_version = version.parse(minimum)
+    except version.InvalidVersion:
+        return
+
     current_version = version.parse(metadata.version("beam-client"))
 
     if current_version >= minimum_version:
@@ -0,0 +1,530 @@
+import asyncio
+import base64
+import datetime
+import functools
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Optional, TypeVar, Union
+
+from beta9.config import get_config_context
+from beta9.exceptions import DeploymentNotFoundError, TaskNotFoundError, WorkspaceNotFoundError
+from beta9.type import TaskStatus
+
+try:
+    import httpx
+except ImportError as e:
+    raise ImportError(
+        "AsyncClient requires httpx. Install it with `pip install 'beam-client[async]'`."
+    ) from e
+
+from . import settings
+from .cache import DeploymentCache
+from .download import (
+    CHUNK_SIZE,
+    DownloadResult,
+    ProgressCallback,
+    _content_range_total,
+    read_state,
+    response_validator,
+    resume_headers,
+    resume_offset,
+    verify_checksum,
+    write_state,
+)
+from .session import DEFAULT_TIMEOUT, Timeout
+
+if TYPE_CHECKING:
+    from .logs import LogRecord
+
+DEFAULT_POOL_SIZE = 100
+
+T = TypeVar("T")
+
+
+async def run_blocking(func: Callable[..., T], *args: Any) -> T:
+    """Runs blocking file I/O in the default executor, off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args))
+
+
+def create_http_client(
+    pool_size: int = DEFAULT_POOL_SIZE, timeout: Timeout = DEFAULT_TIMEOUT
+) -> httpx.AsyncClient:
+    """
+    Creates an httpx client that keeps up to `pool_size` connections open.
+
+    Args:
+        pool_size: Maximum open connections. Requests beyond this wait for a free
+            connection instead of opening new ones.
+        timeout: Timeout in seconds, or a (connect, read) tuple.
+
+    Returns:
+        httpx.AsyncClient: The client.
+    """
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        timeout = httpx.Timeout(read, connect=connect)
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        timeout=timeout,
+    )
+
+
+@dataclass
+class AsyncTask:
+    id: str
+    url: str
+    client: "AsyncClient" = field(repr=False)
+    _status: Optional[TaskStatus] = None
+    _result: Optional[Any] = None
+    _outputs: Optional[Any] = field(default_factory=list)
+
+    async def _get(self) -> None:
+        response = await self.client.http.get(self.url, headers=self.client._headers)
+        if response.status_code == 404:
+            raise TaskNotFoundError(self.id)
+        response.raise_for_status()
+
+        body = response.json()
+        self._status = TaskStatus(body["status"])
+        self._result = _decode_result(body["result"])
+        self._outputs = body["outputs"]
+
+    async def status(self) -> TaskStatus:
+        """Returns the status of the task"""
+        await self._get()
+        return self._status
+
+    async def result(self, wait: bool = False) -> Any:
+        """Returns the JSON output of the task. If wait is True, waits for the task to complete."""
+        if wait:
+            return await self.subscribe()
+
+        await self._get()
+        return self._result
+
+    def outputs(self) -> list:
+        """Returns a list of the Output() objects saved during the duration of the task"""
+        return self._outputs
+
+    async def subscribe(self, event_handler: Optional[Callable] = None) -> Any:
+        """Waits for the task to complete and returns its result.
+
+        `event_handler` is called with each status update.
+        """
+        headers = {**self.client._headers, "Accept": "text/event-stream"}
+
+        async with self.client.http.stream(
+            "GET", f"{self.url}/subscribe", headers=headers, timeout=self.client._stream_timeout
+        ) as response:
+            response.raise_for_status()
+
+            event_type, data = None, None
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event_type = line[7:]
+                elif line.startswith("data: "):
+                    data = line[6:]
+                elif line == "":
+                    if (
+                        event_type == "status"
+                        and data
+                        and await self._on_status(data, event_handler)
+                    ):
+                        return self._result
+                    event_type, data = None, None
+
+        return self._result
+
+    async def _on_status(self, data: str, event_handler: Optional[Callable]) -> bool:
+        try:
+            task_data = json.loads(data)
+        except json.JSONDecodeError:
+            return False
+
+        if event_handler:
+            event_handler(task_data)
+
+        status = TaskStatus(task_data.get("status"))
+        if not status.is_complete():
+            return False
+
+        self._status = status
+        self._result = _decode_result(task_data.get("result"))
+        self._outputs = task_data.get("outputs")
+        return True
+
+
+@dataclass
+class AsyncDeployment:
+    url: str
+    client: "AsyncClient" = field(repr=False)
+
+    async def submit(self, *, input: dict = {}) -> Union[AsyncTask, Any]:
+        """Submit a task to the deployment.
+
+        Returns an AsyncTask if the task runs asynchronously, otherwise the JSON response.
+        """
+        body = await self.client._post_input(self.url, input)
+        if body is not None and "task_id" in body:
+            return await self.client.get_task_by_id(body["task_id"])
+
+        return body
+
+    async def subscribe(self, *, input: dict = {}, event_handler: Optional[Callable] = None) -> Any:
+        """Submit a task to the deployment and wait for it to complete.
+
+        Returns the JSON response from the deployment, or None.
+        """
+        body = await self.client._post_input(self.url, input)
+        if body is not None and "task_id" not in body:
+            return body
+
+        task = await self.client.get_task_by_id(body["task_id"])
+        return await task.subscribe(event_handler=event_handler)
+
+
+class AsyncClient:
+    """
+    An asyncio client for Beam deployments, mirroring `beam.Client`.
+
+    Every call shares one pooled httpx client, so a single event loop can keep
+    hundreds of requests in flight:
+
+    ```python
+    async with AsyncClient() as client:
+        results = await asyncio.gather(
+            *(client.submit("beam-cloud/function/embed/v1", input=doc) for doc in docs)
+        )
+    ```
+    """
+
+    def __init__(
+        self,
+        token: str = "",
+        *,
+        http_client: Optional[httpx.AsyncClient] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: Timeout = DEFAULT_TIMEOUT,
+        deployment_cache: Optional[DeploymentCache] = None,
+    ) -> None:
+        """
+        Args:
+            token (str, optional): The API token. Defaults to the configured context.
+            http_client (httpx.AsyncClient, optional): The client used for every request.
+                Defaults to a pooled client.
+            pool_size (int, optional): Maximum open connections of the default client.
+            timeout (float | tuple, optional): Default (connect, read) timeout in seconds for
+                the default client. Deployment calls and task subscriptions only use its
+                connect timeout, since they last as long as the work they wait for.
+            deployment_cache (DeploymentCache, optional): Caches deployment identifier to URL
+                lookups. Defaults to an in-memory cache.
+        """
+        self.token = token or os.environ.get("BETA9_TOKEN", "") or get_config_context().token
+        self.tls = settings.api_port == 443
+
+        if settings.api_host.startswith(("http://", "https://")):
+            self.base_url = f"{settings.api_host}:{settings.api_port}"
+        else:
+            scheme = "https" if self.tls else "http"
+            self.base_url = f"{scheme}://{settings.api_host}:{settings.api_port}"
+
+        if self.tls:
+            self.internal_api_host = f"https://{settings.internal_api_host}"
+        else:
+            self.internal_api_host = (
+                f"http://{settings.internal_api_host}:{settings.internal_api_port}"
+            )
+
+        self.realtime_host = settings.realtime_host
+
+        self._owns_http_client = http_client is None
+        self.http = http_client or create_http_client(pool_size=pool_size, timeout=timeout)
+        self.deployment_cache = (
+            deployment_cache if deployment_cache is not None else DeploymentCache()
+        )
+        self.workspace_id: Optional[str] = None
+        self._workspace_lock: Optional[asyncio.Lock] = None
+        self._lookups: Dict[str, asyncio.Future] = {}
+
+    @property
+    def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}", "Content-Type": "application/json"}
+
+    async def _load_workspace(self) -> str:
+        if self.workspace_id is not None:
+            return self.workspace_id
+
+        if self._workspace_lock is None:
+            self._workspace_lock = asyncio.Lock()
+
+        async with self._workspace_lock:
+            if self.workspace_id is None:
+                response = await self.http.get(
+                    f"{self.base_url}/api/v1/workspace/current", headers=self._headers
+                )
+                body = response.json()
+                if not body or "external_id" not in body:
+                    raise WorkspaceNotFoundError("Failed to load workspace")
+                self.workspace_id = body["external_id"]
+
+        return self.workspace_id
+
+    async def get_deployment(self, identifier: str) -> AsyncDeployment:
+        """Get a handle to a deployment by its identifier, for example:
+
+        ```python
+        deployment = await client.get_deployment("beam-cloud/function/transcribe/v1")
+        task = await deployment.submit(input={"url": "https://example.com/audio.mp3"})
+        print(await task.result(wait=True))
+        ```
+
+        Args:
+            identifier (str): The identifier of the deployment.
+
+        Returns:
+            AsyncDeployment: The deployment object.
+        """
+        key = f"{self.internal_api_host}/{identifier}"
+        if (entry := self.deployment_cache.get(key)) is not None:
+            if entry.url is None:
+                raise DeploymentNotFoundError(f"Deployment not found: {identifier}")
+            return AsyncDeployment(url=entry.url, client=self)
+
+        # Concurrent misses for the same deployment share a single lookup
+        if (lookup := self._lookups.get(key)) is None:
+            lookup = asyncio.ensure_future(self._lookup_deployment(key, identifier))
+            self._lookups[key] = lookup
+            lookup.add_done_callback(lambda _: self._lookups.pop(key, None))
+
+        url = await asyncio.shield(lookup)
+        return AsyncDeployment(url=url, client=self)
+
+    async def _lookup_deployment(self, key: str, identifier: str) -> str:
+        response = await self.http.get(
+            f"{self.internal_api_host}/v2/deployment/get-public-deployment-url/",
+            params={"slug": identifier},
+            headers={"Authorization": f"Bearer {self.token}"},
+        )
+        if response.status_code == 404:
+            self.deployment_cache.set_not_found(key)
+            raise DeploymentNotFoundError(f"Deployment not found: {identifier}")
+        response.raise_for_status()
+
+        url = response.json()["url"]
+        self.deployment_cache.set(key, url)
+        return url
+
+    async def get_task_by_id(self, id: str) -> AsyncTask:
+        """
+        Get a handle to a task by its ID.
+
+        Args:
+            id (str): The ID of the task.
+
+        Returns:
+            AsyncTask: The task object.
+        """
+        workspace_id = await self._load_workspace()
+        return AsyncTask(id=id, url=f"{self.base_url}/api/v1/task/{workspace_id}/{id}", client=self)
+
+    async def submit(self, identifier: str, *, input: dict = {}) -> Union[AsyncTask, Any]:
+        """Submit a task to a deployment.
+
+        Args:
+            identifier (str): The identifier of the deployment
+            input (dict, optional): The input data for the task. Defaults to {}.
+
+        Returns:
+            Union[AsyncTask, Any]: An AsyncTask if the task runs asynchronously,
+                            otherwise the JSON response from the deployment.
+        """
+        deployment = await self.get_deployment(identifier)
+        return await deployment.submit(input=input)
+
+    async def subscribe(
+        self, identifier: str, *, input: dict = {}, event_handler: Optional[Callable] = None
+    ) -> Any:
+        """Submit a task to a deployment and wait until the task is complete.
+
+        Args:
+            identifier (str): The identifier of the deployment
+            input (dict, optional): The input data for the task. Defaults to {}.
+            event_handler (Callable, optional): Called with each task status update.
+
+        Returns:
+            Any: The JSON response from the deployment, or None.
+        """
+        deployment = await self.get_deployment(identifier)
+        return await deployment.subscribe(input=input, event_handler=event_handler)
+
+    @property
+    def _stream_timeout(self) -> httpx.Timeout:
+        # Only connecting has a timeout, for responses that last as long as the work behind them
+        return httpx.Timeout(None, connect=self.http.timeout.connect)
+
+    async def _post_input(self, url: str, input: dict) -> Any:
+        response = await self.http.post(
+            url,
+            headers=self._headers,
+            content=json.dumps(input) if input else None,
+            # Synchronous deployments respond once they're done, however long that takes
+            timeout=self._stream_timeout,
+        )
+        return response.json()
+
+    def stream_logs(
+        self,
+        object_id: str,
+        object_type: str = "container",
+        *,
+        since: Optional[Union[datetime.datetime, str]] = None,
+        lines: int = 0,
+        follow: bool = True,
+    ) -> AsyncIterator["LogRecord"]:
+        """Stream the logs of a stub, deployment, task or container.
+
+        Connections are kept alive by the event loop, so many streams can run in one
+        process without a thread each. Cancelling the task that iterates the stream
+        closes its connection:
+
+        ```python
+        async def tail(container_id):
+            async for record in client.stream_logs(container_id):
+                print(record.message, end="")
+
+        tasks = [asyncio.create_task(tail(id)) for id in container_ids]
+        ```
+
+        Args:
+            object_id (str): The ID of the object.
+            object_type (str, optional): "stub", "deployment", "task" or "container".
+            since (datetime | str, optional): Start with the lines logged since this time.
+            lines (int, optional): Start with the last N lines logged.
+            follow (bool, optional): Keep yielding new lines as they are logged. If False,
+                only the lines asked for with `since` or `lines` are yielded.
+
+        Returns:
+            AsyncIterator[LogRecord]: The log lines, oldest first.
+
+        Raises:
+            LogStreamError: If the gateway sends an error.
+        """
+        # Imported here so clients that don't stream logs don't load websockets
+        from . import logs
+
+        source = logs.log_source(object_id, object_type)
+        return logs.stream_logs_async(
+            self.realtime_host, self.token, source, since=since, lines=lines, follow=follow
+        )
+
+    async def download_file(
+        self,
+        url: str,
+        local_path: Union[str, Path],
+        *,
+        checksum: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> DownloadResult:
+        """Download a file from a URL, streaming it to disk.
+
+        Like `Client.download_file`, data goes to `<local_path>.part` first and an
+        interrupted download resumes with an HTTP Range request, unless the file
+        changed since. File writes and the checksum run off the event loop.
+
+        Args:
+            url (str): The URL of the file.
+            local_path (str): Where to write the file.
+            checksum (str, optional): "<algorithm>:<hex digest>" to verify, e.g. "sha256:ab12...".
+            progress (Callable, optional): Called with (downloaded bytes, total bytes or None).
+
+        Returns:
+            DownloadResult: The size of the file and the download throughput.
+        """
+        path = Path(local_path)
+        part_path = path.with_name(f"{path.name}.part")
+        state_path = part_path.with_name(f"{part_path.name}.json")
+        start_time = time.monotonic()
+
+        state = await run_blocking(read_state, state_path)
+        offset = await run_blocking(resume_offset, part_path, state)
+        headers = resume_headers(offset, state)
+        downloaded = 0
+
+        async with self.http.stream("GET", url, headers=headers) as response:
+            if response.status_code == 416 and offset:
+                restart = _content_range_total(response) != offset
+                total = offset
+            else:
+                restart = False
+                response.raise_for_status()
+                if response.status_code != 206:
+                    offset = 0
+
+                length = response.headers.get("Content-Length")
+                total = offset + int(length) if length and length.isdigit() else None
+
+                # Saved before the part file is written, so resuming can trust its
+                # size and tell whether the object changed
+                state = {"validator": response_validator(response)}
+                await run_blocking(write_state, state_path, state)
+
+                f = await run_blocking(open, part_path, "ab" if offset else "wb")
+                try:
+                    async for chunk in response.aiter_bytes(chunk_size):
+                        await run_blocking(f.write, chunk)
+                        downloaded += len(chunk)
+                        if progress:
+                            progress(offset + downloaded, total)
+                finally:
+                    await run_blocking(f.close)
+
+        if restart:
+            # The object is now shorter than the part file, so it changed
+            await run_blocking(part_path.unlink, True)
+            await run_blocking(state_path.unlink, True)
+            return await self.download_file(
+                url, path, checksum=checksum, progress=progress, chunk_size=chunk_size
+            )
+
+        await run_blocking(state_path.unlink, True)
+        if checksum:
+            try:
+                await run_blocking(verify_checksum, part_path, checksum)
+            except Exception:
+                await run_blocking(part_path.unlink, True)
+                raise
+
+        await run_blocking(os.replace, part_path, path)
+        size = offset + downloaded
+        return DownloadResult(
+            path=path,
+            size=size,
+            downloaded=downloaded,
+            seconds=time.monotonic() - start_time,
+            resumed=downloaded < size,
+        )
+
+    async def aclose(self) -> None:
+        """Close the client's pooled connections, unless the http client was passed in."""
+        if self._owns_http_client:
+            await self.http.aclose()
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.aclose()
+
+
+def _decode_result(result: Any) -> Any:
+    if result and hasattr(result, "get") and result.get("base64"):
+        import cloudpickle
+
+        return cloudpickle.loads(base64.b64decode(result["base64"]))
+    return result
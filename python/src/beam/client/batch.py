@@ -0,0 +1,104 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, Generic, Iterable, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_CONCURRENCY = 16
+
+
+@dataclass
+class BatchResult(Generic[T]):
+    """
+    The outcome of one item of a batch.
+
+    `index` is the position of the item in the input iterable. Exactly one of
+    `value` and `error` is meaningful, check `ok` to tell which.
+    """
+
+    index: int
+    input: Any = field(repr=False)
+    value: Optional[T] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def unwrap(self) -> T:
+        """Returns the value, or raises the error of a failed item."""
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def run_batch(
+    fn: Callable[[Any], T],
+    inputs: Iterable[Any],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    ordered: bool = True,
+    max_pending: Optional[int] = None,
+) -> Iterator[BatchResult[T]]:
+    """
+    Calls `fn` on every item of `inputs` from a pool of `concurrency` threads
+    and yields a BatchResult per item.
+
+    Inputs are pulled lazily: at most `max_pending` items (default twice the
+    concurrency) are submitted or waiting to be yielded at any time, so a
+    generator of inputs is never materialized and a slow consumer slows down
+    submission. Exceptions raised by `fn` are captured on the item's result
+    instead of stopping the batch.
+
+    Args:
+        fn: Called with each input, from a worker thread.
+        inputs: Any iterable, including generators.
+        concurrency: Maximum calls to `fn` running at once.
+        ordered: Yield results in input order. Otherwise they are yielded as
+            they complete, and one slow item doesn't hold up the others.
+        max_pending: Maximum items in flight or buffered for ordered output.
+
+    Returns:
+        Iterator[BatchResult]: Lazily yields the results. Closing the iterator
+            early cancels items that haven't started.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+
+    max_pending = max(max_pending or 2 * concurrency, concurrency)
+    items = enumerate(inputs)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="beam-batch")
+    # Futures in input order when ordered, and the (index, input) each one was submitted with
+    queue: Deque[Future] = deque()
+    pending: Dict[Future, Tuple[int, Any]] = {}
+
+    def fill() -> None:
+        for index, item in islice(items, max_pending - len(pending)):
+            future = executor.submit(fn, item)
+            pending[future] = (index, item)
+            if ordered:
+                queue.append(future)
+
+    def take(future: Future) -> BatchResult[T]:
+        index, item = pending.pop(future)
+        if (error := future.exception()) is not None:
+            return BatchResult(index=index, input=item, error=error)
+        return BatchResult(index=index, input=item, value=future.result())
+
+    try:
+        fill()
+        while pending:
+            if ordered:
+                done = [queue.popleft()]
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            results = [take(future) for future in done]
+            fill()
+            yield from results
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
@@ -0,0 +1,162 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+DEFAULT_MAXSIZE = 256
+DEFAULT_TTL = 300
+DEFAULT_NEGATIVE_TTL = 10
+DEFAULT_CACHE_PATH = Path("~/.beam/cache/deployments.json").expanduser()
+
+
+@dataclass
+class CacheEntry:
+    # None when the deployment was not found
+    url: Optional[str]
+    expires_at: float
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    negative_hits: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+class DeploymentCache:
+    """
+    A thread-safe LRU cache of deployment identifier -> deployment URL.
+
+    Entries expire after `ttl` seconds. Lookups that found no deployment are
+    remembered for `negative_ttl` seconds so repeated misses don't go back to
+    the network. When `path` is set, found URLs are also persisted to that
+    JSON file so new processes start warm.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_MAXSIZE,
+        ttl: float = DEFAULT_TTL,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+        path: Optional[Union[str, Path]] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.path = Path(path).expanduser() if path else None
+        self.clock = clock
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """
+        Returns the unexpired entry for `key`, or None on a cache miss. An entry
+        whose url is None means the deployment was not found.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= self.clock():
+                del self._entries[key]
+                self.stats.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            if entry.url is None:
+                self.stats.negative_hits += 1
+            else:
+                self.stats.hits += 1
+            return entry
+
+    def set(self, key: str, url: str) -> None:
+        self._put(key, CacheEntry(url=url, expires_at=self.clock() + self.ttl))
+
+    def set_not_found(self, key: str) -> None:
+        if self.negative_ttl > 0:
+            self._put(key, CacheEntry(url=None, expires_at=self.clock() + self.negative_ttl))
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """
+        Removes `key` from the cache, or every entry when no key is given.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self._save()
+
+    def _put(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+            if entry.url is not None:
+                self._save()
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return
+
+        if not isinstance(data, dict):
+            return
+
+        now = self.clock()
+        entries = []
+        for key, value in data.items():
+            # Entries from another version of the store, or edited by hand, are skipped
+            try:
+                entry = CacheEntry(**value)
+            except TypeError:
+                continue
+            if (
+                isinstance(entry.url, str)
+                and isinstance(entry.expires_at, (int, float))
+                and entry.url
+                and entry.expires_at > now
+            ):
+                entries.append((key, entry))
+
+        for key, entry in sorted(entries, key=lambda item: item[1].expires_at):
+            self._entries[key] = entry
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+
+        data = {key: asdict(entry) for key, entry in self._entries.items() if entry.url}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent)
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # The disk store is an optimization; the in-memory cache still works
+            return
@@ -1,18 +1,77 @@
-from typing import Any, Callable, Union
+import json
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, List, Optional, Tuple, Union
 
 import requests
 from beta9.client import client
 from beta9.client.deployment import Deployment
-from beta9.client.task import Task
-from beta9.exceptions import DeploymentNotFoundError
-from requests.exceptions import HTTPError
+from beta9.exceptions import DeploymentNotFoundError, WorkspaceNotFoundError
+from beta9.type import TaskStatus
 
-from . import settings
+from . import batch, download, gather, settings
+from .batch import BatchResult
+from .cache import DeploymentCache
+from .download import DownloadResult, ProgressCallback
+from .instrumentation import Instrumentation, instrumented_session, timed
+from .result_cache import ResultCache
+from .session import (
+    DEFAULT_POOL_SIZE,
+    DEFAULT_TIMEOUT,
+    Timeout,
+    create_session,
+    without_read_timeout,
+)
+from .task import Task
+
+if TYPE_CHECKING:
+    import datetime
+
+    from .logs import LogRecord
 
 
 class Client(client.Client):
-    def __init__(self, token: str = "") -> None:
-        self._deployment_cache = {}
+    def __init__(
+        self,
+        token: str = "",
+        *,
+        session: Optional[requests.Session] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: Timeout = DEFAULT_TIMEOUT,
+        deployment_cache: Optional[DeploymentCache] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        result_cache: Optional[ResultCache] = None,
+    ) -> None:
+        """
+        Args:
+            token (str, optional): The API token. Defaults to the configured context.
+            session (requests.Session, optional): The session used for every REST call
+                the client makes. Defaults to a pooled keep-alive session.
+            pool_size (int, optional): Connections kept alive per host by the default session.
+            timeout (float | tuple, optional): Default (connect, read) timeout in seconds for
+                the default session. Deployment calls and task subscriptions only use its
+                connect timeout, since they last as long as the work they wait for.
+            deployment_cache (DeploymentCache, optional): Caches deployment identifier to URL
+                lookups. Defaults to an in-memory cache; pass one with a `path` to persist
+                lookups across processes.
+            instrumentation (Instrumentation, optional): Receives an event for every request,
+                retry, cache lookup and call the client makes, e.g. a MetricsCollector.
+                Requests are reported by a session that wraps the adapters of the client's
+                session, including an injected one, which itself is left unchanged and so
+                can be shared between clients. Defaults to no instrumentation, which costs
+                nothing.
+            result_cache (ResultCache, optional): Caches the results of `submit` and
+                `subscribe` by deployment and input, for deterministic deployments. Cached
+                results are returned without a request. Defaults to no result cache.
+        """
+        self.deployment_cache = (
+            deployment_cache if deployment_cache is not None else DeploymentCache()
+        )
+        self.timeout = timeout
+        self._owns_session = session is None
+        self.session = session or create_session(pool_size=pool_size, timeout=timeout)
+        self.instrumentation = instrumentation
+        self.result_cache = result_cache
+        if instrumentation is not None:
+            self.session = instrumented_session(self.session, instrumentation)
 
         super().__init__(
             token=token,
@@ -23,12 +82,29 @@ class Client(client.Client):
 
         self.internal_api_host = settings.internal_api_host
         self.internal_api_port = settings.internal_api_port
+        self.realtime_host = settings.realtime_host
 
         if self.tls:
             self.internal_api_host = f"https://{self.internal_api_host}"
         else:
             self.internal_api_host = f"http://{self.internal_api_host}:{self.internal_api_port}"
 
+    @property
+    def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}", "Content-Type": "application/json"}
+
+    def _load_workspace(self) -> None:
+        response = self.session.get(
+            f"{self.base_url}/api/v1/workspace/current", headers=self._headers
+        )
+
+        body = response.json()
+        if body and "external_id" in body:
+            self.workspace_id = body["external_id"]
+        else:
+            raise WorkspaceNotFoundError("Failed to load workspace")
+
+    @timed("Client.get_deployment")
     def get_deployment(self, identifier: str) -> Deployment:
         """Get a handle to a deployment by its identifier, for example:
 
@@ -44,68 +120,393 @@ class Client(client.Client):
         Returns:
             Deployment: The deployment object.
         """
-        if identifier in self._deployment_cache:
-            return self._deployment_cache[identifier]
+        key = self._deployment_cache_key(identifier)
+        entry = self.deployment_cache.get(key)
+        if self.instrumentation is not None:
+            self.instrumentation.on_cache("deployment", entry is not None)
 
-        try:
-            response = requests.get(
-                url=f"{self.internal_api_host}/v2/deployment/get-public-deployment-url/?slug={identifier}",
-                headers={"Authorization": f"Bearer {self.token}"},
-            )
-            response.raise_for_status()
-        except HTTPError:
+        if entry is not None:
+            if entry.url is None:
+                raise DeploymentNotFoundError(f"Deployment not found: {identifier}")
+            return self._deployment(entry.url)
+
+        response = self.session.get(
+            url=f"{self.internal_api_host}/v2/deployment/get-public-deployment-url/?slug={identifier}",
+            headers={"Authorization": f"Bearer {self.token}"},
+        )
+        # Only a missing deployment is remembered; other errors, like an outage,
+        # are raised as they are and retried on the next call
+        if response.status_code == 404:
+            self.deployment_cache.set_not_found(key)
             raise DeploymentNotFoundError(f"Deployment not found: {identifier}")
+        response.raise_for_status()
+
+        url = response.json()["url"]
+        self.deployment_cache.set(key, url)
+        return self._deployment(url)
+
+    def invalidate_deployment(self, identifier: Optional[str] = None) -> None:
+        """Forget the cached URL of a deployment, or of all deployments if no identifier is given.
+
+        Args:
+            identifier (str, optional): The identifier of the deployment.
+        """
+        key = self._deployment_cache_key(identifier) if identifier is not None else None
+        self.deployment_cache.invalidate(key)
+
+    def _deployment_cache_key(self, identifier: str) -> str:
+        # Cache files are shared between processes that may talk to different APIs
+        return f"{self.internal_api_host}/{identifier}"
 
-        deployment = Deployment(
+    def _deployment(self, url: str) -> Deployment:
+        return Deployment(
             token=self.token,
             base_url=self.base_url,
             workspace_id=self.workspace_id,
-            deployment_url=response.json()["url"],
+            deployment_url=url,
         )
-        self._deployment_cache[identifier] = deployment
-        return deployment
 
-    def submit(self, identifier: str, *, input: dict = {}) -> Union[Task, Any]:
+    @timed("Client.submit")
+    def submit(
+        self,
+        identifier: str,
+        *,
+        input: dict = {},
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+    ) -> Union[Task, Any]:
         """Submit a task to a deployment.
 
         This is a convenience method that combines get_deployment and submit.
 
+        With a `result_cache`, the response of a deployment that runs synchronously
+        is cached, and identical submissions in flight at once share one request.
+        Tasks are not cached.
+
         Args:
             identifier (str): The identifier of the deployment
             input (dict, optional): The input data for the task. Defaults to {}.
+            use_cache (bool, optional): Use the client's result cache, if it has one.
+            refresh_cache (bool, optional): Skip the cached result and replace it.
 
         Returns:
             Union[Task, Any]: A Task object if the task runs asynchronously,
                             otherwise the JSON response from the deployment.
         """
+        if self.result_cache is None or not use_cache:
+            deployment = self.get_deployment(identifier)
+            return self._submit(deployment, input)
+
+        def call() -> Tuple[Any, bool]:
+            response = self._post(self.get_deployment(identifier), input)
+            body = response.json()
+            return body, response.ok and not self._is_task(body)
+
+        body = self._cached("submit", identifier, input, call, refresh_cache)
+        if self._is_task(body):
+            return self._task(body["task_id"])
+        return body
+
+    def submit_many(
+        self,
+        identifier: str,
+        inputs: Iterable[dict],
+        *,
+        concurrency: int = batch.DEFAULT_CONCURRENCY,
+        ordered: bool = True,
+    ) -> Iterator[BatchResult[Union[Task, Any]]]:
+        """Submit a task to a deployment for every input, several at a time.
+
+        Inputs are consumed lazily, so `inputs` can be a generator over a job set
+        that doesn't fit in memory. A failed submission is reported on its result
+        and does not stop the batch:
+
+        ```python
+        for result in client.submit_many("beam-cloud/function/embed/v1", docs, concurrency=32):
+            if not result.ok:
+                print(f"input {result.index} failed: {result.error}")
+        ```
+
+        Args:
+            identifier (str): The identifier of the deployment
+            inputs (Iterable[dict]): The input data for each task.
+            concurrency (int, optional): Maximum submissions in flight at once. Size the
+                client's `pool_size` to at least this.
+            ordered (bool, optional): Yield results in input order. If False, results are
+                yielded as submissions complete.
+
+        Returns:
+            Iterator[BatchResult]: One result per input, with its `index` in `inputs`. The
+                `value` is a Task object if the task runs asynchronously, otherwise the
+                JSON response from the deployment.
+
+        Raises:
+            DeploymentNotFoundError: If the deployment doesn't exist.
+        """
         deployment = self.get_deployment(identifier)
-        return deployment.submit(input=input)
+        return batch.run_batch(
+            lambda input: self._submit(deployment, input),
+            inputs,
+            concurrency=concurrency,
+            ordered=ordered,
+        )
 
+    def _submit(self, deployment: Deployment, input: dict) -> Union[Task, Any]:
+        body = self._post_input(deployment, input)
+        if self._is_task(body):
+            return self._task(body["task_id"])
+
+        return body
+
+    @staticmethod
+    def _is_task(body: Any) -> bool:
+        return isinstance(body, dict) and "task_id" in body
+
+    @timed("Client.subscribe")
     def subscribe(
-        self, identifier: str, *, input: dict = {}, event_handler: Callable = None
+        self,
+        identifier: str,
+        *,
+        input: dict = {},
+        event_handler: Callable = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
     ) -> Any:
         """Submit a task to a deployment and subscribe to the task (blocks until the task is complete).
 
         This is a convenience method that combines get_deployment and subscribe.
 
+        With a `result_cache`, the result of a task that completed is cached, and
+        identical calls in flight at once share one task. The event handler isn't
+        called for results that come from the cache or another call.
+
         Args:
             identifier (str): The identifier of the deployment
             input (dict, optional): The input data for the task. Defaults to {}.
+            event_handler (Callable, optional): Called with each task status update.
+            use_cache (bool, optional): Use the client's result cache, if it has one.
+            refresh_cache (bool, optional): Skip the cached result and replace it.
 
         Returns:
             Any: The JSON response from the deployment, or None.
         """
-        deployment = self.get_deployment(identifier)
-        return deployment.subscribe(input=input)
 
-    def download_file(self, url: str, local_path: str) -> bytes:
-        """Download a file from a URL."""
+        def call() -> Tuple[Any, bool]:
+            response = self._post(self.get_deployment(identifier), input)
+            body = response.json()
+            if not self._is_task(body):
+                return body, response.ok
 
-        response = requests.get(url)
-        response.raise_for_status()
+            # Only a result the subscription reported as complete is cached
+            statuses = []
+
+            def on_event(task_data: dict) -> None:
+                statuses.append(task_data.get("status"))
+                if event_handler:
+                    event_handler(task_data)
+
+            result = self._task(body["task_id"]).subscribe(event_handler=on_event)
+            return result, bool(statuses) and statuses[-1] == TaskStatus.Complete.value
+
+        if self.result_cache is None or not use_cache:
+            return call()[0]
+        return self._cached("subscribe", identifier, input, call, refresh_cache)
+
+    def _cached(
+        self,
+        operation: str,
+        identifier: str,
+        input: dict,
+        call: Callable[[], Tuple[Any, bool]],
+        refresh: bool,
+    ) -> Any:
+        # Results of submit and subscribe differ for deployments that run tasks
+        namespace = f"{self._deployment_cache_key(identifier)}:{operation}"
+        value, hit = self.result_cache.fetch(
+            identifier, input, call, refresh=refresh, namespace=namespace
+        )
+        if self.instrumentation is not None:
+            self.instrumentation.on_cache("result", hit)
+        return value
+
+    def as_completed(
+        self,
+        tasks: Iterable[Union[Task, str]],
+        timeout: Optional[float] = None,
+        *,
+        min_interval: float = gather.DEFAULT_MIN_INTERVAL,
+        max_interval: float = gather.DEFAULT_MAX_INTERVAL,
+    ) -> Iterator[Task]:
+        """Wait for many tasks and yield each one as soon as it finishes.
+
+        All tasks are tracked by one polling loop that asks for their statuses in
+        batches, instead of one poller per task. Polling starts every `min_interval`
+        seconds and slows down to `max_interval` while nothing finishes:
+
+        ```python
+        tasks = [r.value for r in client.submit_many("beam-cloud/function/embed/v1", docs)]
+        for task in client.as_completed(tasks):
+            print(task.id, task.status())
+        ```
+
+        Args:
+            tasks (Iterable[Union[Task, str]]): Task objects or task IDs.
+            timeout (float, optional): Seconds to wait for all tasks. Defaults to no limit.
+            min_interval (float, optional): Seconds between polls while tasks are finishing.
+            max_interval (float, optional): Longest wait between polls.
+
+        Returns:
+            Iterator[Task]: Finished tasks (complete, error, cancelled or timed out), in the
+                order they finished.
+
+        Raises:
+            TimeoutError: If some tasks are still running after `timeout` seconds.
+            TaskNotFoundError: If a task doesn't exist.
+        """
+        gatherer = gather.TaskGatherer(
+            self, tasks, min_interval=min_interval, max_interval=max_interval
+        )
+        return gatherer.as_completed(timeout)
+
+    @timed("Client.wait_all")
+    def wait_all(
+        self,
+        tasks: Iterable[Union[Task, str]],
+        timeout: Optional[float] = None,
+        *,
+        min_interval: float = gather.DEFAULT_MIN_INTERVAL,
+        max_interval: float = gather.DEFAULT_MAX_INTERVAL,
+    ) -> List[Task]:
+        """Wait until every task has finished. See `as_completed`.
+
+        Args:
+            tasks (Iterable[Union[Task, str]]): Task objects or task IDs.
+            timeout (float, optional): Seconds to wait for all tasks. Defaults to no limit.
+            min_interval (float, optional): Seconds between polls while tasks are finishing.
+            max_interval (float, optional): Longest wait between polls.
+
+        Returns:
+            List[Task]: The finished tasks, in the order they were given.
+
+        Raises:
+            TimeoutError: If some tasks are still running after `timeout` seconds.
+        """
+        tasks = list(tasks)
+        finished = {
+            task.id: task
+            for task in self.as_completed(
+                tasks, timeout, min_interval=min_interval, max_interval=max_interval
+            )
+        }
+        return [finished[gather.get_task_id(task)] for task in tasks]
+
+    def _post_input(self, deployment: Deployment, input: dict) -> Any:
+        return self._post(deployment, input).json()
+
+    def _post(self, deployment: Deployment, input: dict) -> requests.Response:
+        return self.session.post(
+            deployment.url,
+            headers=self._headers,
+            data=json.dumps(input) if input else None,
+            # Synchronous deployments respond once they're done, however long that takes
+            timeout=without_read_timeout(self.timeout),
+        )
+
+    def _task(self, id: str, body: Optional[dict] = None) -> Task:
+        return Task(
+            id=id,
+            url=f"{self.base_url}/api/v1/task/{self.workspace_id}/{id}",
+            token=self.token,
+            session=self.session,
+            body=body,
+            timeout=self.timeout,
+        )
+
+    def stream_logs(
+        self,
+        object_id: str,
+        object_type: str = "container",
+        *,
+        since: Optional[Union["datetime.datetime", str]] = None,
+        lines: int = 0,
+        follow: bool = True,
+    ) -> Iterator["LogRecord"]:
+        """Stream the logs of a stub, deployment, task or container.
+
+        Each stream has its own connection, kept alive by a thread shared by every
+        stream in the process. Leaving the loop closes the connection:
+
+        ```python
+        for record in client.stream_logs("task-id", "task", lines=100):
+            print(record.timestamp, record.message, end="")
+            if "done" in record.message:
+                break
+        ```
+
+        Args:
+            object_id (str): The ID of the object.
+            object_type (str, optional): "stub", "deployment", "task" or "container".
+            since (datetime | str, optional): Start with the lines logged since this time.
+            lines (int, optional): Start with the last N lines logged.
+            follow (bool, optional): Keep yielding new lines as they are logged. If False,
+                only the lines asked for with `since` or `lines` are yielded.
+
+        Returns:
+            Iterator[LogRecord]: The log lines, oldest first.
+
+        Raises:
+            LogStreamError: If the gateway sends an error.
+        """
+        # Imported here so clients that don't stream logs don't load websockets
+        from . import logs
+
+        source = logs.log_source(object_id, object_type)
+        return logs.stream_logs(
+            self.realtime_host, self.token, source, since=since, lines=lines, follow=follow
+        )
+
+    @timed("Client.download_file")
+    def download_file(
+        self,
+        url: str,
+        local_path: str,
+        *,
+        checksum: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        max_workers: int = download.MAX_WORKERS,
+    ) -> DownloadResult:
+        """Download a file from a URL.
+
+        The file is streamed to disk in chunks. Interrupted downloads resume from a
+        `<local_path>.part` file, and large files on servers that support range
+        requests are fetched in parallel.
+
+        Args:
+            url (str): The URL of the file.
+            local_path (str): Where to write the file.
+            checksum (str, optional): "<algorithm>:<hex digest>" to verify, e.g. "sha256:ab12...".
+            progress (Callable, optional): Called with (downloaded bytes, total bytes or None).
+            max_workers (int, optional): Concurrent range requests for large files.
+
+        Returns:
+            DownloadResult: The size of the file and the download throughput.
+        """
+        return download.download_file(
+            url,
+            local_path,
+            session=self.session,
+            checksum=checksum,
+            progress=progress,
+            max_workers=max_workers,
+        )
+
+    def close(self) -> None:
+        """Close the client's pooled connections, unless the session was passed in."""
+        if self._owns_session:
+            self.session.close()
 
-        with open(local_path, "wb") as f:
-            f.write(response.content)
+    def __enter__(self) -> "Client":
+        return self
 
-    def __del__(self) -> None:
-        self._deployment_cache.clear()
+    def __exit__(self, *_) -> None:
+        self.close()
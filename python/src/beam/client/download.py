@@ -0,0 +1,382 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+
+import requests
+from beta9.exceptions import DownloadChunkError
+
+CHUNK_SIZE = 1024 * 1024
+SEGMENT_SIZE = 16 * 1024 * 1024
+PARALLEL_THRESHOLD = 64 * 1024 * 1024
+MAX_WORKERS = 4
+
+# Called with (downloaded bytes, total bytes or None when unknown)
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+
+class ChecksumMismatchError(RuntimeError):
+    def __init__(self, algorithm: str, expected: str, actual: str):
+        self.algorithm = algorithm
+        self.expected = expected
+        self.actual = actual
+        super().__init__(f"Checksum mismatch: {algorithm=} {expected=} {actual=}")
+
+
+@dataclass
+class DownloadResult:
+    path: Path
+    size: int
+    downloaded: int
+    seconds: float
+    resumed: bool = False
+    parallel: bool = False
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second transferred by this download."""
+        return self.downloaded / self.seconds if self.seconds > 0 else 0.0
+
+
+class Segment(NamedTuple):
+    number: int
+    start: int
+    end: int
+
+
+class _Progress:
+    def __init__(self, callback: Optional[ProgressCallback], total: Optional[int], done: int):
+        self.callback = callback
+        self.total = total
+        self.done = done
+        self.transferred = 0
+        self.lock = threading.Lock()
+
+    def advance(self, n: int) -> None:
+        with self.lock:
+            self.done += n
+            self.transferred += n
+            if self.callback:
+                self.callback(self.done, self.total)
+
+
+def download_file(
+    url: str,
+    local_path: Union[str, Path],
+    *,
+    session: Optional[requests.Session] = None,
+    checksum: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None,
+    chunk_size: int = CHUNK_SIZE,
+    max_workers: int = MAX_WORKERS,
+    parallel_threshold: int = PARALLEL_THRESHOLD,
+    segment_size: int = SEGMENT_SIZE,
+    timeout: Optional[float] = None,
+) -> DownloadResult:
+    """
+    Streams a URL to disk without holding it in memory.
+
+    Data is written to `<local_path>.part`, which is renamed into place once
+    complete. If a `.part` file is left over from an interrupted download, along
+    with the `.part.json` state saved before it was written to, only the
+    missing bytes are requested with an HTTP Range header, and an If-Range
+    header with the ETag or Last-Modified seen then, so a changed object is
+    downloaded again from the start. Objects of at
+    least `parallel_threshold` bytes on servers that advertise
+    `Accept-Ranges: bytes` are fetched as concurrent ranges.
+
+    Args:
+        url: The URL to download.
+        local_path: Where to write the file.
+        session: The requests session to use. Defaults to the requests module.
+        checksum: An optional "<algorithm>:<hex digest>", e.g. "sha256:ab12...",
+            verified once the download completes.
+        progress: Called with (downloaded bytes, total bytes or None).
+        chunk_size: Bytes read from the network per write.
+        max_workers: Concurrent range requests for parallel downloads.
+        parallel_threshold: Minimum size for a parallel download.
+        segment_size: Bytes per range request for parallel downloads.
+        timeout: Connect and read timeout for each request.
+
+    Returns:
+        DownloadResult: The size of the file and the throughput of this download.
+
+    Raises:
+        ChecksumMismatchError: If the file does not match `checksum`.
+    """
+    http = session or requests
+    path = Path(local_path)
+    part_path = path.with_name(f"{path.name}.part")
+    state_path = part_path.with_name(f"{part_path.name}.json")
+    start_time = time.monotonic()
+
+    state = read_state(state_path)
+    offset = resume_offset(part_path, state)
+    headers = resume_headers(offset, state)
+    response = http.get(url, headers=headers, stream=True, timeout=timeout)
+    if response.status_code == 416 and offset:
+        response.close()
+        if _content_range_total(response) == offset:
+            # Nothing left to fetch, the part file already holds the whole object
+            state_path.unlink(missing_ok=True)
+            return _finish(part_path, path, checksum, offset, 0, start_time)
+
+        # The object is now shorter than the part file, so it changed
+        part_path.unlink(missing_ok=True)
+        state_path.unlink(missing_ok=True)
+        return download_file(
+            url,
+            path,
+            session=session,
+            checksum=checksum,
+            progress=progress,
+            chunk_size=chunk_size,
+            max_workers=max_workers,
+            parallel_threshold=parallel_threshold,
+            segment_size=segment_size,
+            timeout=timeout,
+        )
+
+    with response:
+        response.raise_for_status()
+        validator = response_validator(response)
+
+        if response.status_code == 206:
+            total = _content_range_total(response)
+        else:
+            # The server ignored the range, start over
+            offset = 0
+            total = _content_length(response)
+
+        if (
+            total is not None
+            and total >= parallel_threshold
+            and max_workers > 1
+            and offset == 0
+            and response.headers.get("Accept-Ranges", "").lower() == "bytes"
+        ):
+            response.close()
+            downloaded = _download_segments(
+                http,
+                url,
+                part_path,
+                state_path,
+                total,
+                validator=validator,
+                progress=progress,
+                chunk_size=chunk_size,
+                max_workers=max_workers,
+                segment_size=segment_size,
+                timeout=timeout,
+            )
+            result = _finish(part_path, path, checksum, total, downloaded, start_time)
+            result.parallel = True
+            return result
+
+        # Saved before the part file is written, so resuming can trust its size
+        # and tell whether the object changed
+        write_state(state_path, {"validator": validator})
+        tracker = _Progress(progress, total, offset)
+        with open(part_path, "ab" if offset else "wb") as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                tracker.advance(len(chunk))
+
+    state_path.unlink(missing_ok=True)
+    return _finish(part_path, path, checksum, tracker.done, tracker.transferred, start_time)
+
+
+def _download_segments(
+    http,
+    url: str,
+    part_path: Path,
+    state_path: Path,
+    total: int,
+    *,
+    validator: Dict[str, str],
+    progress: Optional[ProgressCallback],
+    chunk_size: int,
+    max_workers: int,
+    segment_size: int,
+    timeout: Optional[float],
+) -> int:
+    segments = [
+        Segment(number=i, start=start, end=min(start + segment_size, total) - 1)
+        for i, start in enumerate(range(0, total, segment_size))
+    ]
+
+    # The state file records finished segments so a resumed parallel download
+    # only fetches the ones that are missing.
+    completed = set()
+    state = read_state(state_path)
+    if (
+        state.get("size") == total
+        and state.get("segment_size") == segment_size
+        and state.get("validator", {}) == validator
+    ):
+        completed = set(state.get("completed", []))
+
+    def save_state() -> None:
+        write_state(
+            state_path,
+            {
+                "size": total,
+                "segment_size": segment_size,
+                "validator": validator,
+                "completed": sorted(completed),
+            },
+        )
+
+    if not completed or not part_path.exists():
+        completed = set()
+        # Saved before preallocating, so a part file is never left without a
+        # state that says it was preallocated
+        save_state()
+        with open(part_path, "wb") as f:
+            f.truncate(total)
+
+    done = sum(s.end - s.start + 1 for s in segments if s.number in completed)
+    tracker = _Progress(progress, total, done)
+    state_lock = threading.Lock()
+
+    def fetch(segment: Segment) -> None:
+        headers = {"Range": f"bytes={segment.start}-{segment.end}"}
+        with http.get(url, headers=headers, stream=True, timeout=timeout) as response:
+            if response.status_code != 206:
+                raise DownloadChunkError(
+                    segment.number, segment.start, segment.end, f"HTTP {response.status_code}"
+                )
+
+            with open(part_path, "r+b") as f:
+                f.seek(segment.start)
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+                    tracker.advance(len(chunk))
+
+        with state_lock:
+            completed.add(segment.number)
+            save_state()
+
+    pending: List[Segment] = [s for s in segments if s.number not in completed]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for future in [executor.submit(fetch, segment) for segment in pending]:
+            future.result()
+
+    state_path.unlink(missing_ok=True)
+    return tracker.transferred
+
+
+def read_state(state_path: Path) -> dict:
+    """Returns the state saved by an interrupted download, or {} if there is none."""
+    try:
+        state = json.loads(state_path.read_text())
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def write_state(state_path: Path, state: dict) -> None:
+    """Saves the state of a download, atomically so a crash never leaves part of it."""
+    fd, tmp_path = tempfile.mkstemp(dir=state_path.parent, prefix=f".{state_path.name}.")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def resume_offset(part_path: Path, state: dict) -> int:
+    """Returns the offset to resume a download from its part file at."""
+    # The state is saved before anything is written to the part file, so a
+    # part file without one can't be trusted. A state with segments means the
+    # part file was preallocated by a parallel download, so its size says
+    # nothing about how much was written.
+    if not part_path.exists() or "validator" not in state or "segment_size" in state:
+        return 0
+    return part_path.stat().st_size
+
+
+def resume_headers(offset: int, state: dict) -> Dict[str, str]:
+    """Returns the headers that request the rest of an object from `offset`."""
+    if not offset:
+        return {}
+
+    headers = {"Range": f"bytes={offset}-"}
+    validator = state.get("validator") or {}
+    # Weak ETags can't be used in If-Range
+    etag = validator.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["If-Range"] = etag
+    elif validator.get("last_modified"):
+        headers["If-Range"] = validator["last_modified"]
+    return headers
+
+
+def response_validator(response) -> Dict[str, str]:
+    """Returns the ETag and Last-Modified of a response, when it has them."""
+    validator = {}
+    if etag := response.headers.get("ETag"):
+        validator["etag"] = etag
+    if last_modified := response.headers.get("Last-Modified"):
+        validator["last_modified"] = last_modified
+    return validator
+
+
+def _finish(
+    part_path: Path,
+    path: Path,
+    checksum: Optional[str],
+    size: int,
+    downloaded: int,
+    start_time: float,
+) -> DownloadResult:
+    if checksum:
+        try:
+            verify_checksum(part_path, checksum)
+        except ChecksumMismatchError:
+            part_path.unlink(missing_ok=True)
+            raise
+
+    os.replace(part_path, path)
+    return DownloadResult(
+        path=path,
+        size=size,
+        downloaded=downloaded,
+        seconds=time.monotonic() - start_time,
+        resumed=downloaded < size,
+    )
+
+
+def verify_checksum(path: Union[str, Path], checksum: str) -> None:
+    """
+    Raises ChecksumMismatchError if the file's digest does not match
+    `checksum`, given as "<algorithm>:<hex digest>".
+    """
+    algorithm, _, expected = checksum.partition(":")
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+
+    actual = digest.hexdigest()
+    if actual.lower() != expected.lower():
+        raise ChecksumMismatchError(algorithm, expected, actual)
+
+
+def _content_length(response: requests.Response) -> Optional[int]:
+    value = response.headers.get("Content-Length")
+    return int(value) if value and value.isdigit() else None
+
+
+def _content_range_total(response) -> Optional[int]:
+    # e.g. "bytes 100-999/1000", or "bytes */1000" on a 416
+    total = response.headers.get("Content-Range", "").rpartition("/")[2]
+    return int(total) if total.isdigit() else None
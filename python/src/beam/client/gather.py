@@ -0,0 +1,169 @@
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from beta9.client.task import Task
+from beta9.exceptions import TaskNotFoundError
+from beta9.type import TaskStatus
+
+if TYPE_CHECKING:
+    from .client import Client
+
+DEFAULT_MIN_INTERVAL = 0.1
+DEFAULT_MAX_INTERVAL = 5.0
+BACKOFF = 1.5
+
+# Task IDs per status request, which keeps the query string a sensible length
+BATCH_SIZE = 100
+
+# Polls a task can be missing from the batched statuses before it's looked up
+# on its own
+MISSING_POLLS = 3
+
+TaskRef = Union[Task, str]
+
+
+class TaskGatherer:
+    """
+    Waits for many tasks with one polling loop.
+
+    Each round asks the gateway for the status of up to `batch_size` tasks per
+    request, using the task list endpoint filtered by task ID. If the gateway
+    doesn't support that filter, it falls back to one status request per
+    pending task, still from the single loop. The interval between rounds
+    starts at `min_interval`, grows by `BACKOFF` while nothing completes, is
+    capped at `max_interval`, and drops back to `min_interval` as soon as a
+    task finishes. A task missing from `missing_polls` batched responses in a
+    row is looked up on its own from then on.
+
+    A completed task is fetched once more to load its result and outputs.
+    """
+
+    def __init__(
+        self,
+        client: "Client",
+        tasks: Iterable[TaskRef],
+        *,
+        min_interval: float = DEFAULT_MIN_INTERVAL,
+        max_interval: float = DEFAULT_MAX_INTERVAL,
+        batch_size: int = BATCH_SIZE,
+        missing_polls: int = MISSING_POLLS,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.client = client
+        self.pending: Dict[str, TaskRef] = {get_task_id(task): task for task in tasks}
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.batch_size = batch_size
+        self.missing_polls = missing_polls
+        # Task ID -> polls in a row it was missing from the batched statuses
+        self.missing: Dict[str, int] = {}
+        self.sleep = sleep
+        self.clock = clock
+        self.batched = True
+
+    def as_completed(self, timeout: Optional[float] = None) -> Iterator[Task]:
+        """
+        Yields each task once it has finished (complete, error, cancelled or
+        timed out), in the order they finish.
+
+        Raises:
+            TimeoutError: If tasks are still running after `timeout` seconds.
+            TaskNotFoundError: If a task doesn't exist.
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        interval = self.min_interval
+
+        while self.pending:
+            finished = self._poll()
+            for task_id in finished:
+                yield self._refresh(self.pending.pop(task_id))
+
+            if not self.pending:
+                return
+
+            if finished:
+                interval = self.min_interval
+            else:
+                interval = min(interval * BACKOFF, self.max_interval)
+
+            delay = interval
+            if deadline is not None:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    raise TimeoutError(f"{len(self.pending)} task(s) did not finish in time")
+                delay = min(delay, remaining)
+
+            self.sleep(delay)
+
+    def _poll(self) -> List[str]:
+        ids = list(self.pending)
+        if self.batched:
+            finished = []
+            for start in range(0, len(ids), self.batch_size):
+                batch = ids[start : start + self.batch_size]
+                statuses = self._list_statuses(batch)
+                if statuses is None:
+                    self.batched = False
+                    break
+                finished.extend(i for i, status in statuses.items() if status.is_complete())
+                finished.extend(self._poll_missing(batch, statuses))
+            else:
+                return finished
+
+        return [task_id for task_id in ids if self._get_status(task_id).is_complete()]
+
+    def _poll_missing(self, ids: List[str], statuses: Dict[str, TaskStatus]) -> List[str]:
+        finished = []
+        for task_id in ids:
+            if task_id in statuses:
+                self.missing.pop(task_id, None)
+                continue
+
+            self.missing[task_id] = self.missing.get(task_id, 0) + 1
+            if self.missing[task_id] >= self.missing_polls:
+                if self._get_status(task_id).is_complete():
+                    finished.append(task_id)
+        return finished
+
+    def _list_statuses(self, ids: List[str]) -> Optional[Dict[str, TaskStatus]]:
+        response = self.client.session.get(
+            self._tasks_url,
+            params={"task_ids": ",".join(ids), "limit": len(ids)},
+            headers=self.client._headers,
+        )
+        if response.status_code in (400, 404, 405):
+            return None
+        response.raise_for_status()
+
+        requested = set(ids)
+        statuses = {}
+        for task in response.json().get("data") or []:
+            # Tasks that weren't asked for mean the gateway ignored the filter
+            if task.get("external_id") not in requested:
+                return None
+            statuses[task["external_id"]] = TaskStatus(task["status"])
+        return statuses
+
+    def _get_status(self, task_id: str) -> TaskStatus:
+        response = self.client.session.get(
+            f"{self._tasks_url}/{task_id}", headers=self.client._headers
+        )
+        if response.status_code == 404:
+            raise TaskNotFoundError(task_id)
+        response.raise_for_status()
+        return TaskStatus(response.json()["status"])
+
+    def _refresh(self, task: TaskRef) -> Task:
+        if not isinstance(task, Task):
+            task = self.client._task(task)
+        task._get()
+        return task
+
+    @property
+    def _tasks_url(self) -> str:
+        return f"{self.client.base_url}/api/v1/task/{self.client.workspace_id}"
+
+
+def get_task_id(task: TaskRef) -> str:
+    return task.id if isinstance(task, Task) else task
@@ -0,0 +1,374 @@
+import functools
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, TypeVar
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Path segments that identify one object, e.g. a task or workspace ID, are
+# replaced in endpoints so requests to the same API are grouped together
+ID_SEGMENT = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|(?=[^/]*\d)[\w.-]{16,}",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class RequestEvent:
+    """
+    One HTTP request made by the client.
+
+    `duration` is the time until the response headers arrived, so for streamed
+    responses, like downloads, it doesn't include reading the body. Then
+    `bytes_received` is the Content-Length, or None when it isn't known.
+    """
+
+    method: str
+    url: str
+    # The URL path, with IDs replaced by "{id}"
+    endpoint: str
+    status: Optional[int]
+    bytes_sent: int
+    bytes_received: Optional[int]
+    duration: float
+    error: Optional[BaseException] = None
+
+
+@dataclass
+class RetryEvent:
+    """A request attempt that failed and was retried."""
+
+    method: str
+    endpoint: str
+    attempt: int
+    status: Optional[int]
+    error: Optional[BaseException] = None
+
+
+@dataclass
+class OperationEvent:
+    """One call of a client method, like `Client.submit`, from start to end."""
+
+    name: str
+    duration: float
+    error: Optional[BaseException] = None
+
+
+class Instrumentation:
+    """
+    Receives events from a Client. Subclass it and override the methods for
+    the events you need, then pass an instance as the client's
+    `instrumentation`. Every method does nothing by default.
+
+    Methods are called from the thread that made the call, so they must be
+    thread-safe when the client is shared between threads, and fast, since
+    they run on the request path.
+    """
+
+    def on_request_start(self, method: str, endpoint: str) -> None:
+        pass
+
+    def on_request(self, event: RequestEvent) -> None:
+        pass
+
+    def on_retry(self, event: RetryEvent) -> None:
+        pass
+
+    def on_cache(self, cache: str, hit: bool) -> None:
+        pass
+
+    def on_operation(self, event: OperationEvent) -> None:
+        pass
+
+
+def endpoint(url: str) -> str:
+    """Returns the path of `url` with IDs replaced by "{id}"."""
+    return "/".join(
+        "{id}" if ID_SEGMENT.fullmatch(segment) else segment
+        for segment in urlsplit(url).path.split("/")
+    )
+
+
+class InstrumentedAdapter(BaseAdapter):
+    """Sends requests with another adapter and reports them to an Instrumentation."""
+
+    def __init__(self, adapter: BaseAdapter, instrumentation: Instrumentation) -> None:
+        super().__init__()
+        self.adapter = adapter
+        self.instrumentation = instrumentation
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        method = request.method or ""
+        url = request.url or ""
+        path = endpoint(url)
+        body = request.body
+        bytes_sent = len(body) if isinstance(body, (bytes, str)) else 0
+
+        self.instrumentation.on_request_start(method, path)
+        start = time.perf_counter()
+        try:
+            response = self.adapter.send(request, **kwargs)
+        except BaseException as e:
+            self.instrumentation.on_request(
+                RequestEvent(
+                    method, url, path, None, bytes_sent, None, time.perf_counter() - start, e
+                )
+            )
+            raise
+        duration = time.perf_counter() - start
+
+        # urllib3 records the attempts it retried on the response
+        retries = getattr(response.raw, "retries", None)
+        for attempt, history in enumerate(getattr(retries, "history", ()), 1):
+            self.instrumentation.on_retry(
+                RetryEvent(method, path, attempt, history.status, history.error)
+            )
+
+        length = response.headers.get("Content-Length")
+        self.instrumentation.on_request(
+            RequestEvent(
+                method,
+                url,
+                path,
+                response.status_code,
+                bytes_sent,
+                int(length) if length and length.isdigit() else None,
+                duration,
+            )
+        )
+        return response
+
+    def close(self) -> None:
+        self.adapter.close()
+
+
+def instrumented_session(
+    session: requests.Session, instrumentation: Instrumentation
+) -> requests.Session:
+    """
+    Returns a session that sends requests with the adapters of `session`,
+    and so its connection pools, and reports them to `instrumentation`.
+
+    `session` itself is left unchanged, so clients sharing it each report
+    their own requests. Its settings (headers, cookies, auth...) are shared,
+    not copied. Closing the returned session closes the adapters of `session`.
+    """
+    instrumented = requests.Session()
+    for name in requests.Session.__attrs__:
+        setattr(instrumented, name, getattr(session, name))
+
+    instrumented.adapters = OrderedDict()
+    for prefix, adapter in session.adapters.items():
+        instrumented.mount(prefix, InstrumentedAdapter(adapter, instrumentation))
+    return instrumented
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """
+    Reports calls of a client method as operations, when the client has an
+    instrumentation. Otherwise the method is called directly.
+    """
+
+    def decorator(method: F) -> F:
+        @functools.wraps(method)
+        def wrapper(self, *args: Any, **kwargs: Any) -> Any:
+            instrumentation = self.instrumentation
+            if instrumentation is None:
+                return method(self, *args, **kwargs)
+
+            start = time.perf_counter()
+            error = None
+            try:
+                return method(self, *args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                instrumentation.on_operation(
+                    OperationEvent(name, time.perf_counter() - start, error)
+                )
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+class Histogram:
+    """
+    Records durations in exponential buckets, so memory stays constant however
+    many values are recorded. Percentiles are accurate to within `precision`
+    (relative), and exact at the extremes.
+    """
+
+    def __init__(self, precision: float = 0.02, smallest: float = 1e-6) -> None:
+        self._log_base = math.log1p(2 * precision)
+        self.smallest = smallest
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        bucket = int(math.log(max(value, self.smallest) / self.smallest) / self._log_base)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> float:
+        """Returns the value below which `q` percent of the recorded values fall."""
+        if not self.count:
+            return 0.0
+        if q <= 0:
+            return self.min
+        if q >= 100:
+            return self.max
+
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                # The middle of the bucket, in log space
+                value = self.smallest * math.exp((bucket + 0.5) * self._log_base)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class MetricsCollector(Instrumentation):
+    """
+    Keeps in-memory metrics of a client:
+
+    - a Histogram of request durations per method and endpoint, like
+      "POST /endpoint/app", and of operation durations, like "Client.submit"
+    - cache hits and misses per cache
+    - retries per method and endpoint
+    """
+
+    def __init__(self) -> None:
+        self.requests: Dict[str, Histogram] = {}
+        self.operations: Dict[str, Histogram] = {}
+        self.cache: Dict[str, Dict[str, int]] = {}
+        self.retries: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def on_request(self, event: RequestEvent) -> None:
+        key = f"{event.method} {event.endpoint}"
+        with self._lock:
+            self._histogram(self.requests, key).record(event.duration)
+            if event.error is not None or (event.status or 0) >= 400:
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def on_retry(self, event: RetryEvent) -> None:
+        key = f"{event.method} {event.endpoint}"
+        with self._lock:
+            self.retries[key] = self.retries.get(key, 0) + 1
+
+    def on_cache(self, cache: str, hit: bool) -> None:
+        with self._lock:
+            counts = self.cache.setdefault(cache, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def on_operation(self, event: OperationEvent) -> None:
+        with self._lock:
+            self._histogram(self.operations, event.name).record(event.duration)
+
+    def summary(self) -> Dict[str, Any]:
+        """Returns every metric as plain data, with durations in seconds."""
+        with self._lock:
+            return {
+                "requests": {key: h.summary() for key, h in self.requests.items()},
+                "operations": {key: h.summary() for key, h in self.operations.items()},
+                "cache": {key: dict(counts) for key, counts in self.cache.items()},
+                "retries": dict(self.retries),
+                "errors": dict(self.errors),
+            }
+
+    @staticmethod
+    def _histogram(histograms: Dict[str, Histogram], key: str) -> Histogram:
+        if (histogram := histograms.get(key)) is None:
+            histogram = histograms[key] = Histogram()
+        return histogram
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """
+    Records client events as OpenTelemetry metrics, with the HTTP semantic
+    convention names where there are some:
+
+    - `http.client.request.duration` (histogram, seconds)
+    - `beam.client.operation.duration` (histogram, seconds)
+    - `beam.client.cache.lookups` (counter, with a `beam.cache.hit` attribute)
+    - `beam.client.retries` (counter)
+
+    Requires opentelemetry-api. Metrics go to the global meter provider unless
+    one is given.
+    """
+
+    def __init__(self, meter_provider: Any = None) -> None:
+        try:
+            from opentelemetry import metrics
+        except ImportError as e:
+            raise ImportError(
+                "OpenTelemetryInstrumentation requires opentelemetry-api. "
+                "Install it with `pip install opentelemetry-api`."
+            ) from e
+
+        meter = (meter_provider or metrics.get_meter_provider()).get_meter("beam.client")
+        self._request_duration = meter.create_histogram(
+            "http.client.request.duration", unit="s", description="Duration of HTTP requests."
+        )
+        self._operation_duration = meter.create_histogram(
+            "beam.client.operation.duration", unit="s", description="Duration of client calls."
+        )
+        self._cache_lookups = meter.create_counter(
+            "beam.client.cache.lookups", description="Client cache lookups."
+        )
+        self._retries = meter.create_counter(
+            "beam.client.retries", description="Retried HTTP requests."
+        )
+
+    def on_request(self, event: RequestEvent) -> None:
+        attributes: Dict[str, Any] = {
+            "http.request.method": event.method,
+            "url.template": event.endpoint,
+            "server.address": urlsplit(event.url).hostname or "",
+        }
+        if event.status is not None:
+            attributes["http.response.status_code"] = event.status
+        if event.error is not None:
+            attributes["error.type"] = type(event.error).__qualname__
+        self._request_duration.record(event.duration, attributes)
+
+    def on_retry(self, event: RetryEvent) -> None:
+        self._retries.add(1, {"http.request.method": event.method, "url.template": event.endpoint})
+
+    def on_cache(self, cache: str, hit: bool) -> None:
+        self._cache_lookups.add(1, {"beam.cache": cache, "beam.cache.hit": hit})
+
+    def on_operation(self, event: OperationEvent) -> None:
+        attributes: Dict[str, Any] = {"beam.operation": event.name}
+        if event.error is not None:
+            attributes["error.type"] = type(event.error).__qualname__
+        self._operation_duration.record(event.duration, attributes)
@@ -0,0 +1,364 @@
+import contextlib
+import datetime
+import heapq
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.client import ClientConnection, connect
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Realtime object type and the log field holding its ID, by object type name
+OBJECT_TYPES = {
+    "stub": ("BETA9_STUB", "stub_id"),
+    "deployment": ("BETA9_DEPLOYMENT", "deployment_id"),
+    "task": ("BETA9_TASK", "task_id"),
+    "container": ("BETA9_CONTAINER", "container_id"),
+}
+
+HEADERS = {"X-BEAM-CLIENT": "CLI"}
+
+# Seconds between pings that keep idle log connections open
+KEEP_ALIVE_INTERVAL = 60
+
+# Most history lines asked for when only `since` is given
+MAX_HISTORY_LINES = 10_000
+
+Timestamp = Union[datetime.datetime, str]
+
+
+class LogStreamError(Exception):
+    """The realtime gateway sent an error instead of logs."""
+
+
+class LogSource(NamedTuple):
+    object_type: str
+    # The field of a log line holding the ID of this kind of object
+    field: str
+    object_id: str
+
+    def matches(self, hit: dict) -> bool:
+        return hit["_source"].get(self.field) == self.object_id
+
+
+@dataclass
+class LogRecord:
+    """
+    One log line. `fields` holds everything the gateway sent with it.
+    """
+
+    timestamp: str
+    message: str
+    object_id: str
+    object_type: str
+    fields: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_hit(cls, hit: dict, source: LogSource) -> "LogRecord":
+        log = hit["_source"]
+        return cls(
+            timestamp=log["@timestamp"],
+            message=log.get("msg", ""),
+            object_id=source.object_id,
+            object_type=source.object_type,
+            fields=log,
+        )
+
+
+def log_source(object_id: str, object_type: str) -> LogSource:
+    """
+    Returns the source of an object's logs. `object_type` is "stub",
+    "deployment", "task" or "container", or a realtime type like "BETA9_TASK".
+    """
+    for name, (realtime_type, id_field) in OBJECT_TYPES.items():
+        if object_type.lower() == name or object_type.upper() == realtime_type:
+            return LogSource(realtime_type, id_field, object_id)
+
+    raise ValueError(f"Unknown object type: {object_type}")
+
+
+def loads(msg: Union[str, bytes]) -> Any:
+    """Decodes a realtime message, with orjson when it's installed."""
+    return orjson.loads(msg) if orjson is not None else json.loads(msg)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encodes an object as compact JSON, with orjson when it's installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def query_message(
+    token: str,
+    source: LogSource,
+    size: int,
+    ending_timestamp: Timestamp,
+    since: Optional[str] = None,
+) -> str:
+    if isinstance(ending_timestamp, datetime.datetime):
+        ending_timestamp = ending_timestamp.isoformat()
+
+    message = {
+        "token": token,
+        "streamType": "LOGS_STREAM",
+        "action": "LOGS_QUERY",
+        "stream": False,
+        "objectType": source.object_type,
+        "objectId": source.object_id,
+        "size": size,
+        "endingTimestamp": ending_timestamp,
+    }
+    if since is not None:
+        message["startingTimestamp"] = since
+    return json.dumps(message)
+
+
+def stream_message(token: str, source: LogSource, starting_timestamp: datetime.datetime) -> str:
+    return json.dumps(
+        {
+            "token": token,
+            "streamType": "LOGS_STREAM",
+            "action": "LOGS_ADD_STREAM",
+            "stream": True,
+            "objectType": source.object_type,
+            "objectId": source.object_id,
+            "startingTimestamp": starting_timestamp.isoformat(),
+        }
+    )
+
+
+def parse_hits(data: dict) -> List[dict]:
+    """
+    Returns the log hits of a decoded realtime message, sorted by timestamp.
+    Messages that hold no logs have no hits.
+
+    Raises:
+        LogStreamError: If the message is an error.
+    """
+    if "error" in data:
+        raise LogStreamError(str(data["error"]).capitalize())
+    if "logs" not in data:
+        return []
+
+    hits = data["logs"]["hits"]["hits"]
+
+    # Hits usually arrive in order already, which is cheaper to check than to sort
+    timestamps = [hit["_source"]["@timestamp"] for hit in hits]
+    if all(a <= b for a, b in zip(timestamps, timestamps[1:])):
+        return hits
+    return sorted(hits, key=lambda k: k["_source"]["@timestamp"])
+
+
+class KeepAlive:
+    """
+    Pings websocket connections every `interval` seconds from one thread
+    shared by all of them.
+
+    Connections are added and removed independently. The thread sleeps
+    until the next ping is due or a connection is added, and doesn't wake
+    at all while there are none. A connection whose ping fails is removed.
+    """
+
+    def __init__(self, interval: float = KEEP_ALIVE_INTERVAL) -> None:
+        self.interval = interval
+        self._connections: Dict[int, ClientConnection] = {}
+        # When each connection is next due, and the same as a heap. Heap entries
+        # that no longer match `_next` belong to removed connections.
+        self._next: Dict[int, float] = {}
+        self._due: List[Tuple[float, int]] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    def add(self, conn: ClientConnection) -> None:
+        with self._cond:
+            key = id(conn)
+            self._connections[key] = conn
+            self._schedule(key, time.monotonic() + self.interval)
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="beam-keep-alive", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def remove(self, conn: ClientConnection) -> None:
+        with self._cond:
+            key = id(conn)
+            if self._connections.get(key) is conn:
+                del self._connections[key]
+                del self._next[key]
+
+    @contextlib.contextmanager
+    def connection(self, conn: ClientConnection) -> Iterator[ClientConnection]:
+        """Keeps `conn` alive until the block exits."""
+        self.add(conn)
+        try:
+            yield conn
+        finally:
+            self.remove(conn)
+
+    def _schedule(self, key: int, due: float) -> None:
+        self._next[key] = due
+        heapq.heappush(self._due, (due, key))
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    while self._due and self._next.get(self._due[0][1]) != self._due[0][0]:
+                        heapq.heappop(self._due)
+
+                    if not self._due:
+                        self._cond.wait()
+                        continue
+
+                    delay = self._due[0][0] - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+
+                _, key = heapq.heappop(self._due)
+                conn = self._connections[key]
+                self._schedule(key, time.monotonic() + self.interval)
+
+            try:
+                conn.ping()
+            except (ConnectionClosed, OSError, RuntimeError):
+                self.remove(conn)
+
+
+# Keeps every synchronous log connection of the process alive
+keep_alive = KeepAlive()
+
+
+def open_messages(
+    token: str,
+    source: LogSource,
+    now: datetime.datetime,
+    since: Optional[Timestamp] = None,
+    lines: int = 0,
+    follow: bool = True,
+) -> List[str]:
+    """
+    Returns the messages that start a log stream: a history query when
+    `since` or `lines` is given, then a live stream when following.
+    """
+    messages = []
+    if since is not None or lines:
+        if isinstance(since, datetime.datetime):
+            since = since.isoformat()
+        messages.append(query_message(token, source, lines or MAX_HISTORY_LINES, now, since=since))
+    if follow:
+        messages.append(stream_message(token, source, now))
+    return messages
+
+
+def stream_logs(
+    url: str,
+    token: str,
+    source: LogSource,
+    *,
+    since: Optional[Timestamp] = None,
+    lines: int = 0,
+    follow: bool = True,
+) -> Iterator[LogRecord]:
+    """
+    Yields the log records of `source` from the realtime gateway at `url`.
+
+    History comes first: the last `lines` lines, or every line since `since`
+    (up to `MAX_HISTORY_LINES`), or both. Then, if `follow` is set, new lines
+    as they arrive until the gateway ends the stream. The connection is kept
+    alive by the shared `keep_alive` thread and closed when the generator is
+    closed, so `break`ing out of a loop over it ends the stream.
+
+    Raises:
+        LogStreamError: If the gateway sends an error.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    messages = open_messages(token, source, now, since=since, lines=lines, follow=follow)
+    if not messages:
+        return
+
+    # Closed explicitly rather than with `with`, which would report closing
+    # early as an error to the gateway
+    conn = connect(url, additional_headers=HEADERS)
+    try:
+        with keep_alive.connection(conn):
+            for message in messages:
+                conn.send(message)
+
+            if since is not None or lines:
+                for hit in parse_hits(loads(conn.recv())):
+                    yield LogRecord.from_hit(hit, source)
+
+            if not follow:
+                return
+
+            for message in conn:
+                for hit in parse_hits(loads(message)):
+                    yield LogRecord.from_hit(hit, source)
+    finally:
+        conn.close()
+
+
+async def stream_logs_async(
+    url: str,
+    token: str,
+    source: LogSource,
+    *,
+    since: Optional[Timestamp] = None,
+    lines: int = 0,
+    follow: bool = True,
+) -> AsyncIterator[LogRecord]:
+    """
+    Like `stream_logs`, as an async generator. The connection is kept alive
+    with pings from the event loop, so it needs no thread. Cancelling the
+    task iterating it, or closing it with `aclose`, closes the connection.
+    """
+    # Imported here so synchronous users don't pay for importing asyncio
+    from websockets.asyncio.client import connect as connect_async
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    messages = open_messages(token, source, now, since=since, lines=lines, follow=follow)
+    if not messages:
+        return
+
+    conn = await connect_async(url, additional_headers=HEADERS, ping_interval=KEEP_ALIVE_INTERVAL)
+    try:
+        for message in messages:
+            await conn.send(message)
+
+        if since is not None or lines:
+            for hit in parse_hits(loads(await conn.recv())):
+                yield LogRecord.from_hit(hit, source)
+
+        if not follow:
+            return
+
+        async for message in conn:
+            for hit in parse_hits(loads(message)):
+                yield LogRecord.from_hit(hit, source)
+    finally:
+        await conn.close()
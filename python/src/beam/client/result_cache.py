@@ -0,0 +1,337 @@
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+DEFAULT_MAXSIZE = 1024
+DEFAULT_MAX_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 1024 * 1024 * 1024
+DEFAULT_TTL = 3600
+DEFAULT_CACHE_PATH = Path("~/.beam/cache/results").expanduser()
+
+
+@dataclass
+class ResultEntry:
+    identifier: str
+    # The result as JSON, so every hit gets its own copy
+    value: str
+    expires_at: float
+
+
+@dataclass
+class ResultCacheStats:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    # Calls that waited for an identical call in flight instead of making their own
+    shared: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+class _Flight:
+    """A call in flight, which identical calls wait for."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+    def result(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class ResultCache:
+    """
+    A thread-safe cache of deployment results, keyed by a hash of the deployment
+    identifier and the input, for deployments that always return the same
+    output for the same input.
+
+    Results are kept in memory, least recently used first out once there are
+    more than `maxsize` of them or they take more than `max_memory_bytes`. When
+    `path` is set, they are also written to that directory, one file per
+    result, so other processes can use them; the least recently used files are
+    removed once they take more than `max_disk_bytes`.
+
+    Results expire after `ttl` seconds, or after `ttls[identifier]` seconds for
+    the deployments in `ttls`. A TTL of 0 turns caching off for a deployment.
+
+    Only JSON-serializable results are cached.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_MAXSIZE,
+        ttl: float = DEFAULT_TTL,
+        ttls: Optional[Dict[str, float]] = None,
+        path: Optional[Union[str, Path]] = None,
+        max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES,
+        max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.path = Path(path).expanduser() if path else None
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.clock = clock
+        self.stats = ResultCacheStats()
+        self._entries: "OrderedDict[str, ResultEntry]" = OrderedDict()
+        self._memory_bytes = 0
+        # Key -> size of the files on disk, least recently used first
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._in_flight: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+        if self.path:
+            self._scan()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(identifier: str, input: Any, namespace: str = "") -> str:
+        """
+        Returns the hash of `input` sent to the deployment `identifier`. Inputs
+        that are equal as JSON have the same key, whatever their key order.
+        """
+        canonical = json.dumps(
+            [namespace, identifier, input],
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def ttl_for(self, identifier: str) -> float:
+        return self.ttls.get(identifier, self.ttl)
+
+    def fetch(
+        self,
+        identifier: str,
+        input: Any,
+        call: Callable[[], Tuple[Any, bool]],
+        *,
+        refresh: bool = False,
+        namespace: str = "",
+    ) -> Tuple[Any, bool]:
+        """
+        Returns the cached result for `input`, or calls `call` and caches what it
+        returns. `call` returns the result and whether it may be cached, e.g.
+        False for an error response.
+
+        An identical call already in flight is waited for instead of making
+        another. With `refresh`, cached results are skipped and replaced.
+
+        Returns:
+            Tuple[Any, bool]: The result, and whether it came without calling `call`.
+        """
+        ttl = self.ttl_for(identifier)
+        if ttl <= 0:
+            return call()[0], False
+
+        key = self.key(identifier, input, namespace)
+        if not refresh:
+            found, value = self.get(key)
+            if found:
+                return value, True
+
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+            else:
+                self.stats.shared += 1
+
+        if not leader:
+            return _copy(flight.result()), True
+
+        try:
+            value, cacheable = call()
+            if cacheable:
+                self.set(key, identifier, value, ttl)
+            flight.value = value
+            return value, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.done.set()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Returns whether `key` has an unexpired result, and the result."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= self.clock():
+                self._remove(key)
+                self.stats.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return True, json.loads(entry.value)
+
+        entry = self._read(key) if self.path else None
+        with self._lock:
+            if entry is None:
+                self.stats.misses += 1
+                return False, None
+            self.stats.disk_hits += 1
+            self._put(key, entry)
+        return True, json.loads(entry.value)
+
+    def set(self, key: str, identifier: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Caches `value` under `key`. Returns False if it isn't JSON-serializable."""
+        try:
+            text = json.dumps(value, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return False
+
+        expires_at = self.clock() + (self.ttl_for(identifier) if ttl is None else ttl)
+        entry = ResultEntry(identifier=identifier, value=text, expires_at=expires_at)
+        with self._lock:
+            self._put(key, entry)
+        if self.path:
+            self._write(key, entry)
+        return True
+
+    def clear(self) -> None:
+        """Removes every result, from memory and disk."""
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+            keys = list(self._files)
+            self._files.clear()
+            self._disk_bytes = 0
+        for key in keys:
+            self._unlink(key)
+
+    def _put(self, key: str, entry: ResultEntry) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._memory_bytes += len(entry.value)
+        while self._entries and (
+            len(self._entries) > self.maxsize or self._memory_bytes > self.max_memory_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+            self.stats.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._memory_bytes -= len(entry.value)
+
+    def _file(self, key: str) -> Path:
+        return self.path / key[:2] / key
+
+    def _scan(self) -> None:
+        files = []
+        for path in self.path.glob("*/*"):
+            # Skips temporary files left by interrupted writes
+            if len(path.name) != 64:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, path.name, stat.st_size))
+
+        for _, key, size in sorted(files):
+            self._files[key] = size
+            self._disk_bytes += size
+
+    def _read(self, key: str) -> Optional[ResultEntry]:
+        path = self._file(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            header, _, value = data.decode().partition("\n")
+            entry = ResultEntry(value=value, **json.loads(header))
+        except (OSError, ValueError, TypeError):
+            return None
+
+        if entry.expires_at <= self.clock():
+            with self._lock:
+                self._forget_file(key)
+                self.stats.expirations += 1
+            self._unlink(key)
+            return None
+
+        try:
+            # Least recently used files are evicted first, also by other processes
+            os.utime(path)
+        except OSError:
+            pass
+        # The file may have been written by another process since the scan, so
+        # its size is counted against `max_disk_bytes` from here on
+        self._track_file(key, len(data))
+        return entry
+
+    def _write(self, key: str, entry: ResultEntry) -> None:
+        header = json.dumps({"identifier": entry.identifier, "expires_at": entry.expires_at})
+        data = f"{header}\n{entry.value}".encode()
+        if len(data) > self.max_disk_bytes:
+            return
+
+        path = self._file(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The disk tier is an optimization; the in-memory cache still works
+            return
+
+        self._track_file(key, len(data))
+
+    def _track_file(self, key: str, size: int) -> None:
+        """Records `key` as the most recently used file, evicting the least recently used."""
+        with self._lock:
+            self._forget_file(key)
+            self._files[key] = size
+            self._disk_bytes += size
+            evicted = []
+            while self._disk_bytes > self.max_disk_bytes:
+                oldest = next(iter(self._files))
+                self._forget_file(oldest)
+                evicted.append(oldest)
+                self.stats.evictions += 1
+        for oldest in evicted:
+            self._unlink(oldest)
+
+    def _forget_file(self, key: str) -> None:
+        self._disk_bytes -= self._files.pop(key, 0)
+
+    def _unlink(self, key: str) -> None:
+        try:
+            self._file(key).unlink()
+        except OSError:
+            pass
+
+
+def _copy(value: Any) -> Any:
+    """
+    Returns a copy of a result for a call that shared another's, made the way
+    cache hits are when it's JSON-serializable. Tasks can return other objects.
+    """
+    try:
+        return json.loads(json.dumps(value))
+    except (TypeError, ValueError):
+        return copy.deepcopy(value)
@@ -0,0 +1,71 @@
+from typing import Any, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = 32
+
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (10, 300)
+
+Timeout = Union[float, Tuple[float, float], None]
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    An HTTPAdapter that applies a default timeout to requests that don't set one.
+    """
+
+    def __init__(self, *args: Any, timeout: Timeout = DEFAULT_TIMEOUT, **kwargs: Any) -> None:
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def without_read_timeout(timeout: Timeout) -> Timeout:
+    """
+    Returns the connect part of `timeout` with no read timeout, for responses
+    that take as long as the work behind them, like deployment calls and task
+    event streams.
+    """
+    connect = timeout[0] if isinstance(timeout, tuple) else timeout
+    return (connect, None)
+
+
+def create_session(
+    pool_size: int = DEFAULT_POOL_SIZE,
+    timeout: Timeout = DEFAULT_TIMEOUT,
+    max_retries: int = 0,
+    session: Optional[requests.Session] = None,
+) -> requests.Session:
+    """
+    Creates a requests session that keeps up to `pool_size` connections alive
+    per host, so repeated calls skip the TCP and TLS handshakes.
+
+    Sessions are safe to share between threads for making requests, as long as
+    their configuration (headers, adapters) isn't changed concurrently.
+
+    Args:
+        pool_size: Connections kept alive per host. Size it to the number of
+            threads that make requests at the same time.
+        timeout: Default timeout, in seconds, for requests that don't set one.
+        max_retries: Retries for failed connections.
+        session: An existing session to mount the adapters on.
+
+    Returns:
+        requests.Session: The session.
+    """
+    session = session or requests.Session()
+    adapter = TimeoutHTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=max_retries,
+        timeout=timeout,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
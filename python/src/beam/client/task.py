@@ -0,0 +1,119 @@
+import base64
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from beta9.client import task
+from beta9.exceptions import TaskNotFoundError
+from beta9.type import TaskStatus
+
+from .session import DEFAULT_TIMEOUT, Timeout, without_read_timeout
+
+
+class Task(task.Task):
+    """
+    A beta9 Task that makes its requests with a client's pooled session.
+
+    Unlike beta9's Task, creating one makes no request. Its status is looked
+    up the first time it's asked for, or filled in from a response the client
+    already has.
+    """
+
+    def __init__(
+        self,
+        id: str,
+        url: str,
+        token: str,
+        session: requests.Session,
+        body: Optional[dict] = None,
+        timeout: Timeout = DEFAULT_TIMEOUT,
+    ) -> None:
+        self.id = id
+        self.url = url
+        self.session = session
+        self.timeout = timeout
+        self._token = token
+        self._status = None
+        self._result = None
+        self._outputs = []
+        self._loaded = False
+        if body is not None:
+            self._load(body)
+
+    @property
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self._token}", "Content-Type": "application/json"}
+
+    def _get(self) -> None:
+        response = self.session.get(self.url, headers=self._headers)
+        if response.status_code == 404:
+            raise TaskNotFoundError(self.id)
+        response.raise_for_status()
+        self._load(response.json())
+
+    def _load(self, body: dict) -> None:
+        self._status = TaskStatus(body["status"])
+        self._result = decode_result(body.get("result"))
+        self._outputs = body.get("outputs") or []
+        self._loaded = True
+
+    def outputs(self) -> List:
+        """Returns a list of the Output() objects saved during the duration of the task"""
+        if not self._loaded:
+            self._get()
+        return self._outputs
+
+    def subscribe(self, event_handler: Optional[Callable] = None) -> Any:
+        """
+        Waits for the task to finish and returns its result. `event_handler` is
+        called with each status update.
+        """
+        headers = {**self._headers, "Accept": "text/event-stream"}
+
+        try:
+            # Status updates can be minutes apart, so only connecting has a timeout
+            with self.session.get(
+                f"{self.url}/subscribe",
+                headers=headers,
+                stream=True,
+                timeout=without_read_timeout(self.timeout),
+            ) as response:
+                response.raise_for_status()
+                # Event streams are always UTF-8
+                response.encoding = response.encoding or "utf-8"
+                event_type = data = None
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith("event: "):
+                        event_type = line[7:]
+                    elif line.startswith("data: "):
+                        data = line[6:]
+                    elif not line:
+                        if event_type == "status" and data and self._on_status(data, event_handler):
+                            return self._result
+                        event_type = data = None
+        except GeneratorExit:
+            raise
+        except BaseException as e:
+            return {"error": str(e)}
+
+    def _on_status(self, data: str, event_handler: Optional[Callable]) -> bool:
+        try:
+            task_data = json.loads(data)
+        except json.JSONDecodeError:
+            return False
+
+        if event_handler:
+            event_handler(task_data)
+
+        if not TaskStatus(task_data.get("status")).is_complete():
+            return False
+        self._load(task_data)
+        return True
+
+
+def decode_result(result: Any) -> Any:
+    if result and hasattr(result, "get") and result.get("base64"):
+        import cloudpickle
+
+        return cloudpickle.loads(base64.b64decode(result["base64"]))
+    return result
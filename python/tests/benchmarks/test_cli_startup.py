@@ -0,0 +1,49 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import pytest
+
+pytestmark = pytest.mark.benchmark
+
+RUNS = 10
+
+
+def time_cli(*argv: str) -> float:
+    code = "import sys; from beam.cli import main; sys.argv[0] = 'beam'; main.cli()"
+    env = {**os.environ, "CI": "1"}
+
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code, *argv], env=env, capture_output=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [("--help",), ("--version",), ("configure", "--help"), ("logs", "--help")],
+    ids=" ".join,
+)
+def test_cli_startup(argv, record_benchmark):
+    record_benchmark(f"beam {' '.join(argv)}", median_s=time_cli(*argv))
+
+
+@pytest.mark.parametrize("statement", ["import beam", "from beam import Client, Image, endpoint"])
+def test_import_beam(statement, record_benchmark):
+    # `import beam` alone loads almost nothing, so the names apps actually use
+    # are timed too, to catch heavy dependencies on the real import path
+    code = (
+        f"import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)"
+    )
+
+    samples = []
+    for _ in range(RUNS):
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+        samples.append(float(result.stdout))
+    record_benchmark(statement, median_s=statistics.median(samples))
@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / "config.ini"
+    path.write_text("[default]\ntoken = token\n")
+    return path
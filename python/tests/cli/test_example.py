@@ -0,0 +1,339 @@
+import io
+import os
+import socket
+import time
+import zipfile
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from beam.cli import example, quickstart
+
+FILES = {
+    "examples-main/README.md": b"# Examples",
+    "examples-main/01_getting_started/README.md": b"# Getting started",
+    "examples-main/01_getting_started/quickstart.py": b"print('hi')",
+    "examples-main/01_getting_started/data/input.txt": b"not part of the app",
+    "examples-main/02_web/README.md": b"# Web",
+    "examples-main/02_web/app.py": b"app = None",
+    "examples-main/scripts/build.sh": b"exit 0",
+    "examples-main/../escape.py": b"outside",
+}
+
+
+def make_archive(files: dict) -> bytes:
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w", zipfile.ZIP_DEFLATED) as zip:
+        zip.writestr("examples-main/", b"")
+        for name, content in files.items():
+            zip.writestr(name, content)
+    return data.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    path = tmp_path / "cache"
+    monkeypatch.setattr(example, "CACHE_DIR", path)
+    return path
+
+
+@pytest.fixture
+def repo():
+    """The archive served by `archive_url` and its ETag, which tests can change."""
+    return {"archive": make_archive(FILES), "etag": '"v1"'}
+
+
+@pytest.fixture
+def archive_url(stand_in_server, repo, monkeypatch):
+    def get_archive(request):
+        headers = {"ETag": repo["etag"], "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"}
+        if request.headers.get("If-None-Match") == repo["etag"]:
+            return 304, headers, b""
+        return 200, headers, repo["archive"]
+
+    stand_in_server.add_route("GET", "/main.zip", get_archive)
+    monkeypatch.setattr(example, "repo_archive_uri", f"{stand_in_server.url}/main.zip")
+    return stand_in_server
+
+
+def unreachable_url() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}/main.zip"
+
+
+@pytest.fixture
+def opened_members(monkeypatch):
+    opened = []
+    open_member = zipfile.ZipFile.open
+
+    def record(self, name, *args, **kwargs):
+        opened.append(name if isinstance(name, str) else name.filename)
+        return open_member(self, name, *args, **kwargs)
+
+    monkeypatch.setattr(zipfile.ZipFile, "open", record)
+    return opened
+
+
+def test_index_holds_the_direct_children_of_readme_dirs():
+    with zipfile.ZipFile(io.BytesIO(make_archive(FILES))) as zip:
+        index = example.AppIndex.from_members(zip.infolist())
+
+    assert index.files == 7
+    assert list(index.apps) == [".", "01_getting_started", "02_web"]
+    app = index.get("01_getting_started")
+    assert [(f.path.as_posix(), f.member, f.size) for f in app.files] == [
+        ("01_getting_started/README.md", "examples-main/01_getting_started/README.md", 17),
+        ("01_getting_started/quickstart.py", "examples-main/01_getting_started/quickstart.py", 11),
+    ]
+    assert index.get("scripts") is None
+    assert index.get("01_getting_started/data") is None
+
+
+def test_index_is_saved_next_to_the_archive(archive_url, monkeypatch):
+    path = example.fetch_archive(example.repo_archive_uri)
+    with example.RepoArchive(path) as archive:
+        assert len(archive.apps) == 3
+    assert path.with_name("archive.index.json").exists()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the central directory was read again")
+
+    monkeypatch.setattr(example.AppIndex, "from_members", fail)
+    monkeypatch.setattr(zipfile.ZipFile, "__init__", fail)
+    result = CliRunner().invoke(example.list_examples, [])
+
+    assert result.exit_code == 0, result.output
+    assert "02_web" in result.output
+
+
+def test_download_extracts_only_the_chosen_app(archive_url, opened_members, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(example.download_example, ["02_web"])
+
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "02_web/app.py").read_bytes() == b"app = None"
+    assert (tmp_path / "02_web/README.md").read_bytes() == b"# Web"
+    assert not (tmp_path / "01_getting_started").exists()
+
+    assert sorted(opened_members) == [
+        "examples-main/02_web/README.md",
+        "examples-main/02_web/app.py",
+    ]
+
+
+def test_download_all(archive_url, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(example.download_example, ["all"])
+
+    assert result.exit_code == 0, result.output
+    written = sorted(
+        p.relative_to(tmp_path).as_posix()
+        for p in (tmp_path / "examples").rglob("*")
+        if p.is_file()
+    )
+    assert written == [
+        "examples/01_getting_started/README.md",
+        "examples/01_getting_started/quickstart.py",
+        "examples/02_web/README.md",
+        "examples/02_web/app.py",
+        "examples/README.md",
+    ]
+
+
+def test_download_all_honours_the_umask(archive_url, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    umask = os.umask(0o022)
+    try:
+        result = CliRunner().invoke(example.download_example, ["all"])
+    finally:
+        os.umask(umask)
+
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "examples").stat().st_mode & 0o777 == 0o755
+
+
+def test_download_all_merges_into_an_existing_tree(archive_url, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "examples/02_web").mkdir(parents=True)
+    (tmp_path / "examples/mine.py").write_text("keep me")
+    (tmp_path / "examples/02_web/app.py").write_text("old")
+
+    result = CliRunner().invoke(example.download_example, ["all"])
+
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "examples/mine.py").read_text() == "keep me"
+    assert (tmp_path / "examples/02_web/app.py").read_bytes() == b"app = None"
+    assert (tmp_path / "examples/01_getting_started/quickstart.py").exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["cache", "examples"]
+
+
+def test_interrupted_download_all_leaves_nothing_behind(archive_url, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    copy = example.shutil.copyfileobj
+    calls = []
+
+    def copy_then_fail(src, dst, length=0):
+        calls.append(dst.name)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return copy(src, dst, length)
+
+    monkeypatch.setattr(example.shutil, "copyfileobj", copy_then_fail)
+    result = CliRunner().invoke(example.download_example, ["all"])
+
+    assert result.exit_code == 1
+    assert "Aborted" in result.output
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["cache"]
+
+
+def test_extract_files_bounds_bytes_in_flight(tmp_path, monkeypatch):
+    files = {f"examples-main/app/{i}.txt": bytes(100 + i) for i in range(50)}
+    path = tmp_path / "archive.zip"
+    path.write_bytes(make_archive(files))
+
+    used = []
+    acquire = example.ByteBudget.acquire
+
+    def record(self, size):
+        taken = acquire(self, size)
+        used.append(self.used)
+        return taken
+
+    monkeypatch.setattr(example.ByteBudget, "acquire", record)
+    out = tmp_path / "out"
+    with example.RepoArchive(path) as archive:
+        members = [archive.find(Path(name.partition("/")[2])) for name in files]
+        archive.extract_files(
+            [(file, out / file.path) for file in members], workers=4, max_in_flight=500
+        )
+
+    assert max(used) <= 500
+    assert len(list((out / "app").iterdir())) == 50
+    assert (out / "app/7.txt").read_bytes() == bytes(107)
+
+
+def test_list_reads_no_file_contents(archive_url, opened_members):
+    result = CliRunner().invoke(example.list_examples, [])
+
+    assert result.exit_code == 0, result.output
+    assert "01_getting_started" in result.output
+    assert opened_members == []
+
+
+def test_fresh_cache_skips_the_network(archive_url, cache_dir):
+    first = example.fetch_archive(example.repo_archive_uri)
+    second = example.fetch_archive(example.repo_archive_uri)
+
+    assert first == second
+    assert cache_dir in first.parents
+    assert len(archive_url.requests) == 1
+
+
+def test_stale_cache_is_revalidated(archive_url, repo):
+    path = example.fetch_archive(example.repo_archive_uri)
+    assert example.fetch_archive(example.repo_archive_uri, ttl=0) == path
+
+    revalidation = archive_url.requests[-1]
+    assert revalidation.headers["If-None-Match"] == '"v1"'
+    assert revalidation.headers["If-Modified-Since"] == "Wed, 01 Jan 2025 00:00:00 GMT"
+
+    repo["archive"] = make_archive({"examples-main/03_new/README.md": b"# New"})
+    repo["etag"] = '"v2"'
+    example.fetch_archive(example.repo_archive_uri, ttl=0)
+
+    with zipfile.ZipFile(path) as zip:
+        assert zip.namelist() == ["examples-main/", "examples-main/03_new/README.md"]
+
+
+def test_archives_are_cached_per_url(archive_url, cache_dir):
+    main = example.fetch_archive(f"{archive_url.url}/main.zip")
+    archive_url.add_route("GET", "/dev.zip", lambda _: (200, {}, make_archive({})))
+    dev = example.fetch_archive(f"{archive_url.url}/dev.zip")
+
+    assert main != dev
+    assert len(list(cache_dir.iterdir())) == 2
+
+
+def test_offline_uses_the_cached_copy(archive_url):
+    path = example.fetch_archive(example.repo_archive_uri)
+    archive_url.shutdown()
+    archive_url.server_close()
+
+    assert example.fetch_archive(example.repo_archive_uri, ttl=0) == path
+
+
+def test_offline_without_a_cached_copy_fails():
+    with pytest.raises(example.requests.ConnectionError):
+        example.fetch_archive(unreachable_url())
+
+
+def test_quickstart_is_served_from_the_cache(archive_url, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    example.fetch_archive(example.repo_archive_uri)
+
+    result = CliRunner().invoke(quickstart.quickstart, [])
+
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "quickstart.py").read_bytes() == b"print('hi')"
+    assert len(archive_url.requests) == 1
+
+
+@pytest.mark.benchmark
+def test_index_build_and_lookup(tmp_path, record_benchmark):
+    files = {
+        f"examples-main/{app:03}_app/{name}": b"x" * 100
+        for app in range(500)
+        for name in ("README.md", "app.py", "requirements.txt", "data.csv", "test.py")
+    }
+    path = tmp_path / "archive.zip"
+    path.write_bytes(make_archive(files))
+
+    start = time.perf_counter()
+    with example.RepoArchive(path) as archive:
+        built = time.perf_counter() - start
+        names = list(archive.apps.apps)
+
+    start = time.perf_counter()
+    with example.RepoArchive(path) as archive:
+        loaded = time.perf_counter() - start
+        start = time.perf_counter()
+        for name in names:
+            archive.apps.get(name)
+        lookups = time.perf_counter() - start
+
+    record_benchmark(
+        f"beam example index ({len(files)} members)",
+        build_ms=built * 1000,
+        load_ms=loaded * 1000,
+        lookup_us=lookups / len(names) * 1e6,
+    )
+
+
+@pytest.mark.benchmark
+def test_download_all_throughput(tmp_path, record_benchmark):
+    files = {
+        f"examples-main/{app:03}_app/{i}.py": os.urandom(512) + bytes(4096)
+        for app in range(300)
+        for i in range(10)
+    }
+    for app in range(300):
+        files[f"examples-main/{app:03}_app/README.md"] = b"# App"
+    path = tmp_path / "archive.zip"
+    path.write_bytes(make_archive(files))
+    size = sum(len(content) for content in files.values())
+
+    for workers in (1, example.EXTRACT_WORKERS):
+        out = tmp_path / f"out-{workers}"
+        with example.RepoArchive(path) as archive:
+            targets = [(file, out / file.path) for app in archive.apps.all() for file in app.files]
+            start = time.perf_counter()
+            archive.extract_files(targets, workers=workers)
+            elapsed = time.perf_counter() - start
+
+        record_benchmark(
+            f"beam example download all ({len(files)} files, {workers} workers)",
+            files_per_s=len(files) / elapsed,
+            mb_per_s=size / elapsed / 1e6,
+        )
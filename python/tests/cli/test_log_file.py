@@ -0,0 +1,63 @@
+import gzip
+
+import pytest
+
+from beam.cli.log_file import COMPRESSION_ZSTD, RotatingLogFile
+
+
+def read_lines(paths):
+    return [line for path in paths for line in gzip.decompress(path.read_bytes()).splitlines()]
+
+
+def test_rotates_by_compressed_size(tmp_path):
+    opened = []
+    log_file = RotatingLogFile(tmp_path / "logs.jsonl", max_bytes=1024, on_open=opened.append)
+    lines = [f'{{"n": {i}, "pad": "{i * 7919 % 1000003:x}"}}'.encode() for i in range(5000)]
+    for start in range(0, len(lines), 100):
+        log_file.write(b"".join(line + b"\n" for line in lines[start : start + 100]))
+    log_file.close()
+
+    assert len(log_file.files) > 1
+    assert opened == log_file.files
+    assert all(path.name.startswith("logs-") for path in log_file.files)
+    assert all(path.name.endswith(".jsonl.gz") for path in log_file.files)
+    assert read_lines(log_file.files) == lines
+
+
+def test_rotates_by_age(tmp_path, clock):
+    log_file = RotatingLogFile(tmp_path / "logs", max_bytes=None, max_age=60, clock=clock)
+    log_file.write(b"one\n")
+    log_file.write(b"two\n")
+    clock.now += 60
+    log_file.write(b"three\n")
+    log_file.close()
+
+    assert [path.name for path in log_file.files] == [
+        "logs-20231114T221320.jsonl.gz",
+        "logs-20231114T221420.jsonl.gz",
+    ]
+    assert read_lines(log_file.files[:1]) == [b"one", b"two"]
+    assert read_lines(log_file.files[1:]) == [b"three"]
+
+
+def test_close_raises_the_writer_error(tmp_path):
+    (tmp_path / "file").write_text("")
+    log_file = RotatingLogFile(tmp_path / "file" / "logs.jsonl")
+    log_file.write(b"line\n")
+
+    with pytest.raises(OSError):
+        log_file.close()
+    with pytest.raises(OSError):
+        log_file.write(b"line\n")
+
+
+def test_zstd(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    log_file = RotatingLogFile(tmp_path / "logs.jsonl", compression=COMPRESSION_ZSTD)
+    log_file.write(b"line\n")
+    log_file.close()
+
+    (path,) = log_file.files
+    assert path.suffix == ".zst"
+    with zstandard.ZstdDecompressor().stream_reader(path.open("rb")) as reader:
+        assert reader.read() == b"line\n"
@@ -0,0 +1,631 @@
+import bisect
+import contextlib
+import datetime
+import gzip
+import io
+import json
+import queue
+import re
+import socket
+import threading
+import time
+import tracemalloc
+from threading import Thread
+
+import pytest
+from beta9 import terminal
+from click.testing import CliRunner
+from rich.console import Console
+from websockets.sync.client import connect
+
+from beam.cli import logs
+from beam.cli.log_file import RotatingLogFile
+from beam.cli.logs import LogMerger, LogReceiver, render_logs
+
+
+def log_hit(msg: str, timestamp: str, id: str = "", **fields) -> dict:
+    return {
+        "_id": id or timestamp,
+        "_source": {"msg": msg, "@timestamp": timestamp, **fields},
+    }
+
+
+def logs_frame(hits: list) -> str:
+    return json.dumps({"logs": {"hits": {"hits": hits}}})
+
+
+@pytest.fixture
+def console(monkeypatch):
+    output = io.StringIO()
+    monkeypatch.setattr(terminal, "_console", Console(file=output, force_terminal=True, width=120))
+    return output
+
+
+class FakeConnection:
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def recv(self):
+        if not self.frames:
+            raise ConnectionError("closed")
+        return self.frames.pop(0)
+
+
+def run_logs(logs_server, config_path, *args):
+    argv = ["logs", "--host", logs_server.url, "--config-path", str(config_path), *args]
+    if "--reconnect" not in args:
+        argv.append("--no-reconnect")
+    return CliRunner().invoke(logs.common, argv)
+
+
+def test_logs_prints_history_then_live_lines(logs_server, config_path):
+    logs_server.history = [
+        log_hit("two\n", "2024-01-01T00:00:02"),
+        log_hit("one\n", "2024-01-01T00:00:01"),
+    ]
+    logs_server.live = [
+        logs_frame([log_hit("three\n", "2024-01-01T00:00:03")]),
+        logs_frame([log_hit("four\n", "2024-01-01T00:00:04")]),
+    ]
+
+    result = run_logs(logs_server, config_path, "--task-id", "t1", "--show-timestamp")
+
+    assert "[2024-01-01T00:00:01] one\n[2024-01-01T00:00:02] two\n" in result.output
+    assert "three\n" in result.output
+    assert result.output.index("three") < result.output.index("four")
+    assert [r["action"] for r in logs_server.received] == ["LOGS_QUERY", "LOGS_ADD_STREAM"]
+    assert logs_server.received[1]["objectType"] == "BETA9_TASK"
+
+
+def test_renderer_writes_queued_messages_together(console, monkeypatch):
+    frames = [logs_frame([log_hit(f"line {i}\n", f"{i:04}")]) for i in range(10)]
+    receiver = LogReceiver(FakeConnection(frames), queue.Queue())
+    receiver.run()
+
+    writes = []
+    monkeypatch.setattr(terminal, "print", lambda *a, **k: writes.append(a))
+
+    with pytest.raises(ConnectionError):
+        render_logs(receiver)
+
+    assert len(writes) == 1
+    assert writes[0][0] == "".join(f"line {i}\n" for i in range(10))
+
+
+def test_drop_policy_reports_skipped_lines(console):
+    receiver = LogReceiver(FakeConnection([]), queue.Queue(maxsize=2), overflow=logs.OVERFLOW_DROP)
+    receiver.put({"logs": {"hits": {"hits": [log_hit("kept\n", "1")]}}})
+    receiver.put({"logs": {"hits": {"hits": [log_hit("kept\n", "2")]}}})
+    receiver.put({"logs": {"hits": {"hits": [log_hit("dropped\n", str(i)) for i in range(5)]}}})
+    Thread(target=receiver.queue.put, args=(ConnectionError("closed"),)).start()
+
+    with pytest.raises(ConnectionError):
+        render_logs(receiver)
+
+    output = console.getvalue()
+    assert "5 lines skipped" in output
+    assert output.count("kept") == 2
+    assert "dropped" not in output
+
+
+def test_block_policy_waits_for_the_renderer():
+    receiver = LogReceiver(FakeConnection([]), queue.Queue(maxsize=1))
+    receiver.put({"logs": {"hits": {"hits": []}}})
+
+    blocked = Thread(target=receiver.put, args=({"logs": {"hits": {"hits": []}}},))
+    blocked.start()
+    blocked.join(0.1)
+    assert blocked.is_alive()
+
+    receiver.queue.get()
+    blocked.join(1)
+    assert not blocked.is_alive()
+    assert receiver.take_skipped() == 0
+
+
+def test_logs_requires_an_object(logs_server, config_path):
+    result = run_logs(logs_server, config_path)
+
+    assert result.exit_code == 2
+    assert "at least one" in result.output
+
+
+def test_logs_follows_several_objects_over_one_connection(logs_server, config_path):
+    logs_server.history = [
+        log_hit("a1\n", "2024-01-01T00:00:01", container_id="a"),
+        log_hit("a3\n", "2024-01-01T00:00:03", container_id="a"),
+        log_hit("b2\n", "2024-01-01T00:00:02", container_id="b"),
+    ]
+    logs_server.streams = 3
+    logs_server.live = [
+        logs_frame([log_hit("b5\n", "2024-01-01T00:00:05", container_id="b")]),
+        logs_frame([log_hit("a4\n", "2024-01-01T00:00:04", container_id="a")]),
+        logs_frame([log_hit("t6\n", "2024-01-01T00:00:06", task_id="t")]),
+    ]
+
+    result = run_logs(
+        logs_server,
+        config_path,
+        *("--container-id", "a", "--container-id", "b", "--task-id", "t"),
+        *("--container-id", "a", "--reorder-window", "0.2"),
+    )
+
+    assert "[a] a1\n[b] b2\n[a] a3\n[a] a4\n[b] b5\n[t] t6\n" in result.output
+    assert logs_server.server.connections == 1
+    assert [(r["action"], r["objectId"]) for r in logs_server.received] == [
+        ("LOGS_QUERY", "t"),
+        ("LOGS_QUERY", "a"),
+        ("LOGS_QUERY", "b"),
+        ("LOGS_ADD_STREAM", "t"),
+        ("LOGS_ADD_STREAM", "a"),
+        ("LOGS_ADD_STREAM", "b"),
+    ]
+
+
+def test_merger_orders_lines_within_the_window(clock):
+    merger = LogMerger(window=1, clock=clock)
+    merger.push("a", log_hit("a2", "2"))
+    merger.push("a", log_hit("a4", "4"))
+    clock.now += 0.5
+    merger.push("b", log_hit("b1", "1"))
+    merger.push("b", log_hit("b3", "3"))
+
+    assert merger.pop() == []
+    assert merger.wait_time() == 1.0
+
+    clock.now += 0.5
+    assert [hit["_source"]["msg"] for _, hit in merger.pop()] == []
+
+    clock.now += 0.5
+    released = merger.pop()
+    assert [(source, hit["_source"]["msg"]) for source, hit in released] == [
+        ("b", "b1"),
+        ("a", "a2"),
+        ("b", "b3"),
+        ("a", "a4"),
+    ]
+    assert len(merger) == 0
+    assert merger.wait_time() is None
+
+
+def test_merger_releases_late_lines_and_caps_what_it_holds(clock):
+    merger = LogMerger(window=1, max_lines=2, clock=clock)
+    merger.push("a", log_hit("a5", "5"))
+    clock.now += 2
+    assert [hit["_source"]["msg"] for _, hit in merger.pop()] == ["a5"]
+
+    merger.push("b", log_hit("b1", "1"))
+    merger.push("b", log_hit("b2", "2"))
+    merger.push("a", log_hit("a3", "3"))
+    assert [hit["_source"]["msg"] for _, hit in merger.pop()] == ["b1"]
+    assert [hit["_source"]["msg"] for _, hit in merger.pop(flush=True)] == ["b2", "a3"]
+
+
+class TimedConnection:
+    """Records when the last message was received from a connection."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.last_recv = 0.0
+
+    def recv(self):
+        msg = self.conn.recv()
+        self.last_recv = time.perf_counter()
+        return msg
+
+
+@pytest.mark.benchmark
+def test_logs_throughput(logs_server, console, record_benchmark):
+    frames, hits_per_frame = 1000, 20
+    logs_server.live = [
+        logs_frame(
+            [
+                log_hit(f"frame {f} line {i} status=200 took 12ms\n", f"{f:06}{i:03}")
+                for i in range(hits_per_frame)
+            ]
+        )
+        for f in range(frames)
+    ]
+    total = frames * hits_per_frame
+
+    def inline(conn):
+        while True:
+            logs.print_message(conn.recv())
+
+    def pipeline(overflow):
+        def render(conn):
+            receiver = LogReceiver(conn, queue.Queue(maxsize=64), overflow=overflow)
+            receiver.start()
+            render_logs(receiver)
+
+        return render
+
+    renderers = {
+        "inline": inline,
+        "block": pipeline(logs.OVERFLOW_BLOCK),
+        "drop": pipeline(logs.OVERFLOW_DROP),
+    }
+    for name, render in renderers.items():
+        with connect(logs_server.url) as w:
+            w.send('{"action": "LOGS_ADD_STREAM"}')
+            conn = TimedConnection(w)
+            start = time.perf_counter()
+            with pytest.raises(Exception):
+                render(conn)
+            end = time.perf_counter()
+
+        record_benchmark(
+            f"beam logs ({name})",
+            received_lines_per_s=total / (conn.last_recv - start),
+            total_lines_per_s=total / (end - start),
+        )
+
+
+def test_logs_reconnects_and_fills_the_gap(logs_server, config_path, monkeypatch):
+    monkeypatch.setattr(logs, "RECONNECT_MIN_DELAY", 0.01)
+    lines = [log_hit(f"line {i}\n", f"2024-01-01T00:00:0{i}", id=f"id-{i}") for i in range(8)]
+    queries = []
+
+    def handle(conn):
+        number = logs_server.server.connections
+        for msg in conn:
+            request = json.loads(msg)
+            if request["action"] == "LOGS_QUERY":
+                queries.append(request)
+                if number == 1:
+                    conn.send(logs_frame(lines[:1]))
+                else:
+                    # Everything since the last line seen, including that line
+                    since = request["startingTimestamp"]
+                    conn.send(
+                        logs_frame([h for h in lines[:6] if h["_source"]["@timestamp"] >= since])
+                    )
+            elif number == 1:
+                conn.send(logs_frame(lines[1:2]))
+                conn.send(logs_frame(lines[2:4]))
+                # Drop the connection without a close frame
+                conn.socket.shutdown(socket.SHUT_RDWR)
+                return
+            elif number == 2:
+                conn.send(logs_frame(lines[6:]))
+                conn.socket.shutdown(socket.SHUT_RDWR)
+                return
+            else:
+                conn.send(json.dumps({"error": "stream ended"}))
+                return
+
+    logs_server.server.handler = handle
+
+    result = run_logs(logs_server, config_path, "--task-id", "t1", "--reconnect")
+
+    printed = [line for line in result.output.splitlines() if line.startswith("line")]
+    assert printed == [f"line {i}" for i in range(8)]
+    assert "Connection lost" in result.output
+    assert queries[1]["startingTimestamp"] == "2024-01-01T00:00:03"
+    assert queries[2]["startingTimestamp"] == "2024-01-01T00:00:07"
+    assert logs_server.server.connections == 3
+
+
+@pytest.mark.parametrize(
+    "value, microsecond",
+    [
+        ("2024-01-01T00:00:01.5Z", 500000),
+        ("2024-01-01T00:00:01.12345Z", 123450),
+        ("2024-01-01T00:00:01.123456789Z", 123456),
+        ("2024-01-01T00:00:01.123456789+00:00", 123456),
+        ("2024-01-01T00:00:01Z", 0),
+    ],
+)
+def test_timestamps_take_any_number_of_fractional_digits(value, microsecond):
+    timestamp = logs.parse_timestamp(value)
+
+    assert timestamp == datetime.datetime(
+        2024, 1, 1, 0, 0, 1, microsecond, tzinfo=datetime.timezone.utc
+    )
+
+
+def test_reconnected_connections_are_closed_by_the_receiver(monkeypatch):
+    monkeypatch.setattr(logs, "RECONNECT_MIN_DELAY", 0.001)
+    events = []
+
+    @contextlib.contextmanager
+    def reconnect(last_seen):
+        number = len(events) // 2 + 1
+        events.append(("open", number, threading.current_thread()))
+        try:
+            # Drops again before any new line, so the receiver gives up after two attempts
+            yield FakeConnection([])
+        finally:
+            events.append(("close", number, threading.current_thread()))
+
+    first = FakeConnection([logs_frame([log_hit("line 0\n", "0")])])
+    receiver = LogReceiver(first, queue.Queue(), reconnect=reconnect, max_attempts=2)
+    receiver.start()
+    receiver.join(5)
+
+    assert not receiver.is_alive()
+    # Each connection is closed before the next is opened, and the last when the receiver stops
+    assert [event[:2] for event in events] == [
+        ("open", 1),
+        ("close", 1),
+        ("open", 2),
+        ("close", 2),
+    ]
+    assert {event[2] for event in events} == {receiver}
+
+
+def test_logs_raw_output_skips_terminal_formatting(logs_server, config_path):
+    logs_server.history = [log_hit("[bold]one[/bold]\n", "2024-01-01T00:00:01")]
+    logs_server.live = [logs_frame([log_hit("two\n", "2024-01-01T00:00:02")])]
+
+    result = run_logs(logs_server, config_path, "--task-id", "t1", "--output", "raw")
+
+    assert result.stdout.startswith("[bold]one[/bold]\ntwo\n")
+    assert "\x1b[" not in result.stdout
+    assert "Streaming" not in result.output
+
+
+def test_logs_jsonl_output_writes_a_record_per_line(logs_server, config_path):
+    logs_server.history = [
+        log_hit("a1\n", "2024-01-01T00:00:01", container_id="a"),
+        log_hit("b2\n", "2024-01-01T00:00:02", container_id="b"),
+    ]
+    logs_server.streams = 2
+
+    result = run_logs(
+        logs_server, config_path, "--container-id", "a", "--container-id", "b", "-o", "jsonl"
+    )
+
+    records = [json.loads(line) for line in result.stdout.splitlines() if line.startswith("{")]
+    assert records == [
+        {"msg": "a1\n", "@timestamp": "2024-01-01T00:00:01", "container_id": "a", "source": "a"},
+        {"msg": "b2\n", "@timestamp": "2024-01-01T00:00:02", "container_id": "b", "source": "b"},
+    ]
+
+
+def test_parse_hits_keeps_ordered_hits_as_they_are():
+    hits = [log_hit("one", "1"), log_hit("two", "2")]
+    assert logs.parse_hits({"logs": {"hits": {"hits": hits}}}) is hits
+
+    shuffled = [hits[1], hits[0]]
+    assert logs.parse_hits({"logs": {"hits": {"hits": shuffled}}}) == hits
+
+
+@pytest.mark.benchmark
+def test_logs_output_throughput(console, record_benchmark):
+    frames, hits_per_frame = 1000, 20
+    messages = [
+        logs_frame(
+            [
+                log_hit(f"frame {f} line {i} status=200 took 12ms\n", f"{f:06}{i:03}")
+                for i in range(hits_per_frame)
+            ]
+        )
+        for f in range(frames)
+    ]
+    total = frames * hits_per_frame
+
+    writers = {
+        "text": logs.LogWriter(),
+        "raw": logs.RawLogWriter(stream=io.BytesIO()),
+        "jsonl": logs.JsonlLogWriter(stream=io.BytesIO()),
+    }
+    for name, writer in writers.items():
+        receiver = LogReceiver(FakeConnection(messages), queue.Queue())
+        receiver.run()
+
+        start = time.perf_counter()
+        with pytest.raises(ConnectionError):
+            render_logs(receiver, writer)
+        end = time.perf_counter()
+
+        record_benchmark(f"beam logs --output {name}", lines_per_s=total / (end - start))
+
+
+def test_log_filter_checks_message_level_and_time():
+    log_filter = logs.LogFilter(
+        grep=re.compile("(?:request)|(?:job)"),
+        exclude=re.compile("healthz"),
+        level="warning",
+        since=logs.parse_timestamp("2024-01-01T00:00:01Z"),
+        until=logs.parse_timestamp("2024-01-01T00:00:05Z"),
+    )
+
+    def kept(msg, timestamp="2024-01-01T00:00:02.123456789Z", **fields):
+        return log_filter.matches(log_hit(msg, timestamp, **fields))
+
+    assert kept("ERROR request failed")
+    assert kept("job took long", level="WARN")
+    assert not kept("INFO request done")
+    assert not kept("request failed")
+    assert not kept("ERROR GET /healthz request failed")
+    assert not kept("ERROR something else")
+    assert not kept("ERROR request failed", "2024-01-01T00:00:00")
+    assert not kept("ERROR request failed", "2024-01-01T00:00:05+00:00")
+    assert not logs.LogFilter()
+
+
+def test_logs_filters_lines_before_printing(logs_server, config_path):
+    logs_server.history = [
+        log_hit("INFO starting\n", "2024-01-01T00:00:01"),
+        log_hit("ERROR bad request\n", "2024-01-01T00:00:02"),
+    ]
+    logs_server.live = [
+        logs_frame([log_hit("WARNING slow request\n", "2024-01-01T00:00:03")]),
+        logs_frame([log_hit("ERROR GET /healthz\n", "2024-01-01T00:00:04")]),
+    ]
+
+    result = run_logs(
+        logs_server,
+        config_path,
+        *("--task-id", "t1", "--level", "WARNING", "--grep", "request", "--exclude", "healthz"),
+    )
+
+    printed = [
+        line for line in result.output.splitlines() if line.startswith(("INFO", "WARN", "ERR"))
+    ]
+    assert printed == ["ERROR bad request", "WARNING slow request"]
+
+
+def test_logs_sends_the_time_range_and_stops_after_a_past_until(logs_server, config_path):
+    logs_server.history = [log_hit("one\n", "2024-01-01T00:00:01")]
+    logs_server.live = [logs_frame([log_hit("live\n", "2024-01-01T00:00:02")])]
+
+    result = run_logs(
+        logs_server,
+        config_path,
+        *("--task-id", "t1", "--since", "2024-01-01T00:00:00Z", "--until", "2024-01-02"),
+    )
+
+    assert result.exit_code == 0
+    assert "one" in result.output
+    assert "live" not in result.output
+    assert [r["action"] for r in logs_server.received] == ["LOGS_QUERY"]
+    assert logs_server.received[0]["startingTimestamp"] == "2024-01-01T00:00:00+00:00"
+    assert logs_server.received[0]["endingTimestamp"] == "2024-01-02T00:00:00+00:00"
+
+
+def test_logs_rejects_bad_filters(logs_server, config_path):
+    assert run_logs(logs_server, config_path, "--task-id", "t", "--grep", "(").exit_code == 2
+    assert run_logs(logs_server, config_path, "--task-id", "t", "--since", "soon").exit_code == 2
+
+
+def test_logs_fetches_long_histories_in_pages(logs_server, config_path, monkeypatch):
+    monkeypatch.setattr(logs, "HISTORY_PAGE_SIZE", 10)
+    # Three lines share the timestamp at the first page boundary
+    timestamps = [f"2024-01-01T00:00:{i:02}" for i in range(27)]
+    timestamps[17:17] = [timestamps[17]] * 3
+    logs_server.history = [
+        log_hit(f"line {i}\n", timestamp, id=f"id-{i}") for i, timestamp in enumerate(timestamps)
+    ]
+
+    result = run_logs(logs_server, config_path, "--task-id", "t1", "-n", "25", "-o", "raw")
+
+    printed = [line for line in result.stdout.splitlines() if line.startswith("line")]
+    assert printed == [f"line {i}" for i in range(5, 30)]
+    # Each query after the first also asks for the lines it repeats at its end
+    queries = [r for r in logs_server.received if r["action"] == "LOGS_QUERY"]
+    assert [q["size"] for q in queries] == [10, 11, 6]
+    assert [q["endingTimestamp"] for q in queries[1:]] == [
+        "2024-01-01T00:00:17",
+        "2024-01-01T00:00:10",
+    ]
+
+
+def test_history_pages_after_the_first_are_kept_on_disk():
+    source = logs.LogSource("BETA9_TASK", "task_id", "t")
+    now = datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc)
+    walk = logs.HistoryWalk("token", source, 30, now, page_size=10, prefix=True)
+
+    hits = [log_hit(f"line {i}", f"2024-01-01T00:00:{i:02}") for i in range(40)]
+    timestamps = [hit["_source"]["@timestamp"] for hit in hits]
+    while (message := walk.request()) is not None:
+        request = json.loads(message)
+        stop = bisect.bisect_right(timestamps, request["endingTimestamp"])
+        walk.receive({"logs": {"hits": {"hits": hits[stop - request["size"] : stop]}}})
+
+    assert walk.request() is None
+    assert len(walk._first_page) == 10
+    assert len(walk._spooled_pages) == 2
+    assert [hit for _, hit in walk.lines_oldest_first()] == hits[10:]
+    assert {s for s, _ in walk.lines_oldest_first()} == {source}
+    walk.close()
+
+
+@pytest.mark.benchmark
+def test_logs_history_memory(record_benchmark):
+    total = 100_000
+    hits = [log_hit(f"line {i} status=200 took 12ms\n", f"{i:08}", id=str(i)) for i in range(total)]
+    source = logs.LogSource("BETA9_TASK", "task_id", "t")
+    now = datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc)
+
+    timestamps = [hit["_source"]["@timestamp"] for hit in hits]
+
+    class PagedConnection:
+        """Answers history queries from `hits` without a network round trip."""
+
+        def send(self, message):
+            request = json.loads(message)
+            stop = bisect.bisect_right(timestamps, request["endingTimestamp"])
+            self.response = logs_frame(hits[max(stop - request["size"], 0) : stop])
+
+        def recv(self):
+            return self.response
+
+    for name, page_size in (("one query", total), ("paged", logs.HISTORY_PAGE_SIZE)):
+        walk = logs.HistoryWalk("token", source, total, now, page_size=page_size)
+        writer = logs.RawLogWriter(stream=io.BytesIO())
+        tracemalloc.start()
+        start = time.perf_counter()
+        logs.print_history(PagedConnection(), [walk], writer)
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert writer.stream.getvalue().count(b"\n") == total
+        record_benchmark(
+            f"beam logs -n {total} ({name})",
+            peak_mb=peak / 1e6,
+            lines_per_s=total / seconds,
+        )
+
+
+def test_logs_writes_records_to_compressed_files(logs_server, config_path, tmp_path):
+    logs_server.history = [log_hit("one\n", "2024-01-01T00:00:01")]
+    logs_server.live = [logs_frame([log_hit("two\n", "2024-01-01T00:00:02")])]
+
+    result = run_logs(
+        logs_server, config_path, "--task-id", "t1", "--to-file", str(tmp_path / "t1.jsonl")
+    )
+
+    (path,) = tmp_path.glob("t1-*.jsonl.gz")
+    assert f"Writing logs to {path}" in result.output
+    records = [json.loads(line) for line in gzip.decompress(path.read_bytes()).splitlines()]
+    assert records == [
+        {
+            "timestamp": f"2024-01-01T00:00:0{i}",
+            "message": f"{msg}\n",
+            "object_type": "BETA9_TASK",
+            "object_id": "t1",
+        }
+        for i, msg in ((1, "one"), (2, "two"))
+    ]
+
+
+def test_logs_to_file_flushes_on_ctrl_c(logs_server, config_path, tmp_path, monkeypatch):
+    logs_server.history = [log_hit(f"line {i}\n", f"2024-01-01T00:00:{i:02}") for i in range(50)]
+
+    def interrupt(receiver, writer, **kwargs):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(logs, "render_logs", interrupt)
+    result = run_logs(
+        logs_server, config_path, "--task-id", "t1", "--to-file", str(tmp_path / "t1.jsonl")
+    )
+
+    assert "Goodbye" in result.output
+    (path,) = tmp_path.glob("t1-*.jsonl.gz")
+    assert len(gzip.decompress(path.read_bytes()).splitlines()) == 50
+
+
+def test_file_writer_keeps_lines_from_unknown_sources_apart(tmp_path):
+    a = logs.LogSource("BETA9_CONTAINER", "container_id", "a")
+    b = logs.LogSource("BETA9_CONTAINER", "container_id", "b")
+    writer = logs.FileLogWriter(
+        RotatingLogFile(tmp_path / "logs.jsonl"),
+        [a, b],
+        open_unknown=lambda: RotatingLogFile(tmp_path / "logs-unknown.jsonl"),
+    )
+    writer.write([(a, log_hit("one\n", "1")), (None, log_hit("two\n", "2"))])
+    writer.write([(b, log_hit("three\n", "3"))])
+    writer.close()
+
+    def read(pattern):
+        (path,) = tmp_path.glob(pattern)
+        return [json.loads(line) for line in gzip.decompress(path.read_bytes()).splitlines()]
+
+    known = read("logs-2*.jsonl.gz")
+    assert [(r["object_id"], r["message"]) for r in known] == [("a", "one\n"), ("b", "three\n")]
+    (unknown,) = read("logs-unknown-*.jsonl.gz")
+    assert unknown["message"] == "two\n"
+    assert unknown["object_id"] is None
@@ -0,0 +1,115 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import click
+import pytest
+
+from beam.cli import main
+from beam.cli.lazy import LazyCommandGroup, load_command
+
+MANIFESTS = {**main.COMMON_COMMANDS, **main.MANAGEMENT_COMMANDS}
+
+
+def imported_modules_after(*argv: str) -> set:
+    code = f"""
+        import sys
+
+        sys.argv = {["beam", *argv]!r}
+        from beam.cli import main
+
+        try:
+            main.cli()
+        except SystemExit:
+            pass
+        print(",".join(sys.modules))
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(code)],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "CI": "1"},
+    )
+    return set(result.stdout.strip().splitlines()[-1].split(","))
+
+
+@pytest.mark.parametrize("argv", [("--help",), ("--version",)])
+def test_help_and_version_do_not_import_commands(argv):
+    modules = imported_modules_after(*argv)
+
+    assert "websockets" not in modules
+    assert "requests" not in modules
+    assert not {name for name, _ in MANIFESTS.values()} & modules
+
+
+def test_command_help_imports_only_that_command():
+    modules = imported_modules_after("configure", "--help")
+
+    assert "beam.cli.configure" in modules
+    assert "beam.cli.logs" not in modules
+    assert "beam.cli.example" not in modules
+
+
+@pytest.mark.parametrize("module_name", sorted({name for name, _ in MANIFESTS.values()}))
+def test_manifest_matches_command_modules(module_name):
+    commands = {
+        name: (module, help) for name, (module, help) in MANIFESTS.items() if module == module_name
+    }
+    module = __import__(module_name, fromlist=["_"])
+
+    expected = {}
+    if common := getattr(module, "common", None):
+        expected.update({name: cmd for name, cmd in common.commands.items() if not cmd.hidden})
+    if management := getattr(module, "management", None):
+        expected[management.name] = management
+
+    if not module_name.startswith("beam."):
+        # Newer beta9 releases can add commands, which run from the fallback
+        assert set(commands) <= set(expected)
+        return
+
+    assert set(commands) == set(expected)
+    for name, cmd in expected.items():
+        assert commands[name][1] == cmd.get_short_help_str(limit=1000)
+
+
+def test_get_command_loads_command_on_first_use():
+    ctx = click.Context(main._cli)
+    group = main._cli
+    group.commands.pop("logs", None)
+
+    command = group.get_command(ctx, "logs")
+
+    assert command is load_command("beam.cli.logs", "logs")
+    assert group.commands["logs"] is command
+    assert group.get_command(ctx, "does-not-exist") is None
+
+
+def test_commands_missing_from_the_manifest_come_from_beta9():
+    loads = []
+
+    def load_beta9_cli():
+        loads.append(1)
+        return main.load_beta9_cli()
+
+    group = LazyCommandGroup(common={}, management={}, fallback=load_beta9_cli)
+    ctx = click.Context(group)
+
+    assert group.get_command(ctx, "task").name == "task"
+    assert group.get_command(ctx, "does-not-exist") is None
+    assert group.get_command(ctx, "secret").name == "secret"
+    assert len(loads) == 1
+
+
+def test_help_lists_commands_from_manifest(capsys):
+    with pytest.raises(SystemExit) as exc_info:
+        main._cli.main(["--help"], prog_name="beam")
+
+    assert exc_info.value.code == 0
+    output = capsys.readouterr().out
+    assert "Common Commands:" in output
+    assert "Management Commands:" in output
+    for name in MANIFESTS:
+        assert f"  {name} " in output
@@ -0,0 +1,101 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+from beam.cli import profile
+
+
+def run_beam(*argv: str, **env: str) -> subprocess.CompletedProcess:
+    code = "import sys; from beam.cli import main; sys.argv[0] = 'beam'; main.cli()"
+    return subprocess.run(
+        [sys.executable, "-c", code, *argv],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "CI": "1", **env},
+    )
+
+
+def test_profile_startup_prints_phases_and_imports():
+    result = run_beam("--profile-startup", "logs", "--help")
+
+    assert result.returncode == 0
+    assert "Usage:" in result.stdout
+    report = result.stderr
+    assert report.startswith("beam startup profile:")
+    phases = report.split("Phases (ms)")[1].split("Imports on MainThread")[0]
+    for name in ("import beam.cli.main", "run", "load logs", "check version"):
+        assert f"  {name}\n" in phases
+    assert "  beam.cli.main\n" in report
+    assert "Slowest imports by self time" in report
+
+
+def test_beam_profile_writes_a_speedscope_profile(tmp_path):
+    path = tmp_path / "startup.json"
+    result = run_beam("--version", BEAM_PROFILE=str(path))
+
+    assert result.returncode == 0
+    assert str(path) in result.stderr
+
+    data = json.loads(path.read_text())
+    assert data["$schema"] == profile.SPEEDSCOPE_SCHEMA
+    frames = [frame["name"] for frame in data["shared"]["frames"]]
+    assert "beam.cli.main" in frames
+
+    for prof in data["profiles"]:
+        # Every opened frame is closed, innermost first, in time order
+        stack = []
+        times = [event["at"] for event in prof["events"]]
+        assert times == sorted(times)
+        for event in prof["events"]:
+            if event["type"] == "O":
+                stack.append(event["frame"])
+            else:
+                assert stack.pop() == event["frame"]
+        assert stack == []
+
+
+def test_profiling_is_off_by_default():
+    code = """
+        import sys
+        from beam.cli import main, profile
+
+        timers = [f for f in sys.meta_path if isinstance(f, profile.ImportTimer)]
+        print(profile.profiler is None, len(timers))
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(code)],
+        capture_output=True,
+        text=True,
+        env={k: v for k, v in os.environ.items() if k != "BEAM_PROFILE"},
+    )
+
+    assert result.stdout.split() == ["True", "0"]
+
+
+def test_imports_are_nested_under_the_modules_importing_them(tmp_path, monkeypatch):
+    package = tmp_path / "profiled_pkg"
+    package.mkdir()
+    (package / "__init__.py").write_text("from . import a\n")
+    (package / "a.py").write_text("from . import b\n")
+    (package / "b.py").write_text("import time\ntime.sleep(0.01)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    profiler = profile.StartupProfiler()
+    profiler.start()
+    try:
+        import profiled_pkg  # noqa: F401
+    finally:
+        profiler.stop()
+        for name in ("profiled_pkg", "profiled_pkg.a", "profiled_pkg.b"):
+            sys.modules.pop(name, None)
+
+    (root,) = profiler.imports["MainThread"]
+    assert root.name == "profiled_pkg"
+    assert [child.name for child in root.children] == ["profiled_pkg.a"]
+    (b,) = root.children[0].children
+    assert b.name == "profiled_pkg.b"
+    assert b.self_time >= 0.01
+    assert root.duration >= b.duration
+    assert profiled_pkg.a.__loader__.__class__.__name__ == "SourceFileLoader"
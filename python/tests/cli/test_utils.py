@@ -1,21 +1,42 @@
+import json
+import os
+import subprocess
 import sys
+import time
 
 import pytest
 
 from beam.cli import utils
 
 
-class FakeResponse:
-    def raise_for_status(self):
-        pass
+@pytest.fixture
+def version_cache(tmp_path, monkeypatch):
+    path = tmp_path / "minimum-cli-version.json"
+    monkeypatch.setattr(utils, "VERSION_CHECK_CACHE_PATH", path)
+    monkeypatch.setattr(utils.metadata, "version", lambda package: "0.2.191")
+    return path
 
-    def json(self):
-        return {"version": "0.2.202"}
 
+@pytest.fixture
+def version_api(stand_in_server, monkeypatch):
+    def minimum_version(request):
+        if request.headers.get("If-None-Match") == '"v202"':
+            return 304, {"ETag": '"v202"'}, b""
+        return 200, {"ETag": '"v202"'}, json.dumps({"version": "0.2.202"}).encode()
 
-def test_check_version_upgrades_the_python_environment_running_beam(monkeypatch, capsys):
-    monkeypatch.setattr(utils.requests, "get", lambda *args, **kwargs: FakeResponse())
-    monkeypatch.setattr(utils.metadata, "version", lambda package: "0.2.191")
+    stand_in_server.add_route("GET", "/v2/api/minimum-cli-version/", minimum_version)
+    monkeypatch.setattr(utils, "BASE_API_URL", stand_in_server.url)
+    return stand_in_server
+
+
+def write_cache(path, **data):
+    path.write_text(json.dumps(data))
+
+
+def test_check_version_upgrades_the_python_environment_running_beam(
+    version_cache, monkeypatch, capsys
+):
+    write_cache(version_cache, version="0.2.202", checked_at=time.time())
     monkeypatch.setattr(sys, "executable", "/opt/Beam Client/bin/python")
 
     with pytest.raises(SystemExit) as exc_info:
@@ -29,3 +50,67 @@ def test_check_version_upgrades_the_python_environment_running_beam(monkeypatch,
     assert "Python:    /opt/Beam Client/bin/python" in output
     assert '"/opt/Beam Client/bin/python" -m pip install --upgrade beam-client' in output
     assert "beam --version" in output
+
+
+def test_fresh_cache_skips_the_network(version_cache, version_api):
+    write_cache(version_cache, version="0.2.100", checked_at=time.time())
+
+    assert utils.check_version() is None
+    assert version_api.requests == []
+
+
+def test_missing_cache_is_filled_in_the_background(version_cache, version_api):
+    refresh = utils.check_version()
+    refresh.join(timeout=5)
+
+    cache = json.loads(version_cache.read_text())
+    assert cache["version"] == "0.2.202"
+    assert cache["etag"] == '"v202"'
+    assert len(version_api.requests) == 1
+
+
+def test_stale_cache_is_revalidated_with_etag(version_cache, version_api):
+    write_cache(version_cache, version="0.2.100", etag='"v202"', checked_at=0)
+
+    refresh = utils.check_version()
+    refresh.join(timeout=5)
+
+    assert version_api.requests[0].headers["If-None-Match"] == '"v202"'
+    cache = json.loads(version_cache.read_text())
+    assert cache["version"] == "0.2.100"
+    assert cache["checked_at"] > 0
+
+
+def test_stale_cache_still_enforces_minimum_version(version_cache, version_api, capsys):
+    write_cache(version_cache, version="0.2.202", checked_at=0)
+
+    with pytest.raises(SystemExit):
+        utils.check_version()
+
+    assert "Beam CLI update required" in capsys.readouterr().out
+
+
+def test_offline_keeps_cache_and_does_not_block(version_cache, monkeypatch):
+    monkeypatch.setattr(utils, "BASE_API_URL", "http://127.0.0.1:9")
+    write_cache(version_cache, version="0.2.100", checked_at=0)
+
+    start = time.perf_counter()
+    refresh = utils.check_version()
+    elapsed = time.perf_counter() - start
+    refresh.join(timeout=10)
+
+    assert elapsed < 0.5
+    assert json.loads(version_cache.read_text()) == {"version": "0.2.100", "checked_at": 0}
+
+
+def test_quick_commands_wait_for_the_refresh(version_api, tmp_path):
+    code = "import sys; from beam.cli import main; sys.argv[0] = 'beam'; main.cli()"
+    subprocess.run(
+        [sys.executable, "-c", code, "config", "list"],
+        capture_output=True,
+        env={**os.environ, "CI": "1", "HOME": str(tmp_path), "BASE_API_URL": version_api.url},
+    )
+
+    cache = json.loads((tmp_path / ".beam/cache/minimum-cli-version.json").read_text())
+    assert cache["version"] == "0.2.202"
+    assert time.time() - cache["checked_at"] < 60
@@ -0,0 +1,112 @@
+import json
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from beam.client import client as client_module
+
+WORKSPACE_ID = "ws-123"
+
+
+def json_response(body, status: int = 200):
+    return status, {"Content-Type": "application/json"}, json.dumps(body).encode()
+
+
+@pytest.fixture
+def beam_api(stand_in_server, monkeypatch):
+    """
+    A stand-in for the Beam gateway and internal API, with one deployment
+    called "app" whose endpoint echoes its input back.
+    """
+    server = stand_in_server
+    url = server.url
+
+    def deployment_url(request):
+        slug = parse_qs(urlsplit(request.path).query)["slug"][0]
+        if slug not in server.deployments:
+            return json_response({"detail": "not found"}, 404)
+        return json_response({"url": f"{url}/endpoint/{slug}"})
+
+    server.deployments = {"app"}
+    server.add_route(
+        "GET", "/api/v1/workspace/current", lambda r: json_response({"external_id": WORKSPACE_ID})
+    )
+    server.add_route("GET", "/v2/deployment/get-public-deployment-url/", deployment_url)
+    server.add_route("POST", "/endpoint/*", lambda r: json_response(json.loads(r.body or b"{}")))
+
+    # Keeps beta9 from prompting for a config context
+    monkeypatch.setenv("BETA9_TOKEN", "token")
+
+    settings = client_module.settings
+    monkeypatch.setattr(settings, "api_host", "http://127.0.0.1")
+    monkeypatch.setattr(settings, "api_port", server.server_port)
+    monkeypatch.setattr(settings, "internal_api_host", "127.0.0.1")
+    monkeypatch.setattr(settings, "internal_api_port", server.server_port)
+    return server
+
+
+class TaskService:
+    """
+    Serves task statuses from the stand-in gateway. A task completes once
+    `polls` status lookups have been made for it, or after `delay` seconds.
+    Tasks in `hidden` are left out of batched status lists.
+    """
+
+    def __init__(self, server, batch_filter=True):
+        self.server = server
+        self.batch_filter = batch_filter
+        self.finish_at = {}
+        self.polls = {}
+        self.hidden = set()
+        server.add_route("GET", "/api/v1/task/*", self.handle)
+
+    def add(self, task_id, *, polls=None, delay=None):
+        self.polls[task_id] = 0
+        if polls is not None:
+            self.finish_at[task_id] = ("polls", polls)
+        else:
+            self.finish_at[task_id] = ("time", time.monotonic() + delay)
+
+    def status(self, task_id):
+        self.polls[task_id] += 1
+        kind, value = self.finish_at[task_id]
+        done = self.polls[task_id] > value if kind == "polls" else time.monotonic() >= value
+        return "COMPLETE" if done else "RUNNING"
+
+    def task(self, task_id):
+        status = self.status(task_id)
+        result = {"id": task_id} if status == "COMPLETE" else None
+        return {"external_id": task_id, "status": status, "result": result, "outputs": []}
+
+    def handle(self, request):
+        url = urlsplit(request.path)
+        parts = url.path.strip("/").split("/")
+        if len(parts) == 5:
+            if parts[4] not in self.polls:
+                return json_response({"detail": "not found"}, 404)
+            return json_response(self.task(parts[4]))
+
+        if not self.batch_filter:
+            return json_response({"detail": "not found"}, 404)
+
+        ids = parse_qs(url.query)["task_ids"][0].split(",")
+        listed = [self.task(i) for i in ids if i in self.polls and i not in self.hidden]
+        return json_response({"data": listed, "next": ""})
+
+    def request_count(self):
+        return sum(1 for r in self.server.requests if r.path.startswith("/api/v1/task/"))
+
+
+@pytest.fixture
+def task_service(beam_api):
+    """
+    Returns a factory for a TaskService on the stand-in gateway.
+    """
+    return lambda batch_filter=True: TaskService(beam_api, batch_filter=batch_filter)
+
+
+@pytest.fixture
+def client(beam_api):
+    with client_module.Client(token="token") as client:
+        yield client
@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from beta9.exceptions import DeploymentNotFoundError
+
+httpx = pytest.importorskip("httpx")
+
+from beam.client import aio  # noqa: E402
+from beam.client.aio import AsyncClient, AsyncTask  # noqa: E402
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def task_status(status: str, result=None) -> str:
+    return f"event: status\ndata: {json.dumps({'status': status, 'result': result})}\n\n"
+
+
+@pytest.fixture
+def async_tasks(beam_api):
+    beam_api.add_route("POST", "/endpoint/*", lambda r: (200, {}, b'{"task_id": "t1"}'))
+    beam_api.add_route(
+        "GET",
+        "/api/v1/task/*",
+        lambda r: (200, {}, b'{"status": "COMPLETE", "result": {"ok": true}, "outputs": []}'),
+    )
+    events = task_status("PENDING") + task_status("RUNNING") + task_status("COMPLETE", {"ok": 1})
+    beam_api.add_route(
+        "GET",
+        "/api/v1/task/ws-123/t1/subscribe",
+        lambda r: (200, {"Content-Type": "text/event-stream"}, events.encode()),
+    )
+    return beam_api
+
+
+def test_submit_returns_sync_response(beam_api):
+    async def main():
+        async with AsyncClient(token="token") as client:
+            return await client.submit("app", input={"x": 1})
+
+    assert run(main()) == {"x": 1}
+
+
+def test_submit_returns_task_for_async_deployments(async_tasks):
+    async def main():
+        async with AsyncClient(token="token") as client:
+            task = await client.submit("app", input={"x": 1})
+            return task, await task.result()
+
+    task, result = run(main())
+
+    assert isinstance(task, AsyncTask)
+    assert task.id == "t1"
+    assert result == {"ok": True}
+
+
+def test_subscribe_waits_for_completion(async_tasks):
+    updates = []
+
+    async def main():
+        async with AsyncClient(token="token") as client:
+            return await client.subscribe("app", input={"x": 1}, event_handler=updates.append)
+
+    assert run(main()) == {"ok": 1}
+    assert [u["status"] for u in updates] == ["PENDING", "RUNNING", "COMPLETE"]
+
+
+def test_slow_calls_are_not_cut_off(beam_api):
+    def slow(request):
+        time.sleep(0.5)
+        return 200, {}, b'{"done": true}'
+
+    beam_api.add_route("POST", "/endpoint/app", slow)
+
+    async def main():
+        async with AsyncClient(token="token", timeout=(5, 0.1)) as client:
+            return await client.submit("app", input={"x": 1})
+
+    assert run(main()) == {"done": True}
+
+
+def test_get_deployment_raises_for_unknown_slug(beam_api):
+    async def main():
+        async with AsyncClient(token="token") as client:
+            await client.get_deployment("missing")
+
+    with pytest.raises(DeploymentNotFoundError):
+        run(main())
+
+
+def test_get_deployment_does_not_cache_server_errors(beam_api):
+    beam_api.add_route(
+        "GET", "/v2/deployment/get-public-deployment-url/", lambda r: (503, {}, b"unavailable")
+    )
+
+    async def main():
+        async with AsyncClient(token="token") as client:
+            for _ in range(2):
+                with pytest.raises(httpx.HTTPStatusError):
+                    await client.get_deployment("app")
+            return len(client.deployment_cache)
+
+    assert run(main()) == 0
+
+
+def test_many_requests_in_flight_share_the_pool(beam_api):
+    async def main():
+        async with AsyncClient(token="token", pool_size=8) as client:
+            return await asyncio.gather(*(client.submit("app", input={"i": i}) for i in range(200)))
+
+    assert run(main()) == [{"i": i} for i in range(200)]
+    assert beam_api.connections <= 8
+    lookups = [r for r in beam_api.requests if "get-public-deployment-url" in r.path]
+    assert len(lookups) == 1
+
+
+def test_download_file_streams_and_resumes(beam_api, tmp_path):
+    data = os.urandom(200_000)
+
+    def serve(request):
+        start = int((request.headers.get("Range") or "bytes=0-")[6:-1])
+        headers = {"Content-Range": f"bytes {start}-{len(data) - 1}/{len(data)}"}
+        return (206 if start else 200), headers, data[start:]
+
+    beam_api.add_route("GET", "/file", serve)
+    path = tmp_path / "out.bin"
+    (tmp_path / "out.bin.part.json").write_text(json.dumps({"validator": {}}))
+    (tmp_path / "out.bin.part").write_bytes(data[:50_000])
+
+    async def main():
+        async with AsyncClient(token="token") as client:
+            return await client.download_file(f"{beam_api.url}/file", path)
+
+    result = run(main())
+
+    assert path.read_bytes() == data
+    assert result.resumed
+    assert result.downloaded == 150_000
+    assert beam_api.requests[-1].headers["Range"] == "bytes=50000-"
+
+
+def test_download_file_restarts_a_preallocated_parallel_part(beam_api, tmp_path):
+    data = os.urandom(200_000)
+    beam_api.add_route("GET", "/file", lambda r: (200, {}, data))
+    path = tmp_path / "out.bin"
+    # Left by an interrupted parallel download: full size, mostly zeros
+    (tmp_path / "out.bin.part").write_bytes(bytes(len(data)))
+    (tmp_path / "out.bin.part.json").write_text(
+        json.dumps({"size": len(data), "segment_size": 65536, "completed": [0]})
+    )
+
+    async def main():
+        async with AsyncClient(token="token") as client:
+            return await client.download_file(f"{beam_api.url}/file", path)
+
+    result = run(main())
+
+    assert path.read_bytes() == data
+    assert "Range" not in beam_api.requests[-1].headers
+    assert not result.resumed
+    assert not (tmp_path / "out.bin.part.json").exists()
+
+
+def test_download_file_keeps_file_work_off_the_event_loop(beam_api, tmp_path, monkeypatch):
+    data = os.urandom(100_000)
+    beam_api.add_route("GET", "/file", lambda r: (200, {}, data))
+    threads = []
+    verify_checksum = aio.verify_checksum
+
+    def record(path, checksum):
+        threads.append(threading.current_thread())
+        verify_checksum(path, checksum)
+
+    monkeypatch.setattr(aio, "verify_checksum", record)
+
+    async def main():
+        async with AsyncClient(token="token") as client:
+            await client.download_file(
+                f"{beam_api.url}/file",
+                tmp_path / "out.bin",
+                checksum=f"sha256:{hashlib.sha256(data).hexdigest()}",
+            )
+
+    run(main())
+
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_importing_aio_does_not_load_websockets():
+    code = "import sys, beam.client.aio; print('websockets' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+
+    assert result.stdout.strip() == "False"
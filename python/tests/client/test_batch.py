@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+
+import pytest
+from beta9.exceptions import DeploymentNotFoundError
+
+from beam.client.batch import BatchResult, run_batch
+
+
+def test_results_are_yielded_in_input_order():
+    def slow_first(i):
+        time.sleep(0.05 if i == 0 else 0)
+        return i * 2
+
+    results = list(run_batch(slow_first, range(20), concurrency=4))
+
+    assert [r.index for r in results] == list(range(20))
+    assert [r.value for r in results] == [i * 2 for i in range(20)]
+
+
+def test_unordered_results_are_yielded_as_they_complete():
+    def slow_first(i):
+        time.sleep(0.2 if i == 0 else 0)
+        return i
+
+    results = list(run_batch(slow_first, range(20), concurrency=4, ordered=False))
+
+    assert sorted(r.value for r in results) == list(range(20))
+    assert results[-1].index == 0
+
+
+def test_errors_are_collected_per_item():
+    def fail_on_three(i):
+        if i == 3:
+            raise ValueError("boom")
+        return i
+
+    results = list(run_batch(fail_on_three, range(6), concurrency=2))
+
+    assert [r.ok for r in results] == [True, True, True, False, True, True]
+    assert isinstance(results[3].error, ValueError)
+    assert results[3].input == 3
+    with pytest.raises(ValueError):
+        results[3].unwrap()
+
+
+def test_inputs_are_consumed_with_backpressure():
+    consumed = []
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def inputs():
+        for i in range(1000):
+            consumed.append(i)
+            yield i
+
+    def work(i):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.001)
+        with lock:
+            running -= 1
+        return i
+
+    results = run_batch(work, inputs(), concurrency=4, max_pending=8)
+    first = next(results)
+
+    assert first == BatchResult(index=0, input=0, value=0)
+    assert len(consumed) <= 9
+
+    results.close()
+    assert len(consumed) <= 10
+    assert peak <= 4
+
+
+def test_concurrency_must_be_positive():
+    with pytest.raises(ValueError):
+        next(run_batch(lambda i: i, range(3), concurrency=0))
+
+
+def test_submit_many_yields_sync_responses(client, beam_api):
+    results = list(client.submit_many("app", ({"i": i} for i in range(50)), concurrency=8))
+
+    assert [r.value for r in results] == [{"i": i} for i in range(50)]
+    lookups = [r for r in beam_api.requests if "get-public-deployment-url" in r.path]
+    assert len(lookups) == 1
+
+
+def test_submit_many_reports_failed_items(client, beam_api):
+    def endpoint(request):
+        if json.loads(request.body)["i"] == 2:
+            return 500, {}, b"internal error"
+        return 200, {}, request.body
+
+    beam_api.add_route("POST", "/endpoint/*", endpoint)
+
+    results = list(client.submit_many("app", [{"i": i} for i in range(5)], concurrency=2))
+
+    assert [r.ok for r in results] == [True, True, False, True, True]
+    assert results[4].value == {"i": 4}
+
+
+def test_submit_many_raises_for_unknown_deployment(client):
+    with pytest.raises(DeploymentNotFoundError):
+        client.submit_many("missing", [{"i": 1}])
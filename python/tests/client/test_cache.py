@@ -0,0 +1,165 @@
+import json
+
+import pytest
+import requests
+from beta9.exceptions import DeploymentNotFoundError
+
+from beam.client.cache import DeploymentCache
+from beam.client.client import Client
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = DeploymentCache(ttl=10, clock=clock)
+    cache.set("a", "https://a")
+
+    assert cache.get("a").url == "https://a"
+    clock.now += 11
+    assert cache.get("a") is None
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+    assert cache.stats.expirations == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = DeploymentCache(maxsize=2, clock=clock)
+    cache.set("a", "https://a")
+    cache.set("b", "https://b")
+    cache.get("a")
+    cache.set("c", "https://c")
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats.evictions == 1
+    assert len(cache) == 2
+
+
+def test_not_found_is_cached_briefly(clock):
+    cache = DeploymentCache(negative_ttl=5, clock=clock)
+    cache.set_not_found("a")
+
+    assert cache.get("a").url is None
+    assert cache.stats.negative_hits == 1
+    clock.now += 6
+    assert cache.get("a") is None
+
+
+def test_invalidate(clock):
+    cache = DeploymentCache(clock=clock)
+    cache.set("a", "https://a")
+    cache.set("b", "https://b")
+
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_found_urls_persist_to_disk(tmp_path, clock):
+    path = tmp_path / "deployments.json"
+    cache = DeploymentCache(path=path, ttl=10, clock=clock)
+    cache.set("a", "https://a")
+    cache.set_not_found("b")
+
+    warm = DeploymentCache(path=path, clock=clock)
+    assert warm.get("a").url == "https://a"
+    assert warm.get("b") is None
+
+    clock.now += 11
+    assert DeploymentCache(path=path, clock=clock).get("a") is None
+
+
+def test_unreadable_disk_store_is_ignored(tmp_path):
+    path = tmp_path / "deployments.json"
+    path.write_text("not json")
+
+    cache = DeploymentCache(path=path)
+    cache.set("a", "https://a")
+
+    assert DeploymentCache(path=path).get("a").url == "https://a"
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        [["a", "https://a"]],
+        {"a": "https://a"},
+        {"a": {"url": "https://a", "expires_at": 2e9, "version": 2}},
+        {"a": {"url": 1, "expires_at": "later"}},
+    ],
+    ids=["list", "old format", "unknown field", "wrong types"],
+)
+def test_malformed_disk_store_entries_are_skipped(tmp_path, clock, data):
+    path = tmp_path / "deployments.json"
+    path.write_text(json.dumps(data))
+
+    cache = DeploymentCache(path=path, clock=clock)
+    assert len(cache) == 0
+    cache.set("b", "https://b")
+
+    assert DeploymentCache(path=path, clock=clock).get("b").url == "https://b"
+
+
+def test_valid_entries_are_kept_beside_malformed_ones(tmp_path, clock):
+    path = tmp_path / "deployments.json"
+    path.write_text(
+        json.dumps({"a": {"url": "https://a", "expires_at": 2e9}, "b": {"url": "https://b"}})
+    )
+
+    cache = DeploymentCache(path=path, clock=clock)
+
+    assert cache.get("a").url == "https://a"
+    assert cache.get("b") is None
+
+
+def deployment_lookups(server):
+    return [r for r in server.requests if "get-public-deployment-url" in r.path]
+
+
+def test_client_resolves_deployments_once(client, beam_api):
+    client.submit("app")
+    client.submit("app")
+
+    assert len(deployment_lookups(beam_api)) == 1
+    assert client.deployment_cache.stats.hits == 1
+
+
+def test_client_caches_missing_deployments(client, beam_api):
+    for _ in range(3):
+        with pytest.raises(DeploymentNotFoundError):
+            client.get_deployment("missing")
+
+    assert len(deployment_lookups(beam_api)) == 1
+
+
+def test_client_does_not_cache_server_errors(client, beam_api):
+    beam_api.add_route(
+        "GET", "/v2/deployment/get-public-deployment-url/", lambda r: (503, {}, b"unavailable")
+    )
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            client.get_deployment("app")
+
+    assert len(deployment_lookups(beam_api)) == 2
+    assert len(client.deployment_cache) == 0
+
+
+def test_client_invalidate_deployment(client, beam_api):
+    client.get_deployment("app")
+    client.invalidate_deployment("app")
+    client.get_deployment("app")
+
+    assert len(deployment_lookups(beam_api)) == 2
+
+
+def test_new_client_reuses_disk_cache(beam_api, tmp_path):
+    path = tmp_path / "deployments.json"
+
+    with Client(token="token", deployment_cache=DeploymentCache(path=path)) as client:
+        client.get_deployment("app")
+    with Client(token="token", deployment_cache=DeploymentCache(path=path)) as client:
+        client.get_deployment("app")
+
+    assert len(deployment_lookups(beam_api)) == 1
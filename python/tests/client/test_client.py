@@ -0,0 +1,153 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import pytest
+import requests
+from beta9.exceptions import DeploymentNotFoundError
+
+from beam.client.client import Client
+
+
+def test_submit_returns_sync_response(client):
+    assert client.submit("app", input={"x": 1}) == {"x": 1}
+
+
+def test_submit_returns_task_for_async_deployments(client, beam_api):
+    beam_api.add_route("POST", "/endpoint/*", lambda r: (200, {}, b'{"task_id": "t1"}'))
+    beam_api.add_route(
+        "GET",
+        "/api/v1/task/*",
+        lambda r: (200, {}, b'{"status": "PENDING", "result": null, "outputs": []}'),
+    )
+
+    task = client.submit("app", input={"x": 1})
+
+    assert task.id == "t1"
+    assert task.url.endswith(f"/api/v1/task/{client.workspace_id}/t1")
+
+
+def test_get_deployment_raises_for_unknown_slug(client):
+    with pytest.raises(DeploymentNotFoundError):
+        client.get_deployment("missing")
+
+
+def test_calls_reuse_pooled_connections(client, beam_api):
+    beam_api.deployments.update(f"app-{i}" for i in range(20))
+
+    for i in range(20):
+        client.submit(f"app-{i}", input={"i": i})
+
+    assert len(beam_api.requests) == 1 + 2 * 20
+    assert beam_api.connections == 1
+
+
+def test_tasks_use_the_pooled_session(client, beam_api, task_service):
+    service = task_service()
+    for i in range(5):
+        service.add(f"t{i}", polls=0)
+    beam_api.add_route(
+        "POST",
+        "/endpoint/*",
+        lambda r: (200, {}, json.dumps({"task_id": f"t{json.loads(r.body)['i']}"}).encode()),
+    )
+
+    tasks = [client.submit("app", input={"i": i}) for i in range(5)]
+    # Submitting makes no status request
+    assert service.request_count() == 0
+
+    finished = client.wait_all([task.id for task in tasks], min_interval=0)
+    assert [task.outputs() for task in finished] == [[]] * 5
+    assert tasks[0].status().value == "COMPLETE"
+    assert beam_api.connections == 1
+
+
+def test_slow_calls_and_quiet_subscriptions_are_not_cut_off(beam_api):
+    def slow(response):
+        def handle(request):
+            time.sleep(0.5)
+            return response
+
+        return handle
+
+    complete = {"status": "COMPLETE", "result": {"ok": 1}, "outputs": []}
+    beam_api.add_route("POST", "/endpoint/app", slow((200, {}, b'{"done": true}')))
+    beam_api.add_route("POST", "/endpoint/tasks", lambda r: (200, {}, b'{"task_id": "t1"}'))
+    beam_api.add_route(
+        "GET",
+        "/api/v1/task/ws-123/t1/subscribe",
+        slow(
+            (
+                200,
+                {"Content-Type": "text/event-stream"},
+                f"event: status\ndata: {json.dumps(complete)}\n\n".encode(),
+            )
+        ),
+    )
+    beam_api.deployments.add("tasks")
+
+    # Responses take longer than the read timeout, which only applies to other requests
+    with Client(token="token", timeout=(5, 0.1)) as client:
+        assert client.submit("app", input={"x": 1}) == {"done": True}
+        assert client.subscribe("tasks", input={"x": 1}) == {"ok": 1}
+
+
+def test_session_is_shared_across_threads(beam_api):
+    with Client(token="token", pool_size=4) as client:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda i: client.submit("app", input={"i": i}), range(40)))
+
+    assert results == [{"i": i} for i in range(40)]
+    assert beam_api.connections <= 4
+
+
+def test_injected_session_is_used_and_left_open(beam_api):
+    session = requests.Session()
+
+    with Client(token="token", session=session) as client:
+        assert client.session is session
+        client.submit("app")
+
+    assert session.adapters
+    session.get(f"{beam_api.url}/api/v1/workspace/current").raise_for_status()
+
+
+def latency(call, count: int) -> List[float]:
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        call(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+@pytest.mark.benchmark
+def test_call_latency_and_throughput(beam_api, record_benchmark):
+    count = 500
+
+    with Client(token="token") as client:
+
+        def uncached(_):
+            client.invalidate_deployment()
+            client.get_deployment("app")
+
+        calls = {
+            "Client.get_deployment (uncached)": uncached,
+            "Client.get_deployment (cached)": lambda _: client.get_deployment("app"),
+            "Client.submit": lambda i: client.submit("app", input={"i": i}),
+        }
+        for name, call in calls.items():
+            samples = sorted(latency(call, count))
+            record_benchmark(
+                name,
+                p50_ms=samples[len(samples) // 2] * 1000,
+                p99_ms=samples[int(len(samples) * 0.99)] * 1000,
+                calls_per_s=count / sum(samples),
+            )
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            start = time.perf_counter()
+            list(executor.map(lambda i: client.submit("app", input={"i": i}), range(count)))
+            elapsed = time.perf_counter() - start
+        record_benchmark("Client.submit (8 threads)", calls_per_s=count / elapsed)
@@ -0,0 +1,295 @@
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import textwrap
+from typing import Optional
+
+import pytest
+from beta9.exceptions import DownloadChunkError
+
+from beam.client import download
+from beam.client.download import PARALLEL_THRESHOLD, ChecksumMismatchError, download_file
+
+DATA = os.urandom(300_000)
+
+
+def serve_bytes(data: bytes, ranges: bool = True, etag: Optional[str] = None):
+    def handler(request):
+        headers = {"Accept-Ranges": "bytes"} if ranges else {}
+        if etag:
+            headers["ETag"] = etag
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", request.headers.get("Range") or "")
+        if_range = request.headers.get("If-Range")
+        if not ranges or not match or (if_range and if_range != etag):
+            return 200, headers, data
+
+        start = int(match[1])
+        end = int(match[2]) if match[2] else len(data) - 1
+        if start >= len(data):
+            return 416, {"Content-Range": f"bytes */{len(data)}"}, b""
+
+        end = min(end, len(data) - 1)
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        return 206, headers, data[start : end + 1]
+
+    return handler
+
+
+@pytest.fixture
+def file_url(stand_in_server):
+    stand_in_server.add_route("GET", "/file", serve_bytes(DATA))
+    return f"{stand_in_server.url}/file"
+
+
+def interrupt_download(path, data: bytes) -> None:
+    """Leaves the files a sequential download of `data` interrupted at its end would."""
+    path.with_name(f"{path.name}.part.json").write_text(json.dumps({"validator": {}}))
+    path.with_name(f"{path.name}.part").write_bytes(data)
+
+
+def range_headers(server):
+    return [r.headers.get("Range") for r in server.requests]
+
+
+def test_streams_file_to_disk(file_url, tmp_path):
+    path = tmp_path / "out.bin"
+    progress = []
+
+    result = download_file(
+        file_url, path, chunk_size=64 * 1024, progress=lambda *args: progress.append(args)
+    )
+
+    assert path.read_bytes() == DATA
+    assert not (tmp_path / "out.bin.part").exists()
+    assert result.size == result.downloaded == len(DATA)
+    assert not result.resumed and not result.parallel
+    assert result.throughput > 0
+    assert len(progress) > 1
+    assert progress[-1] == (len(DATA), len(DATA))
+
+
+def test_resumes_from_part_file(file_url, stand_in_server, tmp_path):
+    path = tmp_path / "out.bin"
+    interrupt_download(path, DATA[:100_000])
+
+    result = download_file(file_url, path)
+
+    assert path.read_bytes() == DATA
+    assert range_headers(stand_in_server) == ["bytes=100000-"]
+    assert result.resumed
+    assert result.downloaded == len(DATA) - 100_000
+
+
+def test_complete_part_file_is_not_downloaded_again(file_url, stand_in_server, tmp_path):
+    path = tmp_path / "out.bin"
+    interrupt_download(path, DATA)
+
+    result = download_file(file_url, path)
+
+    assert path.read_bytes() == DATA
+    assert result.downloaded == 0
+
+
+def test_part_file_without_state_is_downloaded_again(file_url, stand_in_server, tmp_path):
+    path = tmp_path / "out.bin"
+    # Left by a parallel download killed right after preallocating
+    (tmp_path / "out.bin.part").write_bytes(bytes(len(DATA)))
+
+    result = download_file(file_url, path)
+
+    assert path.read_bytes() == DATA
+    assert range_headers(stand_in_server) == [None]
+    assert not result.resumed
+
+
+def test_restarts_when_the_object_got_shorter(stand_in_server, tmp_path):
+    stand_in_server.add_route("GET", "/file", serve_bytes(DATA[:200_000]))
+    path = tmp_path / "out.bin"
+    interrupt_download(path, DATA)
+
+    result = download_file(f"{stand_in_server.url}/file", path)
+
+    assert path.read_bytes() == DATA[:200_000]
+    assert range_headers(stand_in_server) == ["bytes=300000-", None]
+    assert not result.resumed
+
+
+def test_restarts_when_the_object_changed(stand_in_server, tmp_path):
+    url = f"{stand_in_server.url}/file"
+    path = tmp_path / "out.bin"
+    stand_in_server.add_route("GET", "/file", serve_bytes(DATA, etag='"v1"'))
+
+    def interrupt(done, total):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        download_file(url, path, chunk_size=64 * 1024, progress=interrupt)
+    assert (tmp_path / "out.bin.part").stat().st_size == 64 * 1024
+
+    changed = os.urandom(len(DATA))
+    stand_in_server.add_route("GET", "/file", serve_bytes(changed, etag='"v2"'))
+    result = download_file(url, path)
+
+    assert stand_in_server.requests[-1].headers["If-Range"] == '"v1"'
+    assert path.read_bytes() == changed
+    assert not result.resumed
+    assert not (tmp_path / "out.bin.part.json").exists()
+
+
+def test_resume_sends_the_saved_validator(stand_in_server, tmp_path):
+    url = f"{stand_in_server.url}/file"
+    path = tmp_path / "out.bin"
+    stand_in_server.add_route("GET", "/file", serve_bytes(DATA, etag='"v1"'))
+
+    def interrupt(done, total):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        download_file(url, path, chunk_size=64 * 1024, progress=interrupt)
+    result = download_file(url, path)
+
+    assert stand_in_server.requests[-1].headers["If-Range"] == '"v1"'
+    assert path.read_bytes() == DATA
+    assert result.resumed
+
+
+def test_restarts_when_server_ignores_range(stand_in_server, tmp_path):
+    stand_in_server.add_route("GET", "/file", serve_bytes(DATA, ranges=False))
+    path = tmp_path / "out.bin"
+    (tmp_path / "out.bin.part").write_bytes(b"stale bytes")
+
+    result = download_file(f"{stand_in_server.url}/file", path)
+
+    assert path.read_bytes() == DATA
+    assert not result.resumed
+
+
+def test_downloads_large_files_in_parallel_ranges(file_url, stand_in_server, tmp_path):
+    path = tmp_path / "out.bin"
+
+    result = download_file(
+        file_url, path, parallel_threshold=100_000, segment_size=64 * 1024, max_workers=4
+    )
+
+    assert path.read_bytes() == DATA
+    assert result.parallel
+    assert result.downloaded == len(DATA)
+    assert len(range_headers(stand_in_server)) == 1 + 5
+    assert "bytes=0-65535" in range_headers(stand_in_server)
+    assert not (tmp_path / "out.bin.part.json").exists()
+
+
+def test_resumes_parallel_download(stand_in_server, tmp_path):
+    path = tmp_path / "out.bin"
+    url = f"{stand_in_server.url}/file"
+    failing = {"bytes=131072-196607"}
+
+    def flaky(request):
+        if request.headers.get("Range") in failing:
+            return 500, {}, b""
+        return serve_bytes(DATA)(request)
+
+    stand_in_server.add_route("GET", "/file", flaky)
+    options = dict(parallel_threshold=100_000, segment_size=64 * 1024, max_workers=2)
+
+    with pytest.raises(DownloadChunkError):
+        download_file(url, path, **options)
+    assert (tmp_path / "out.bin.part.json").exists()
+
+    failing.clear()
+    stand_in_server.requests.clear()
+    result = download_file(url, path, **options)
+
+    assert path.read_bytes() == DATA
+    assert result.resumed
+    assert "bytes=0-65535" not in range_headers(stand_in_server)
+    assert "bytes=131072-196607" in range_headers(stand_in_server)
+
+
+def test_state_is_saved_before_the_part_file_is_written(file_url, tmp_path, monkeypatch):
+    path = tmp_path / "out.bin"
+    part_sizes = []
+    write_state = download.write_state
+
+    def record(state_path, state):
+        part = tmp_path / "out.bin.part"
+        part_sizes.append(part.stat().st_size if part.exists() else None)
+        write_state(state_path, state)
+
+    monkeypatch.setattr(download, "write_state", record)
+    download_file(file_url, path)
+    download_file(file_url, path, parallel_threshold=100_000, segment_size=64 * 1024)
+
+    # The sequential download, then the parallel one before preallocating
+    assert part_sizes[0] is None
+    assert part_sizes[1] is None
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_verifies_checksum(file_url, tmp_path):
+    path = tmp_path / "out.bin"
+
+    download_file(file_url, path, checksum=f"sha256:{hashlib.sha256(DATA).hexdigest()}")
+    assert path.read_bytes() == DATA
+
+    with pytest.raises(ChecksumMismatchError):
+        download_file(file_url, tmp_path / "bad.bin", checksum="sha256:" + "0" * 64)
+    assert not (tmp_path / "bad.bin").exists()
+    assert not (tmp_path / "bad.bin.part").exists()
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("megabytes", [16, 96], ids=["single stream", "parallel"])
+def test_download_throughput_and_memory(stand_in_server, tmp_path, megabytes, record_benchmark):
+    pytest.importorskip("resource")
+    stand_in_server.add_route("GET", "/large", serve_bytes(os.urandom(megabytes * 1024 * 1024)))
+
+    # Measured in a fresh process, where peak RSS is the download's alone. The
+    # high-water mark of getrusage survives exec on Linux, so the child would
+    # report this process's peak, but VmHWM starts over.
+    code = """
+        import resource
+        import sys
+
+        from beam.client.download import download_file
+
+        def peak_rss():
+            try:
+                with open("/proc/self/status") as f:
+                    for line in f:
+                        if line.startswith("VmHWM:"):
+                            return int(line.split()[1]) * 1024
+            except OSError:
+                pass
+            # In bytes on macOS and KiB elsewhere
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return rss if sys.platform == "darwin" else rss * 1024
+
+        if len(sys.argv) > 1:
+            result = download_file(sys.argv[1], sys.argv[2])
+            print(result.throughput, result.parallel)
+        print(peak_rss())
+    """
+
+    def run(*argv):
+        result = subprocess.run(
+            [sys.executable, "-c", textwrap.dedent(code), *argv],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return result.stdout.split()
+
+    (baseline,) = run()
+    throughput, parallel, peak = run(f"{stand_in_server.url}/large", str(tmp_path / "out.bin"))
+
+    assert parallel == str(megabytes * 1024 * 1024 >= PARALLEL_THRESHOLD)
+    record_benchmark(
+        f"Client.download_file ({megabytes}MB)",
+        mb_per_s=float(throughput) / 1e6,
+        peak_rss_mb=int(peak) / 1e6,
+        rss_growth_mb=(int(peak) - int(baseline)) / 1e6,
+    )
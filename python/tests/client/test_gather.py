@@ -0,0 +1,121 @@
+import random
+import threading
+import time
+
+import pytest
+from beta9.exceptions import TaskNotFoundError
+
+from beam.client.gather import TaskGatherer
+
+
+def test_as_completed_yields_tasks_in_finish_order(client, beam_api, task_service):
+    service = task_service()
+    for task_id, polls in [("a", 3), ("b", 1), ("c", 2)]:
+        service.add(task_id, polls=polls)
+
+    finished = list(client.as_completed(["a", "b", "c"], min_interval=0.01))
+
+    assert [task.id for task in finished] == ["b", "c", "a"]
+    assert all(task.result() == {"id": task.id} for task in finished)
+
+
+def test_wait_all_keeps_input_order_and_accepts_tasks(client, beam_api, task_service):
+    service = task_service()
+    for i in range(250):
+        service.add(f"t{i}", polls=0 if i == 0 else random.randint(1, 3))
+    first = client._task("t0")
+    ids = [first] + [f"t{i}" for i in range(1, 250)]
+    before = service.request_count()
+
+    finished = client.wait_all(ids, min_interval=0.01)
+
+    assert [task.id for task in finished] == [f"t{i}" for i in range(250)]
+    assert finished[0] is first
+    # 3 batches per round for at most 4 rounds, plus one fetch per finished task
+    assert service.request_count() - before <= 3 * 4 + 250
+
+
+def test_wait_all_times_out(client, beam_api, task_service):
+    service = task_service()
+    service.add("slow", delay=60)
+
+    with pytest.raises(TimeoutError):
+        client.wait_all(["slow"], timeout=0.2, min_interval=0.01)
+
+
+def test_falls_back_to_per_task_status_without_batch_filter(client, beam_api, task_service):
+    service = task_service(batch_filter=False)
+    service.add("a", polls=2)
+    service.add("b", polls=4)
+
+    finished = client.wait_all(["a", "b"], min_interval=0.01)
+
+    assert [task.id for task in finished] == ["a", "b"]
+    assert sum(1 for r in beam_api.requests if "task_ids" in r.path) == 1
+
+
+def test_tasks_missing_from_batches_are_looked_up_on_their_own(client, beam_api, task_service):
+    service = task_service()
+    service.add("a", polls=1)
+    service.add("b", polls=1)
+    service.hidden.add("b")
+
+    finished = list(client.as_completed(["a", "b"], min_interval=0, timeout=5))
+
+    assert sorted(task.id for task in finished) == ["a", "b"]
+    single = [r.path for r in beam_api.requests if r.path.endswith("/b")]
+    # Looked up on its own from its third missing poll until it finished, then fetched
+    assert len(single) == 3
+
+
+def test_unknown_tasks_raise(client, beam_api, task_service):
+    task_service().add("a", polls=0)
+
+    with pytest.raises(TaskNotFoundError):
+        list(client.as_completed(["a", "ghost"], min_interval=0))
+
+
+def test_poll_interval_backs_off_and_resets(client, beam_api, task_service):
+    service = task_service()
+    service.add("a", polls=3)
+    service.add("b", polls=8)
+    delays = []
+
+    gatherer = TaskGatherer(client, ["a", "b"], min_interval=1, max_interval=2, sleep=delays.append)
+    list(gatherer.as_completed())
+
+    assert delays == [1.5, 2, 2, 1, 1.5, 2, 2, 2]
+
+
+@pytest.mark.benchmark
+def test_requests_per_completed_task(client, beam_api, task_service, record_benchmark):
+    count = 200
+    interval = 0.1
+
+    def run(wait):
+        service = task_service()
+        for i in range(count):
+            service.add(f"t{i}", delay=random.uniform(0, 2))
+        before = service.request_count()
+        start = time.perf_counter()
+        wait([f"t{i}" for i in range(count)])
+        return (service.request_count() - before) / count, time.perf_counter() - start
+
+    def poll_each(ids):
+        # One poller per task, the way Task.result(wait=...) loops are usually written
+        def poll(task_id):
+            task = client._task(task_id)
+            while not task.is_complete():
+                time.sleep(interval)
+
+        threads = [threading.Thread(target=poll, args=(i,)) for i in ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    per_task, seconds = run(poll_each)
+    record_benchmark("per-task polling", requests_per_task=per_task, seconds=seconds)
+
+    per_task, seconds = run(lambda ids: client.wait_all(ids, min_interval=interval))
+    record_benchmark("wait_all", requests_per_task=per_task, seconds=seconds)
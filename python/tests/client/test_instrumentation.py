@@ -0,0 +1,189 @@
+import random
+import socket
+import time
+
+import pytest
+import requests
+from beta9.exceptions import DeploymentNotFoundError
+from urllib3.util.retry import Retry
+
+from beam.client.client import Client
+from beam.client.instrumentation import (
+    Histogram,
+    InstrumentedAdapter,
+    MetricsCollector,
+    OpenTelemetryInstrumentation,
+    endpoint,
+)
+from beam.client.session import create_session
+
+DEPLOYMENT_URL = "GET /v2/deployment/get-public-deployment-url/"
+
+
+@pytest.fixture
+def metrics():
+    return MetricsCollector()
+
+
+def test_requests_calls_and_cache_lookups_are_recorded(beam_api, metrics):
+    with Client(token="token", instrumentation=metrics) as client:
+        client.submit("app", input={"x": 1})
+        client.submit("app", input={"x": 2})
+        with pytest.raises(DeploymentNotFoundError):
+            client.get_deployment("missing")
+
+    summary = metrics.summary()
+    assert summary["requests"][DEPLOYMENT_URL]["count"] == 2
+    assert summary["requests"]["POST /endpoint/app"]["count"] == 2
+    assert summary["errors"] == {DEPLOYMENT_URL: 1}
+    assert summary["cache"] == {"deployment": {"hits": 1, "misses": 2}}
+    assert summary["operations"]["Client.submit"]["count"] == 2
+    assert summary["operations"]["Client.get_deployment"]["count"] == 3
+    assert summary["retries"] == {}
+
+
+def test_request_events_carry_sizes_and_status(beam_api):
+    events = []
+
+    class Recorder(MetricsCollector):
+        def on_request(self, event):
+            events.append(event)
+
+    with Client(token="token", instrumentation=Recorder()) as client:
+        client.submit("app", input={"x": 1})
+
+    post = events[-1]
+    assert (post.method, post.endpoint, post.status) == ("POST", "/endpoint/app", 200)
+    assert post.bytes_sent == len('{"x": 1}')
+    assert post.bytes_received == len('{"x": 1}')
+    assert post.duration > 0
+    assert post.url == f"{beam_api.url}/endpoint/app"
+
+
+def test_retries_are_recorded(beam_api, metrics):
+    failures = [503, 503]
+
+    def flaky(request):
+        if failures:
+            return failures.pop(), {}, b""
+        return 200, {}, f'{{"url": "{beam_api.url}/endpoint/app"}}'.encode()
+
+    beam_api.add_route("GET", "/v2/deployment/get-public-deployment-url/", flaky)
+    session = create_session(max_retries=Retry(total=3, status_forcelist=[503], backoff_factor=0))
+
+    with Client(token="token", session=session, instrumentation=metrics) as client:
+        client.get_deployment("app")
+
+    assert metrics.summary()["retries"] == {DEPLOYMENT_URL: 2}
+
+
+def test_failed_requests_are_recorded(beam_api, metrics):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        url = f"http://127.0.0.1:{sock.getsockname()[1]}/file"
+
+    with Client(token="token", instrumentation=metrics) as client:
+        with pytest.raises(requests.ConnectionError):
+            client.download_file(url, "unused")
+
+    assert metrics.summary()["errors"] == {"GET /file": 1}
+    assert metrics.summary()["operations"]["Client.download_file"]["count"] == 1
+
+
+def test_clients_sharing_a_session_report_their_own_requests(beam_api):
+    session = create_session()
+    adapters = dict(session.adapters)
+    first, second = MetricsCollector(), MetricsCollector()
+
+    with Client(token="token", session=session, instrumentation=first) as a:
+        with Client(token="token", session=session, instrumentation=second) as b:
+            a.submit("app", input={"x": 1})
+            b.submit("app", input={"x": 2})
+            b.submit("app", input={"x": 3})
+
+    assert first.summary()["requests"]["POST /endpoint/app"]["count"] == 1
+    assert second.summary()["requests"]["POST /endpoint/app"]["count"] == 2
+    # The injected session is unchanged and still open
+    assert session.adapters == adapters
+    session.get(f"{beam_api.url}/api/v1/workspace/current").raise_for_status()
+    assert beam_api.connections == 1
+
+
+def test_no_instrumentation_leaves_the_session_alone(beam_api):
+    with Client(token="token") as client:
+        assert client.instrumentation is None
+        assert not any(isinstance(a, InstrumentedAdapter) for a in client.session.adapters.values())
+
+
+def test_endpoints_group_ids():
+    assert endpoint("https://app.beam.cloud/api/v1/task/ws-123/t1?x=1") == "/api/v1/task/ws-123/t1"
+    assert (
+        endpoint("https://app.beam.cloud/api/v1/task/3f2b1c9e-4d5a-4e6f-8a7b-9c0d1e2f3a4b/t1")
+        == "/api/v1/task/{id}/t1"
+    )
+    assert endpoint("https://x.beam.cloud/v1/deployment/a1b2c3d4e5f6a7b8c9d0") == (
+        "/v1/deployment/{id}"
+    )
+    assert endpoint("https://x.beam.cloud/get-public-deployment-url/") == (
+        "/get-public-deployment-url/"
+    )
+
+
+def test_histogram_percentiles_are_within_precision():
+    rng = random.Random(0)
+    values = [rng.lognormvariate(-5, 1) for _ in range(10_000)]
+    histogram = Histogram(precision=0.02)
+    for value in values:
+        histogram.record(value)
+
+    values.sort()
+    for q in (50, 95, 99):
+        exact = values[int(q / 100 * len(values)) - 1]
+        assert histogram.percentile(q) == pytest.approx(exact, rel=0.05)
+    assert histogram.percentile(0) == values[0]
+    assert histogram.percentile(100) == values[-1]
+    assert histogram.count == len(values)
+    assert Histogram().percentile(50) == 0.0
+
+
+def test_opentelemetry_adapter_records_metrics(beam_api):
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+
+    reader = InMemoryMetricReader()
+    instrumentation = OpenTelemetryInstrumentation(MeterProvider(metric_readers=[reader]))
+    with Client(token="token", instrumentation=instrumentation) as client:
+        client.submit("app")
+
+    metrics = reader.get_metrics_data().resource_metrics[0].scope_metrics[0].metrics
+    assert {m.name for m in metrics} == {
+        "http.client.request.duration",
+        "beam.client.operation.duration",
+        "beam.client.cache.lookups",
+    }
+
+
+@pytest.mark.benchmark
+def test_instrumentation_overhead(beam_api, record_benchmark):
+    count = 20_000
+
+    for name, instrumentation in [("none", None), ("MetricsCollector", MetricsCollector())]:
+        with Client(token="token", instrumentation=instrumentation) as client:
+            client.get_deployment("app")
+
+            start = time.perf_counter()
+            for _ in range(count):
+                client.get_deployment("app")
+            cached = (time.perf_counter() - start) / count
+
+            start = time.perf_counter()
+            for i in range(count // 20):
+                client.submit("app", input={"i": i})
+            submit = (time.perf_counter() - start) / (count // 20)
+
+        record_benchmark(
+            f"instrumentation ({name})",
+            cached_get_deployment_us=cached * 1e6,
+            submit_us=submit * 1e6,
+        )
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from websockets.exceptions import ConnectionClosed
+
+from beam.client import logs
+from beam.client.logs import KeepAlive, LogRecord, LogStreamError
+
+
+def log_hit(msg: str, timestamp: str, **fields) -> dict:
+    return {"_id": timestamp, "_source": {"msg": msg, "@timestamp": timestamp, **fields}}
+
+
+def logs_frame(hits: list) -> str:
+    return json.dumps({"logs": {"hits": {"hits": hits}}})
+
+
+@pytest.fixture
+def log_client(client, logs_server):
+    client.realtime_host = logs_server.url
+    return client
+
+
+@pytest.fixture
+def held_open(logs_server):
+    """
+    Sends one live line, then keeps the connection open until the client
+    closes it, which sets the returned event.
+    """
+    closed = threading.Event()
+
+    def handle(conn):
+        for msg in conn:
+            if json.loads(msg)["action"] == "LOGS_ADD_STREAM":
+                conn.send(logs_frame([log_hit("live\n", "2024-01-01T00:00:01", task_id="t1")]))
+        closed.set()
+
+    logs_server.server.handler = handle
+    return closed
+
+
+def test_stream_logs_yields_history_then_live_records(log_client, logs_server):
+    logs_server.history = [log_hit("one\n", "2024-01-01T00:00:01", task_id="t1")]
+    logs_server.live = [logs_frame([log_hit("two\n", "2024-01-01T00:00:02", task_id="t1")])]
+
+    records = list(log_client.stream_logs("t1", "task", lines=10))
+
+    assert [(r.timestamp, r.message, r.object_id, r.object_type) for r in records] == [
+        ("2024-01-01T00:00:01", "one\n", "t1", "BETA9_TASK"),
+        ("2024-01-01T00:00:02", "two\n", "t1", "BETA9_TASK"),
+    ]
+    assert isinstance(records[0], LogRecord)
+    assert records[0].fields["task_id"] == "t1"
+    assert [r["action"] for r in logs_server.received] == ["LOGS_QUERY", "LOGS_ADD_STREAM"]
+    assert logs_server.received[0]["size"] == 10
+    assert len(logs.keep_alive) == 0
+
+
+def test_stream_logs_without_follow_only_reads_history(log_client, logs_server):
+    logs_server.history = [log_hit("one\n", "2024-01-01T00:00:01")]
+
+    records = list(log_client.stream_logs("c1", since="2024-01-01T00:00:00", follow=False))
+
+    assert [r.message for r in records] == ["one\n"]
+    assert [r["action"] for r in logs_server.received] == ["LOGS_QUERY"]
+    assert logs_server.received[0]["objectType"] == "BETA9_CONTAINER"
+    assert logs_server.received[0]["startingTimestamp"] == "2024-01-01T00:00:00"
+    assert logs_server.received[0]["size"] == logs.MAX_HISTORY_LINES
+
+
+def test_stream_logs_raises_gateway_errors(log_client, logs_server):
+    def handle(conn):
+        conn.recv()
+        conn.send(json.dumps({"error": "invalid token"}))
+
+    logs_server.server.handler = handle
+
+    with pytest.raises(LogStreamError, match="Invalid token"):
+        list(log_client.stream_logs("t1", "task"))
+
+
+def test_stream_logs_rejects_unknown_object_types(log_client):
+    with pytest.raises(ValueError):
+        log_client.stream_logs("x", "volume")
+
+
+def test_closing_a_stream_closes_its_connection(log_client, held_open):
+    stream = log_client.stream_logs("t1", "BETA9_TASK")
+
+    assert next(stream).message == "live\n"
+    assert len(logs.keep_alive) == 1
+
+    stream.close()
+
+    assert held_open.wait(1)
+    assert len(logs.keep_alive) == 0
+
+
+class FakeConnection:
+    def __init__(self, closed=False):
+        self.pings = 0
+        self.closed = closed
+
+    def ping(self):
+        if self.closed:
+            raise ConnectionClosed(None, None)
+        self.pings += 1
+
+
+def test_keep_alive_pings_every_connection_from_one_thread():
+    keep_alive = KeepAlive(interval=0.05)
+    conns = [FakeConnection() for _ in range(100)]
+    dead = FakeConnection(closed=True)
+    threads = threading.active_count()
+
+    for conn in conns + [dead]:
+        keep_alive.add(conn)
+    time.sleep(0.2)
+    keep_alive.remove(conns[0])
+    pings = conns[0].pings
+    time.sleep(0.15)
+
+    assert threading.active_count() == threads + 1
+    assert all(conn.pings >= 2 for conn in conns)
+    assert conns[0].pings == pings
+    assert len(keep_alive) == 99
+
+
+def test_async_client_streams_logs(logs_server):
+    pytest.importorskip("httpx")
+    from beam.client.aio import AsyncClient
+
+    logs_server.live = [logs_frame([log_hit("two\n", "2024-01-01T00:00:02")])]
+
+    async def main():
+        async with AsyncClient(token="token") as async_client:
+            async_client.realtime_host = logs_server.url
+            return [record async for record in async_client.stream_logs("c1")]
+
+    assert [r.message for r in asyncio.run(main())] == ["two\n"]
+
+
+def test_cancelling_an_async_stream_closes_its_connection(logs_server, held_open):
+    async def main():
+        received = asyncio.Event()
+
+        async def tail():
+            stream = logs.stream_logs_async(logs_server.url, "token", logs.log_source("t1", "task"))
+            async for _ in stream:
+                received.set()
+
+        task = asyncio.create_task(tail())
+        await asyncio.wait_for(received.wait(), 1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert held_open.wait(1)
@@ -0,0 +1,310 @@
+import json
+import threading
+import time
+
+import pytest
+
+from beam.client.client import Client
+from beam.client.instrumentation import MetricsCollector
+from beam.client.result_cache import ResultCache
+
+COMPLETE = {"status": "COMPLETE", "result": {"y": 1}, "outputs": []}
+
+
+def respond(body, status=200):
+    return status, {}, json.dumps(body).encode()
+
+
+def posts(server):
+    return [r for r in server.requests if r.method == "POST"]
+
+
+def test_keys_ignore_key_order_but_not_values():
+    key = ResultCache.key
+
+    assert key("app", {"a": 1, "b": [1, 2]}) == key("app", {"b": [1, 2], "a": 1})
+    assert key("app", {"a": 1}) != key("app", {"a": 2})
+    assert key("app", {"a": 1}) != key("other", {"a": 1})
+    assert key("app", {"a": 1}, "x") != key("app", {"a": 1}, "y")
+
+
+def test_results_expire_per_deployment(clock):
+    cache = ResultCache(ttl=10, ttls={"slow": 100}, clock=clock)
+    cache.set("a", "app", {"out": 1})
+    cache.set("b", "slow", {"out": 2})
+
+    clock.now += 11
+    assert cache.get("a") == (False, None)
+    assert cache.get("b") == (True, {"out": 2})
+    assert cache.stats.expirations == 1
+
+
+def test_hits_are_copies(clock):
+    cache = ResultCache(clock=clock)
+    cache.set("a", "app", {"out": [1]})
+    cache.get("a")[1]["out"].append(2)
+
+    assert cache.get("a") == (True, {"out": [1]})
+
+
+def test_least_recently_used_results_are_evicted(clock):
+    cache = ResultCache(maxsize=2, clock=clock)
+    cache.set("a", "app", 1)
+    cache.set("b", "app", 2)
+    cache.get("a")
+    cache.set("c", "app", 3)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.stats.evictions == 1
+
+    small = ResultCache(max_memory_bytes=10, clock=clock)
+    small.set("a", "app", "x" * 6)
+    small.set("b", "app", "y" * 6)
+    assert len(small) == 1
+
+
+def test_disk_tier_is_shared_and_bounded(tmp_path, clock):
+    path = tmp_path / "results"
+    # Room for three of the 102-byte files written below
+    writer = ResultCache(path=path, max_disk_bytes=320, clock=clock)
+    for i in range(5):
+        writer.set(f"{i:064}", "app", "x" * 50)
+        clock.now += 1
+    assert writer.get(f"{0:064}") == (True, "x" * 50)
+
+    files = sorted(p.name for p in path.glob("*/*"))
+    assert len(files) == 3
+    assert sum(p.stat().st_size for p in path.glob("*/*")) <= 320
+
+    reader = ResultCache(path=path, clock=clock)
+    assert reader.get(f"{4:064}") == (True, "x" * 50)
+    assert reader.get(f"{0:064}") == (False, None)
+    assert reader.stats.disk_hits == 1
+    assert len(reader) == 1
+
+    clock.now += writer.ttl
+    assert ResultCache(path=path, clock=clock).get(f"{3:064}") == (False, None)
+    assert len(list(path.glob("*/*"))) == 2
+
+
+def test_files_written_by_other_processes_count_towards_the_limit(tmp_path, clock):
+    path = tmp_path / "results"
+    reader = ResultCache(path=path, max_disk_bytes=320, clock=clock)
+    ResultCache(path=path, clock=clock).set(f"{0:064}", "app", "x" * 50)
+
+    assert reader.get(f"{0:064}") == (True, "x" * 50)
+    for i in range(1, 4):
+        clock.now += 1
+        reader.set(f"{i:064}", "app", "x" * 50)
+
+    # The other process's file was the least recently used, so it went first
+    assert not (path / "00" / f"{0:064}").exists()
+    assert sum(p.stat().st_size for p in path.glob("*/*")) <= 320
+
+
+def test_submit_results_are_cached(beam_api, tmp_path):
+    metrics = MetricsCollector()
+    cache = ResultCache(path=tmp_path / "results")
+    with Client(token="token", result_cache=cache, instrumentation=metrics) as client:
+        assert client.submit("app", input={"x": 1, "y": 2}) == {"x": 1, "y": 2}
+        assert client.submit("app", input={"y": 2, "x": 1}) == {"x": 1, "y": 2}
+        client.submit("app", input={"x": 2})
+
+    assert len(posts(beam_api)) == 2
+    assert metrics.summary()["cache"]["result"] == {"hits": 1, "misses": 2}
+
+    # A new process starts warm, without even looking up the deployment
+    beam_api.requests.clear()
+    with Client(token="token", result_cache=ResultCache(path=tmp_path / "results")) as client:
+        assert client.submit("app", input={"x": 1, "y": 2}) == {"x": 1, "y": 2}
+    assert [r.path for r in beam_api.requests] == ["/api/v1/workspace/current"]
+
+
+def test_bypass_and_refresh(beam_api):
+    outputs = iter(range(10))
+    beam_api.add_route("POST", "/endpoint/app", lambda r: respond(next(outputs)))
+
+    with Client(token="token", result_cache=ResultCache()) as client:
+        assert client.submit("app", input={"x": 1}) == 0
+        assert client.submit("app", input={"x": 1}, use_cache=False) == 1
+        assert client.submit("app", input={"x": 1}) == 0
+        assert client.submit("app", input={"x": 1}, refresh_cache=True) == 2
+        assert client.submit("app", input={"x": 1}) == 2
+
+
+def test_errors_and_tasks_are_not_cached(beam_api):
+    beam_api.add_route("GET", "/api/v1/task/*", lambda r: respond(COMPLETE))
+    beam_api.add_route("POST", "/endpoint/broken", lambda r: respond({"detail": "x"}, 500))
+    beam_api.add_route("POST", "/endpoint/tasks", lambda r: respond({"task_id": "t1"}))
+    beam_api.deployments |= {"broken", "tasks"}
+
+    with Client(token="token", result_cache=ResultCache()) as client:
+        for _ in range(2):
+            assert client.submit("broken", input={"x": 1}) == {"detail": "x"}
+            assert client.submit("tasks", input={"x": 1}).id == "t1"
+
+    assert len(posts(beam_api)) == 4
+
+
+def test_subscribe_caches_completed_task_results(beam_api):
+    beam_api.add_route("POST", "/endpoint/tasks", lambda r: respond({"task_id": "t1"}))
+    beam_api.add_route("GET", "/api/v1/task/*", lambda r: respond(COMPLETE))
+    beam_api.add_route(
+        "GET",
+        "/api/v1/task/ws-123/t1/subscribe",
+        lambda r: (
+            200,
+            {"Content-Type": "text/event-stream; charset=utf-8"},
+            f"event: status\ndata: {json.dumps(COMPLETE)}\n\n".encode(),
+        ),
+    )
+    beam_api.deployments.add("tasks")
+
+    with Client(token="token", result_cache=ResultCache()) as client:
+        assert client.subscribe("tasks", input={"x": 1}) == {"y": 1}
+        assert client.subscribe("tasks", input={"x": 1}) == {"y": 1}
+        # Submitting still returns a task, not the cached result
+        assert client.submit("tasks", input={"x": 1}).id == "t1"
+
+    assert len(posts(beam_api)) == 2
+
+
+def test_subscribe_does_not_cache_failed_tasks(beam_api):
+    failed = {"status": "ERROR", "result": {"error": "boom"}, "outputs": []}
+    beam_api.add_route("POST", "/endpoint/tasks", lambda r: respond({"task_id": "t1"}))
+    beam_api.add_route(
+        "GET",
+        "/api/v1/task/ws-123/t1/subscribe",
+        lambda r: (
+            200,
+            {"Content-Type": "text/event-stream"},
+            f"event: status\ndata: {json.dumps(failed)}\n\n".encode(),
+        ),
+    )
+    beam_api.deployments.add("tasks")
+    events = []
+
+    with Client(token="token", result_cache=ResultCache()) as client:
+        for _ in range(2):
+            assert client.subscribe("tasks", input={"x": 1}, event_handler=events.append) == {
+                "error": "boom"
+            }
+
+    assert len(posts(beam_api)) == 2
+    assert [event["status"] for event in events] == ["ERROR", "ERROR"]
+
+
+def test_identical_calls_in_flight_share_one_request(beam_api):
+    release = threading.Event()
+
+    def slow(request):
+        release.wait(5)
+        return respond(json.loads(request.body))
+
+    beam_api.add_route("POST", "/endpoint/app", slow)
+    cache = ResultCache()
+    results = []
+
+    with Client(token="token", result_cache=cache) as client:
+        client.get_deployment("app")
+        threads = [
+            threading.Thread(target=lambda: results.append(client.submit("app", input={"x": 1})))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        while cache.stats.shared < 7:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    assert results == [{"x": 1}] * 8
+    assert len(posts(beam_api)) == 1
+
+
+class Point:
+    def __init__(self, x):
+        self.x = x
+
+
+@pytest.mark.parametrize(
+    "result, cacheable",
+    [({"out": [1]}, True), (Point([1]), False)],
+    ids=["json", "object"],
+)
+def test_calls_that_share_a_request_get_their_own_copy(result, cacheable):
+    cache = ResultCache()
+    release = threading.Event()
+    results = []
+
+    def call():
+        release.wait(5)
+        return result, cacheable
+
+    def fetch():
+        results.append(cache.fetch("app", {"x": 1}, call)[0])
+
+    threads = [threading.Thread(target=fetch) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while cache.stats.shared < 2:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 3
+    assert len({id(value) for value in results}) == 3
+    if cacheable:
+        assert results == [{"out": [1]}] * 3
+    else:
+        assert [value.x for value in results] == [[1]] * 3
+
+
+def test_a_failed_call_fails_every_caller_and_is_not_cached():
+    cache = ResultCache()
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise ConnectionError("down")
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            cache.fetch("app", {"x": 1}, call)
+
+    assert len(calls) == 2
+    assert cache.stats.misses == 2
+
+
+@pytest.mark.benchmark
+def test_result_cache_hits(beam_api, tmp_path, record_benchmark):
+    # Within the memory tier's default maxsize
+    count = 1000
+    inputs = [{"text": f"document {i}", "model": "small"} for i in range(count)]
+
+    with Client(token="token", result_cache=ResultCache(path=tmp_path / "results")) as client:
+        start = time.perf_counter()
+        for input in inputs:
+            client.submit("app", input=input)
+        miss = (time.perf_counter() - start) / count
+
+        start = time.perf_counter()
+        for input in inputs:
+            client.submit("app", input=input)
+        memory = (time.perf_counter() - start) / count
+
+    with Client(token="token", result_cache=ResultCache(path=tmp_path / "results")) as client:
+        start = time.perf_counter()
+        for input in inputs:
+            client.submit("app", input=input)
+        disk = (time.perf_counter() - start) / count
+
+    record_benchmark(
+        "result cache (submit)",
+        miss_us=miss * 1e6,
+        memory_hit_us=memory * 1e6,
+        disk_hit_us=disk * 1e6,
+    )
@@ -0,0 +1,311 @@
+import datetime
+import json
+import platform
+from dataclasses import dataclass
+from email.message import Message
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib import metadata
+from pathlib import Path
+from threading import Thread
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import urlsplit
+
+import pytest
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.server import ServerConnection, serve
+
+# (status, headers, body)
+StandInResponse = Tuple[int, Dict[str, str], bytes]
+
+
+@dataclass
+class StandInRequest:
+    method: str
+    path: str
+    headers: Message
+    body: bytes
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def handle_request(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        request = StandInRequest(self.command, self.path, self.headers, body)
+        self.server.requests.append(request)
+
+        route = self.server.find_route(self.command, urlsplit(self.path).path)
+        status, headers, body = route(request) if route else (404, {}, b"")
+
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        if "Content-Length" not in headers:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD" and status not in (204, 304):
+            self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_HEAD = handle_request
+
+    def log_message(self, *args, **kwargs):
+        return
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    A local HTTP server that stands in for Beam's APIs.
+
+    Register routes with `add_route`, where a path ending in "*" matches any
+    path with that prefix. Every request is recorded in `requests` and every
+    accepted TCP connection is counted in `connections`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.routes: Dict[Tuple[str, str], Callable[[StandInRequest], StandInResponse]] = {}
+        self.requests = []
+        self.connections = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def add_route(
+        self, method: str, path: str, handler: Callable[[StandInRequest], StandInResponse]
+    ) -> None:
+        self.routes[(method, path)] = handler
+
+    def find_route(self, method: str, path: str):
+        if route := self.routes.get((method, path)):
+            return route
+
+        prefixes = [p for m, p in self.routes if m == method and p.endswith("*")]
+        for prefix in sorted(prefixes, key=len, reverse=True):
+            if path.startswith(prefix[:-1]):
+                return self.routes[(method, prefix)]
+        return None
+
+    def get_request(self):
+        self.connections += 1
+        return super().get_request()
+
+
+@pytest.fixture
+def stand_in_server():
+    server = StandInServer()
+    thread = Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+class WebSocketStandIn:
+    """
+    A local websocket server. Each connection is passed to `handler`, which
+    can be replaced by tests, and counted in `connections`.
+    """
+
+    def __init__(self) -> None:
+        self.handler: Callable[[ServerConnection], None] = lambda conn: None
+        self.connections = 0
+        self.server = serve(self._handle, "127.0.0.1", 0, compression=None)
+
+    @property
+    def url(self) -> str:
+        return f"ws://127.0.0.1:{self.server.socket.getsockname()[1]}"
+
+    def _handle(self, conn: ServerConnection) -> None:
+        self.connections += 1
+        self.handler(conn)
+
+
+@pytest.fixture
+def websocket_server():
+    stand_in = WebSocketStandIn()
+    thread = Thread(target=stand_in.server.serve_forever, daemon=True)
+    thread.start()
+
+    yield stand_in
+
+    stand_in.server.shutdown()
+    thread.join()
+
+
+ID_FIELDS = {
+    "BETA9_STUB": "stub_id",
+    "BETA9_DEPLOYMENT": "deployment_id",
+    "BETA9_TASK": "task_id",
+    "BETA9_CONTAINER": "container_id",
+}
+
+
+class LogsStandIn:
+    """
+    Speaks the realtime logs protocol on a websocket stand-in.
+
+    A `LOGS_QUERY` is answered with the last `size` `history` hits of its
+    object within the query's time range, where hits without an object ID in
+    their source belong to every object. Once
+    `streams` `LOGS_ADD_STREAM` messages have arrived, each of the `live`
+    frames is sent and the connection is closed.
+    """
+
+    def __init__(self, server) -> None:
+        self.server = server
+        self.history: List[dict] = []
+        self.live: List[str] = []
+        self.streams = 1
+        self.received: List[dict] = []
+        server.handler = self.handle
+
+    @property
+    def url(self) -> str:
+        return self.server.url
+
+    def query(self, request: dict) -> List[dict]:
+        field = ID_FIELDS[request["objectType"]]
+        hits = [
+            hit
+            for hit in self.history
+            if hit["_source"].get(field) == request["objectId"]
+            or not any(f in hit["_source"] for f in ID_FIELDS.values())
+        ]
+        hits = [
+            hit
+            for hit in hits
+            if request.get("startingTimestamp", "") <= hit["_source"]["@timestamp"]
+            and hit["_source"]["@timestamp"] <= request["endingTimestamp"]
+        ]
+        return hits[-request["size"] :]
+
+    def handle(self, conn) -> None:
+        streams = 0
+        try:
+            for msg in conn:
+                request = json.loads(msg)
+                self.received.append(request)
+                if request["action"] == "LOGS_QUERY":
+                    conn.send(json.dumps({"logs": {"hits": {"hits": self.query(request)}}}))
+                elif request["action"] == "LOGS_ADD_STREAM":
+                    streams += 1
+                    if streams < self.streams:
+                        continue
+
+                    for frame in self.live:
+                        conn.send(frame)
+                    return
+        except ConnectionClosed:
+            return
+
+
+@pytest.fixture
+def logs_server(websocket_server):
+    return LogsStandIn(websocket_server)
+
+
+class FakeClock:
+    """A clock to pass to code that takes one, which only moves when a test moves it."""
+
+    def __init__(self, now: float = 1_700_000_000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--benchmark",
+        action="store_true",
+        default=False,
+        help="Run the tests marked with @pytest.mark.benchmark, wherever they are.",
+    )
+    parser.addoption(
+        "--benchmark-json",
+        metavar="PATH",
+        default=None,
+        help="Write benchmark results to PATH as JSON.",
+    )
+    parser.addoption(
+        "--benchmark-compare",
+        metavar="PATH",
+        default=None,
+        help="Compare benchmark results with a file written by --benchmark-json.",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.benchmark_results = {}
+
+
+def pytest_collection_modifyitems(config: pytest.Config, items: list) -> None:
+    if config.getoption("--benchmark"):
+        return
+
+    skip = pytest.mark.skip(reason="benchmarks only run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def record_benchmark(request: pytest.FixtureRequest):
+    """
+    Records named metrics for the current benchmark, e.g.
+    `record_benchmark("beam --help", median_s=0.12)`.
+    """
+
+    def record(name: str, **metrics: float) -> None:
+        request.config.benchmark_results[name] = metrics
+
+    return record
+
+
+def pytest_terminal_summary(terminalreporter, config: pytest.Config) -> None:
+    if not config.benchmark_results:
+        return
+
+    baseline = {}
+    if path := config.getoption("--benchmark-compare"):
+        baseline = json.loads(Path(path).read_text())["results"]
+
+    terminalreporter.section("benchmarks")
+    for name, metrics in config.benchmark_results.items():
+        values = []
+        for key, value in metrics.items():
+            before = baseline.get(name, {}).get(key)
+            change = f" ({(value - before) / before:+.1%})" if before else ""
+            values.append(f"{key}={value:.4g}{change}")
+        terminalreporter.write_line(f"{name}: {', '.join(values)}")
+
+    if path := config.getoption("--benchmark-json"):
+        write_benchmark_results(Path(path), config.benchmark_results)
+        terminalreporter.write_line(f"Wrote benchmark results to {path}")
+
+
+def write_benchmark_results(path: Path, results: dict) -> None:
+    """
+    Writes benchmark results with what they were measured on, so runs of
+    different versions can be compared with --benchmark-compare.
+    """
+    data = {
+        "beam_client": metadata.version("beam-client"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "results": results,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2) + "\n")
@@ -0,0 +1,92 @@
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import beam
+
+# Generous enough for slow CI runners; eager imports of the beta9 abstractions
+# take several times this long.
+IMPORT_TIME_BUDGET = 0.5
+
+HEAVY_MODULES = [
+    "beta9.abstractions",
+    "beta9.channel",
+    "beta9.client.client",
+    "grpc",
+    "requests",
+    "websockets",
+]
+
+
+def run_python(code: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(code)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip()
+
+
+def test_import_beam_is_fast_and_defers_heavy_modules():
+    output = run_python(
+        f"""
+        import sys
+        import time
+
+        start = time.perf_counter()
+        import beam
+        elapsed = time.perf_counter() - start
+
+        loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+        print(elapsed, ",".join(loaded))
+        """
+    )
+    elapsed, _, loaded = output.partition(" ")
+
+    assert loaded == ""
+    assert float(elapsed) < IMPORT_TIME_BUDGET
+
+
+def test_exports_load_on_first_access():
+    output = run_python(
+        """
+        import sys
+
+        import beam
+
+        before = "beta9.abstractions.sandbox" in sys.modules
+        from beam import Sandbox
+        after = "beta9.abstractions.sandbox" in sys.modules
+        print(before, after, Sandbox.__module__)
+        """
+    )
+
+    assert output == "False True beta9.abstractions.sandbox"
+
+
+@pytest.mark.parametrize("name", beam.__all__)
+def test_all_exports_resolve(name):
+    assert getattr(beam, name) is not None
+    assert name in dir(beam)
+
+
+def test_star_import_leaves_out_exports_that_need_extras():
+    namespace = {}
+    exec("from beam import *", namespace)
+
+    assert "Client" in namespace
+    assert "AsyncClient" not in namespace
+
+
+def test_optional_exports_resolve_with_their_extra():
+    pytest.importorskip("httpx")
+
+    assert beam.AsyncClient.__module__ == "beam.client.aio"
+
+
+def test_unknown_attribute_raises_attribute_error():
+    with pytest.raises(AttributeError, match="has no attribute 'missing'"):
+        getattr(beam, "missing")